@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 
 st.set_page_config(layout='wide', initial_sidebar_state='collapsed')
 
@@ -16,12 +15,28 @@ page3 = st.Page(page='views/3_estatisticas.py',
                 title='Estatísticas 2024',
                 icon=':material/calculate:')
 
+page5 = st.Page(page='views/5_sequencias.py',
+                title='Completude de Esquemas',
+                icon=':material/event_repeat:')
+
+page6 = st.Page(page='views/6_rastreamento.py',
+                title='Rastreamento',
+                icon=':material/search:')
+
+page7 = st.Page(page='views/7_proximidade.py',
+                title='Postos Próximos',
+                icon=':material/location_on:')
+
+page8 = st.Page(page='views/8_qualidade.py',
+                title='Qualidade dos Dados',
+                icon=':material/rule:')
+
 page4 = st.Page(page='views/4_debug.py',
                 title='Debug',
                 icon='🪲')
 
 pages = {
-    "Páginas":[homepage, page2, page3]
+    "Páginas":[homepage, page2, page3, page5, page6, page7, page8]
 }
     
 st.navigation(pages).run()
@@ -0,0 +1,116 @@
+"""Latência dos indicadores do painel com consultas pesadas concorrentes, com e sem controle de admissão.
+
+Algumas sessões "pesadas" repetem a consulta de detalhe do painel (junção
+completa) sobre um ano inteiro, sem pausa, enquanto outras sessões pedem os
+indicadores (seção kpis) de um mês, com um intervalo entre pedidos. A mesma
+carga roda sem limite (todas as consultas vão direto ao banco) e com o
+controle de admissão da configuração (ADMISSAO_*). Mostra, para cada
+cenário, p50/p95 dos indicadores, a vazão das consultas pesadas, recusas,
+erros e a fila; falha (código de saída 1) se o p95 dos indicadores com
+controle passar do alvo.
+
+Uso: cd app && uv run python -m bench.admissao --pesadas 16 --interativas 4 --segundos 30
+"""
+import argparse
+import math
+import statistics
+import sys
+import threading
+import time
+from datetime import date
+
+from mysql.connector import Error
+
+from utils.admissao import INTERATIVA, PESADA, AdmissionController, AdmittedBackend, QueryRejected
+from utils.constants import ADMISSAO_ESPERA_S, ADMISSAO_FILA, ADMISSAO_LIMITE, ADMISSAO_POR_SESSAO
+from utils.db_functions import DASHBOARD_QUERY, get_backend
+from utils.painel import section_query
+from utils.query_control import QueryHandle
+
+ANO = 2024
+
+
+def percentile(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+def worker(backend, consulta, sessao, prioridade, fim, pausa, resultados):
+    """Repete a consulta até `fim`; acrescenta (latência s, resultado) em `resultados`"""
+    query, params = consulta
+    while time.monotonic() < fim:
+        inicio = time.perf_counter()
+        try:
+            backend.run(query, params, handle=QueryHandle(sessao=sessao, prioridade=prioridade))
+            resultado = 'ok'
+        except QueryRejected:
+            resultado = 'recusada'
+        except Error:
+            resultado = 'erro'
+        resultados.append((time.perf_counter() - inicio, resultado))
+        time.sleep(pausa)
+
+
+def run_scenario(backend, pesadas, interativas, segundos, pausa):
+    """({'interativa': [...], 'pesada': [...]} de (latência, resultado), duração)"""
+    detalhe = (DASHBOARD_QUERY, [date(ANO, 1, 1), date(ANO, 12, 31)])
+    kpis = section_query('kpis', date(ANO, 1, 1), date(ANO, 1, 31), [], [], [])
+    resultados = {'interativa': [], 'pesada': []}
+    fim = time.monotonic() + segundos
+    threads = [threading.Thread(target=worker, args=(backend, detalhe, f'pesada{i}', PESADA, fim, 0,
+                                                     resultados['pesada']))
+               for i in range(pesadas)]
+    threads += [threading.Thread(target=worker, args=(backend, kpis, f'interativa{i}', INTERATIVA, fim, pausa,
+                                                      resultados['interativa']))
+                for i in range(interativas)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return resultados, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pesadas', type=int, default=16, help='sessões com a consulta de detalhe de um ano')
+    parser.add_argument('--interativas', type=int, default=4, help='sessões pedindo os indicadores')
+    parser.add_argument('--segundos', type=float, default=30, help='duração de cada cenário')
+    parser.add_argument('--pausa', type=float, default=0.5, help='intervalo entre pedidos interativos (s)')
+    parser.add_argument('--alvo-ms', type=float, default=1000, help='p95 dos indicadores com controle')
+    args = parser.parse_args()
+
+    # O backend sem o controle do processo, para comparar os dois cenários sobre o mesmo banco
+    direto = get_backend().backend
+    sem_limite = AdmissionController(math.inf, math.inf, math.inf, math.inf, reserva=0, max_pesadas=math.inf)
+    com_limite = AdmissionController(ADMISSAO_LIMITE, ADMISSAO_FILA, ADMISSAO_POR_SESSAO, ADMISSAO_ESPERA_S)
+    print(f"{args.pesadas} sessões pesadas, {args.interativas} interativas, {args.segundos:.0f} s por cenário; "
+          f"controle: {ADMISSAO_LIMITE} executando ({com_limite.reserva} reservadas às interativas, até "
+          f"{com_limite.max_pesadas} pesadas), fila {ADMISSAO_FILA}, {ADMISSAO_POR_SESSAO} por sessão\n")
+    print(f"{'cenário':<14} {'kpis p50 (ms)':>14} {'kpis p95 (ms)':>14} {'pesadas/s':>10} {'recusadas':>10} "
+          f"{'erros':>6} {'fila máx':>9}")
+
+    p95_com = None
+    for nome, controle in (('sem controle', sem_limite), ('com controle', com_limite)):
+        resultados, duracao = run_scenario(AdmittedBackend(direto, controle), args.pesadas, args.interativas,
+                                           args.segundos, args.pausa)
+        kpis = [l * 1000 for l, r in resultados['interativa'] if r == 'ok']
+        pesadas = sum(1 for _, r in resultados['pesada'] if r == 'ok')
+        todas = resultados['interativa'] + resultados['pesada']
+        recusadas = sum(1 for _, r in todas if r == 'recusada')
+        erros = sum(1 for _, r in todas if r == 'erro')
+        p50 = f"{statistics.median(kpis):.0f}" if kpis else '-'
+        p95 = percentile(kpis, 95) if kpis else math.inf
+        print(f"{nome:<14} {p50:>14} {p95:>14.0f} {pesadas / duracao:>10.2f} {recusadas:>10} {erros:>6} "
+              f"{controle.metrics()['fila_max']:>9}")
+        if controle is com_limite:
+            p95_com = p95
+
+    ok = p95_com <= args.alvo_ms
+    print(f"\nAlvo: p95 dos indicadores com controle abaixo de {args.alvo_ms:.0f} ms — "
+          f"{'ok' if ok else 'ACIMA DO ALVO'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
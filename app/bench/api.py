@@ -0,0 +1,95 @@
+"""Vazão da API (utils.api) com clientes concorrentes: consulta nova, resultado em cache e revalidação (304).
+
+Sobe o servidor numa thread, no backend configurado, e cada cliente usa
+sua própria conexão HTTP persistente. Três cenários:
+
+- nova: cada requisição pede um período diferente (consulta no banco);
+- cache: todos pedem a mesma seção (store compartilhado);
+- 304: todos revalidam com If-None-Match (nenhum trabalho no banco).
+
+Uso: cd app && uv run python -m bench.api --clientes 8 --requisicoes 400
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from utils.api import make_server
+
+SECAO = 'vacinas'
+INICIO = date(2024, 1, 1)
+
+
+def url(fim):
+    return f"/secoes/{SECAO}?inicio={INICIO}&fim={fim}"
+
+
+def run_client(porta, caminhos, etag=None):
+    """Latências (s) das requisições do cliente, numa conexão persistente"""
+    conexao = http.client.HTTPConnection('127.0.0.1', porta)
+    cabecalhos = {'If-None-Match': etag} if etag else {}
+    tempos = []
+    try:
+        for caminho in caminhos:
+            inicio = time.perf_counter()
+            conexao.request('GET', caminho, headers=cabecalhos)
+            resposta = conexao.getresponse()
+            resposta.read()
+            tempos.append(time.perf_counter() - inicio)
+            if resposta.status not in (200, 304):
+                raise RuntimeError(f"{caminho}: HTTP {resposta.status}")
+    finally:
+        conexao.close()
+    return tempos
+
+
+def measure(porta, clientes, caminhos, etag=None):
+    """(requisições/s, mediana e p95 em ms) com os caminhos divididos entre os clientes"""
+    partes = [caminhos[i::clientes] for i in range(clientes)]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(clientes) as executor:
+        tempos = [t for lista in executor.map(lambda p: run_client(porta, p, etag), partes) for t in lista]
+    total = time.perf_counter() - inicio
+    p95 = statistics.quantiles(tempos, n=20)[-1] if len(tempos) > 1 else tempos[0]
+    return len(tempos) / total, statistics.median(tempos) * 1000, p95 * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clientes', type=int, default=8)
+    parser.add_argument('--requisicoes', type=int, default=400, help='por cenário')
+    args = parser.parse_args()
+
+    servidor = make_server(porta=0, registrar=False)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    porta = servidor.server_port
+    try:
+        # Aquece a versão dos dados e os dicionários, e obtém o ETag da seção fixa
+        conexao = http.client.HTTPConnection('127.0.0.1', porta)
+        conexao.request('GET', url(INICIO + timedelta(days=30)))
+        resposta = conexao.getresponse()
+        resposta.read()
+        etag = resposta.getheader('ETag')
+        conexao.close()
+
+        fixa = [url(INICIO + timedelta(days=30))] * args.requisicoes
+        cenarios = {
+            'nova': [url(INICIO + timedelta(days=31 + i)) for i in range(args.requisicoes)],
+            'cache': fixa,
+            '304': fixa,
+        }
+        print(f"{args.clientes} clientes, {args.requisicoes} requisições por cenário\n")
+        print(f"{'cenário':<8} {'req/s':>9} {'mediana (ms)':>13} {'p95 (ms)':>10}")
+        for nome, caminhos in cenarios.items():
+            vazao, mediana, p95 = measure(porta, args.clientes, caminhos, etag if nome == '304' else None)
+            print(f"{nome:<8} {vazao:>9.0f} {mediana:>13.2f} {p95:>10.2f}")
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+if __name__ == '__main__':
+    main()
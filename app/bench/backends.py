@@ -0,0 +1,93 @@
+"""Benchmark lado a lado dos backends MySQL e DuckDB nas consultas do painel.
+
+Para cada tamanho, gera aplicações sintéticas numa tabela de trabalho do
+MySQL, copia essa tabela e as dimensões para um arquivo DuckDB temporário e
+mede a mediana de cada seção do painel (um ano inteiro, sem filtros) nos dois
+backends, pelo mesmo caminho usado pelo app (tradução de dialeto incluída).
+
+Uso: cd app && uv run python -m bench.backends --tamanhos 100000 1000000 10000000
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+
+import duckdb
+
+from bench.sintetico import create_bench_table, extend_partitions, fill_synthetic
+from utils.backends import DuckDBBackend, MySQLBackend
+from utils.db_functions import open_connection
+from utils.painel import SECOES, section_query
+from utils.snapshot import copy_table
+
+TABELA = 'bench_backend'
+DIMENSOES = ['PacienteCompacto', 'DoseVacina', 'Sexo', 'RacaCor', 'Municipio',
+             'Vacina', 'Estabelecimento', 'EstrategiaVacinacao']
+PERIODO = (date(2024, 1, 1), date(2024, 12, 31))
+
+
+def panel_queries(tabela):
+    """Consultas das seções do painel apontadas para a tabela de trabalho"""
+    consultas = {}
+    for nome in SECOES:
+        query, params = section_query(nome, *PERIODO, [], [], [])
+        consultas[nome] = (query.replace('AplicacaoDoseCompacta', tabela), params)
+    return consultas
+
+
+def time_backend(backend, query, params, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        backend.run(query, params)
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    conn = open_connection()
+    cursor = conn.cursor()
+    mysql = MySQLBackend(lambda: contextlib.nullcontext(conn), killer=None)
+    consultas = panel_queries(TABELA)
+    resultados = []
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            for linhas in args.tamanhos:
+                print(f"Gerando {linhas:,} aplicações...")
+                create_bench_table(cursor, TABELA, particionada=True)
+                extend_partitions(conn, TABELA, PERIODO[0].isoformat(), 366)
+                fill_synthetic(conn, TABELA, linhas, inicio=PERIODO[0].isoformat(), dias=366)
+                cursor.execute(f"ANALYZE TABLE {TABELA}")
+                cursor.fetchall()
+
+                caminho = os.path.join(pasta, f'bench_{linhas}.duckdb')
+                destino = duckdb.connect(caminho)
+                for tabela in DIMENSOES + [TABELA]:
+                    copy_table(conn, destino, tabela)
+                destino.close()
+                duck = DuckDBBackend(caminho)
+
+                for nome, (query, params) in consultas.items():
+                    t_mysql = time_backend(mysql, query, params, args.repeticoes)
+                    t_duck = time_backend(duck, query, params, args.repeticoes)
+                    resultados.append((linhas, nome, t_mysql, t_duck))
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABELA}")
+        cursor.close()
+        conn.close()
+
+    print(f"\n{'linhas':>12} {'seção':<18} {'mysql (s)':>10} {'duckdb (s)':>11} {'razão':>8}")
+    for linhas, nome, t_mysql, t_duck in resultados:
+        print(f"{linhas:>12,} {nome:<18} {t_mysql:>10.3f} {t_duck:>11.3f} {t_mysql / t_duck:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
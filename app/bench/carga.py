@@ -0,0 +1,230 @@
+"""Teste de carga do app com N sessões simultâneas num único processo.
+
+Cada sessão é um AppTest de app.py (mesmo processo, caches e pools
+compartilhados, como no servidor) que navega pelas páginas: no painel muda
+período, município, vacina ou modo aproximado e aplica os filtros; às vezes
+abre as estatísticas e volta. Entre as ações há um tempo de "leitura"
+exponencial (--pensar).
+
+Para cada nível de concorrência mostra vazão de reruns, latência p50/p95/p99,
+erros, o máximo de conexões ao MySQL (Threads_connected) e de consultas em
+execução (Threads_running) amostrados durante a rodada, e o RSS do processo,
+seguidos da fila do controle de admissão (tamanho máximo, recusas e espera
+p95 por prioridade).
+
+Uso: cd app && uv run python -m bench.carga --sessoes 1 4 8 16 --segundos 60
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from mysql.connector import Error
+from streamlit.testing.v1 import AppTest
+
+from utils.constants import DB_BACKEND
+from utils.db_functions import get_admission, open_connection
+
+APP = Path(__file__).resolve().parent.parent / 'app.py'
+PAINEL = 'views/2_painel.py'
+ESTATISTICAS = 'views/3_estatisticas.py'
+ANO = 2024
+
+# Ação da sessão -> peso (frequência relativa)
+ACOES = {
+    'periodo': 40,
+    'municipio': 25,
+    'vacina': 15,
+    'aproximado': 5,
+    'estatisticas': 15,
+}
+
+
+def rss_mb():
+    """RSS atual do processo (Linux); fora dele, o pico"""
+    try:
+        with open('/proc/self/status') as status:
+            linha = next(l for l in status if l.startswith('VmRSS:'))
+        return int(linha.split()[1]) / 1024
+    except (OSError, StopIteration):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ConnectionSampler(threading.Thread):
+    """Amostra Threads_connected e Threads_running do MySQL e guarda os máximos"""
+
+    def __init__(self, intervalo=0.5):
+        super().__init__(daemon=True)
+        self.intervalo = intervalo
+        self.maximos = {'Threads_connected': 0, 'Threads_running': 0}
+        self._parar = threading.Event()
+
+    def run(self):
+        try:
+            conn = open_connection()
+        except Error:
+            return
+        cursor = conn.cursor()
+        try:
+            while not self._parar.wait(self.intervalo):
+                cursor.execute("SHOW GLOBAL STATUS WHERE Variable_name IN ('Threads_connected', 'Threads_running')")
+                for nome, valor in cursor.fetchall():
+                    # A conexão da própria amostragem não conta
+                    self.maximos[nome] = max(self.maximos[nome], int(valor) - 1)
+        finally:
+            cursor.close()
+            conn.close()
+
+    def stop(self):
+        self._parar.set()
+        self.join()
+
+
+def random_period(rng):
+    """Mês, trimestre ou ano de ANO, nessa ordem de frequência"""
+    tipo = rng.choices(['mes', 'trimestre', 'ano'], [60, 30, 10])[0]
+    if tipo == 'ano':
+        return date(ANO, 1, 1), date(ANO, 12, 31)
+    meses = 1 if tipo == 'mes' else 3
+    inicio = date(ANO, rng.randrange(0, 12, meses) + 1, 1)
+    fim_mes = inicio.month + meses
+    fim = date(ANO + fim_mes // 13, (fim_mes - 1) % 12 + 1, 1) - timedelta(days=1)
+    return inicio, fim
+
+
+def _widget(lista, rotulo):
+    return next(w for w in lista if w.label == rotulo)
+
+
+def apply_filters(at):
+    _widget(at.button, "Aplicar filtros").click()
+
+
+def step(at, acao, rng):
+    """Faz a ação na página do painel e devolve as páginas a rodar (com o tempo de cada rerun)"""
+    if acao == 'estatisticas':
+        return [ESTATISTICAS, PAINEL]
+    if acao == 'periodo':
+        inicio, fim = random_period(rng)
+        at.date_input(key='data_inicio').set_value(inicio)
+        at.date_input(key='data_fim').set_value(fim)
+    elif acao in ('municipio', 'vacina'):
+        widget = _widget(at.multiselect, "Município" if acao == 'municipio' else "Vacina")
+        # Metade das vezes volta para "todos"
+        escolha = rng.sample(widget.options, min(len(widget.options), rng.randint(1, 2))) if rng.random() < 0.5 else []
+        widget.set_value(escolha)
+    elif acao == 'aproximado':
+        toggle = _widget(at.toggle, "Modo aproximado")
+        toggle.set_value(not toggle.value)
+    apply_filters(at)
+    return [None]
+
+
+def run_session(semente, fim, pensar, timeout, resultados):
+    """Uma sessão até `fim`; acrescenta (latência, página, ok) de cada rerun em `resultados`"""
+    rng = random.Random(semente)
+    at = None
+
+    def rerun(pagina=None):
+        nonlocal at
+        inicio = time.perf_counter()
+        try:
+            if at is None:
+                # Sessão nova (ou recarregada depois de um erro), como um usuário que abre o app
+                at = AppTest.from_file(str(APP), default_timeout=timeout)
+                pagina = pagina or PAINEL
+            if pagina is not None:
+                at.switch_page(pagina)
+            at.run()
+            ok = not at.exception
+        except Exception:
+            # Timeout do AppTest ou árvore de widgets inconsistente: recarrega na próxima ação
+            ok = False
+        resultados.append((time.perf_counter() - inicio, pagina or PAINEL, ok))
+        if not ok:
+            at = None
+        return ok
+
+    rerun(PAINEL)
+    while time.monotonic() < fim:
+        time.sleep(rng.expovariate(1 / pensar) if pensar > 0 else 0)
+        acao = rng.choices(list(ACOES), list(ACOES.values()))[0]
+        try:
+            paginas = step(at, acao, rng) if at is not None else [PAINEL]
+        except (StopIteration, KeyError):
+            # Página sem o widget esperado: recarrega o painel
+            paginas = [PAINEL]
+        for pagina in paginas:
+            if not rerun(pagina):
+                break
+
+
+def percentile(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+def run_level(sessoes, segundos, pensar, timeout, semente):
+    resultados = []
+    amostrador = ConnectionSampler() if DB_BACKEND == 'mysql' else None
+    get_admission().reset_metrics()
+    if amostrador:
+        amostrador.start()
+    inicio = time.perf_counter()
+    fim = time.monotonic() + segundos
+    threads = [threading.Thread(target=run_session, args=(semente + i, fim, pensar, timeout, resultados))
+               for i in range(sessoes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    decorrido = time.perf_counter() - inicio
+    if amostrador:
+        amostrador.stop()
+    return resultados, decorrido, amostrador.maximos if amostrador else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessoes', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--segundos', type=float, default=60, help='duração de cada nível')
+    parser.add_argument('--pensar', type=float, default=2.0, help='tempo médio entre ações (s)')
+    parser.add_argument('--timeout', type=float, default=120, help='limite de cada rerun (s)')
+    parser.add_argument('--semente', type=int, default=489)
+    args = parser.parse_args()
+
+    print(f"{'sessões':>7} {'reruns':>7} {'reruns/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'erros':>6} {'conexões':>9} {'executando':>11} {'RSS (MB)':>9}")
+    for sessoes in args.sessoes:
+        resultados, decorrido, conexoes = run_level(sessoes, args.segundos, args.pensar, args.timeout, args.semente)
+        latencias = [l * 1000 for l, _, ok in resultados if ok]
+        erros = sum(1 for *_, ok in resultados if not ok)
+        if not latencias:
+            print(f"{sessoes:>7} {len(resultados):>7} {'-':>9} {'-':>9} {'-':>9} {'-':>9} {erros:>6}")
+            continue
+        conectadas = conexoes['Threads_connected'] if conexoes else '-'
+        executando = conexoes['Threads_running'] if conexoes else '-'
+        print(f"{sessoes:>7} {len(resultados):>7} {len(resultados) / decorrido:>9.2f} "
+              f"{statistics.median(latencias):>9.0f} {percentile(latencias, 95):>9.0f} "
+              f"{percentile(latencias, 99):>9.0f} {erros:>6} {conectadas:>9} {executando:>11} {rss_mb():>9.0f}")
+
+        por_pagina = {}
+        for latencia, pagina, ok in resultados:
+            if ok:
+                por_pagina.setdefault(pagina, []).append(latencia * 1000)
+        for pagina, tempos in sorted(por_pagina.items()):
+            print(f"{'':>7}   {pagina}: p50 {statistics.median(tempos):.0f} ms, p95 {percentile(tempos, 95):.0f} ms")
+
+        admissao = get_admission().metrics()
+        esperas = ', '.join(f"{nome} {p['espera_p95_ms']:.0f} ms" for nome, p in admissao['prioridades'].items())
+        recusadas = sum(p['recusadas_fila_cheia'] + p['recusadas_espera'] for p in admissao['prioridades'].values())
+        print(f"{'':>7}   admissão: {admissao['executando_max']}/{admissao['limite']} executando, "
+              f"fila máx {admissao['fila_max']}, {recusadas} recusadas, espera p95: {esperas}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Busca dos k estabelecimentos mais próximos: grade (utils.espacial) contra varredura completa.
+
+Gera estabelecimentos sintéticos em escala nacional, concentrados em
+aglomerações urbanas como os reais, e mede a mediana por busca nos dois
+métodos, conferindo que devolvem as mesmas distâncias.
+
+Uso: cd app && uv run python -m bench.espacial --tamanhos 10000 100000 1000000
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from utils.espacial import GridIndex, haversine_km
+
+# Caixa aproximada do território brasileiro (lat, lon)
+LATITUDES = (-33.7, 5.2)
+LONGITUDES = (-73.9, -34.8)
+
+
+def synthetic_sites(n, cidades=2000, semente=489):
+    """`n` coordenadas em torno de `cidades` centros sorteados no território"""
+    rng = np.random.default_rng(semente)
+    centros = np.column_stack([rng.uniform(*LATITUDES, cidades), rng.uniform(*LONGITUDES, cidades)])
+    # Poucas cidades grandes concentram a maior parte dos estabelecimentos
+    pesos = rng.pareto(1.2, cidades) + 1
+    cidade = rng.choice(cidades, n, p=pesos / pesos.sum())
+    return (centros[cidade, 0] + rng.normal(0, 0.15, n),
+            centros[cidade, 1] + rng.normal(0, 0.15, n))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--buscas', type=int, default=200)
+    parser.add_argument('-k', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'estabelecimentos':>16} {'montagem (s)':>13} {'grade (ms)':>11} {'varredura (ms)':>15} {'ganho':>8}")
+    for n in args.tamanhos:
+        lats, lons = synthetic_sites(n)
+        inicio = time.perf_counter()
+        grade = GridIndex(lats, lons)
+        montagem = time.perf_counter() - inicio
+
+        t_grade, t_varredura = [], []
+        for _ in range(args.buscas):
+            lat, lon = rng.uniform(*LATITUDES), rng.uniform(*LONGITUDES)
+            inicio = time.perf_counter()
+            _, distancias = grade.nearest(lat, lon, args.k)
+            t_grade.append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            todas = haversine_km(lat, lon, lats, lons)
+            referencia = np.sort(np.partition(todas, args.k - 1)[:args.k])
+            t_varredura.append(time.perf_counter() - inicio)
+            assert np.allclose(distancias, referencia), "grade e varredura divergiram"
+
+        m_grade, m_varredura = statistics.median(t_grade) * 1000, statistics.median(t_varredura) * 1000
+        print(f"{n:>16,} {montagem:>13.2f} {m_grade:>11.3f} {m_varredura:>15.3f} {m_varredura / m_grade:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Tamanho e tempo de montagem do mapa coroplético (utils.mapa) em cada nível de simplificação.
+
+Sem --arquivo, gera municípios sintéticos na extensão do estado do RJ com
+contornos irregulares de muitos vértices (como a malha do IBGE em qualidade
+máxima). Para as geometrias originais e cada tolerância mostra os vértices, o
+tamanho do HTML do mapa (o que vai para o navegador) e a mediana do tempo de
+montagem e renderização; por fim confere o nível escolhido automaticamente
+para o estado inteiro e para um município contra o orçamento, e falha (código
+de saída 1) se algum passar.
+
+Uso: cd app && uv run python -m bench.mapa --municipios 92 --vertices 4000
+"""
+import argparse
+import math
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.mapa import MunicipalityGeometries, choropleth, count_vertices, load_geometries
+
+# Orçamento do mapa no nível escolhido automaticamente
+ORCAMENTO_KB = 1000
+ORCAMENTO_MS = 300
+
+# Extensão aproximada do estado do RJ (lat_min, lon_min, lat_max, lon_max)
+EXTENSAO = (-23.4, -44.9, -20.7, -40.9)
+
+
+def synthetic_geometries(municipios, vertices, semente=489):
+    """{chave: (nome, Polygon)} com contornos irregulares numa grade sobre EXTENSAO"""
+    rng = np.random.default_rng(semente)
+    lat_min, lon_min, lat_max, lon_max = EXTENSAO
+    colunas = math.ceil(math.sqrt(municipios * (lon_max - lon_min) / (lat_max - lat_min)))
+    linhas = math.ceil(municipios / colunas)
+    passo_lat, passo_lon = (lat_max - lat_min) / linhas, (lon_max - lon_min) / colunas
+    angulos = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+
+    geometrias = {}
+    for i in range(municipios):
+        centro_lat = lat_min + (i // colunas + 0.5) * passo_lat
+        centro_lon = lon_min + (i % colunas + 0.5) * passo_lon
+        # Raio com ondulações em várias escalas e um ruído fino de traçado
+        raio = np.ones(vertices)
+        for harmonico in (3, 7, 19, 53, 151):
+            raio += 0.6 / harmonico ** 0.7 * np.sin(harmonico * angulos + rng.uniform(0, 2 * np.pi))
+        raio += rng.normal(0, 0.01, vertices)
+        raio *= 0.45 / raio.max()
+        anel = np.column_stack([centro_lon + raio * passo_lon * np.cos(angulos),
+                                centro_lat + raio * passo_lat * np.sin(angulos)])
+        anel = np.vstack([anel, anel[:1]])
+        nome = f"MUNICIPIO {i:03d}"
+        geometrias[nome.lower()] = (nome, {'type': 'Polygon', 'coordinates': [anel.tolist()]})
+    return geometrias
+
+
+def measure(dados, geometrias, tolerancia, repeticoes):
+    """(bytes do HTML, mediana ms de montagem + renderização, tolerância usada)"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        mapa, usada, _ = choropleth(dados, geometrias, tolerancia=tolerancia)
+        html = mapa.get_root().render()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return len(html.encode()), statistics.median(tempos), usada
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--arquivo', help='GeoJSON real no lugar dos municípios sintéticos')
+    parser.add_argument('--municipios', type=int, default=92)
+    parser.add_argument('--vertices', type=int, default=4000, help='por município sintético')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    originais = load_geometries(args.arquivo) if args.arquivo else synthetic_geometries(args.municipios, args.vertices)
+    inicio = time.perf_counter()
+    geometrias = MunicipalityGeometries(originais)
+    print(f"{len(geometrias)} municípios, simplificação em {len(geometrias.niveis)} níveis: "
+          f"{time.perf_counter() - inicio:.2f} s (uma vez por processo)\n")
+
+    # Uma linha agregada por município, como a seção de municípios do painel
+    nomes = [nome for nome, _ in originais.values()]
+    doses = np.random.default_rng(1).integers(100, 100_000, len(nomes))
+    dados = pd.DataFrame({'Município': nomes, 'Total de Doses': doses})
+
+    # O nível "original" é um cache de uma tolerância só, sem perda visível
+    bruto = MunicipalityGeometries(originais, tolerancias=(1e-9,))
+    print(f"{'nível':<12} {'vértices':>10} {'HTML (KB)':>10} {'tempo (ms)':>11}")
+    tamanho, tempo, _ = measure(dados, bruto, 1e-9, args.repeticoes)
+    print(f"{'original':<12} {sum(count_vertices(g) for _, g in originais.values()):>10,} "
+          f"{tamanho / 1024:>10,.0f} {tempo:>11.0f}")
+    for tolerancia in geometrias.niveis:
+        tamanho, tempo, _ = measure(dados, geometrias, tolerancia, args.repeticoes)
+        print(f"{tolerancia:<12} {geometrias.vertices(tolerancia):>10,} {tamanho / 1024:>10,.0f} {tempo:>11.0f}")
+
+    print(f"\nNível automático (orçamento {ORCAMENTO_KB} KB, {ORCAMENTO_MS} ms):")
+    excedeu = False
+    for rotulo, linhas in (('estado', dados), ('1 município', dados.head(1))):
+        tamanho, tempo, usada = measure(linhas, geometrias, None, args.repeticoes)
+        ok = tamanho / 1024 <= ORCAMENTO_KB and tempo <= ORCAMENTO_MS
+        excedeu |= not ok
+        print(f"  {rotulo:<12} tolerância {usada:<8} {tamanho / 1024:>8,.0f} KB {tempo:>7.0f} ms  "
+              f"{'ok' if ok else 'ACIMA DO ORÇAMENTO'}")
+    sys.exit(1 if excedeu else 0)
+
+
+if __name__ == '__main__':
+    main()
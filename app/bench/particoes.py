@@ -0,0 +1,90 @@
+"""Benchmark de poda de partições no intervalo padrão do painel (um mês).
+
+Cria duas cópias sintéticas de AplicacaoDoseCompacta com as mesmas linhas, uma
+particionada por mês e outra não, e compara o plano (EXPLAIN) e o tempo das
+consultas do painel nas duas.
+
+Uso: cd app && uv run python -m bench.particoes --linhas 10000000 --anos 2
+"""
+import argparse
+import statistics
+import time
+
+from bench.sintetico import create_bench_table, extend_partitions, fill_synthetic
+from utils.db_functions import open_connection
+
+TABELA_PART = 'bench_aplicacao_particionada'
+TABELA_PLANA = 'bench_aplicacao_plana'
+
+CONSULTAS = {
+    'kpis do painel': """
+        SELECT COUNT(*), COUNT(DISTINCT sk_paciente)
+        FROM {tabela}
+        WHERE data_vacina BETWEEN '2024-01-01' AND '2024-01-31'
+    """,
+    'junção do painel': """
+        SELECT v.nome, COUNT(*)
+        FROM {tabela} ad
+        LEFT JOIN Vacina v ON ad.id_vacina = v.id
+        LEFT JOIN Estabelecimento e ON ad.cnes = e.id_cnes
+        WHERE ad.data_vacina BETWEEN '2024-01-01' AND '2024-01-31'
+        GROUP BY v.nome
+    """,
+}
+
+
+def explain_partitions(cursor, sql):
+    cursor.execute("EXPLAIN " + sql)
+    colunas = [d[0] for d in cursor.description]
+    linha = dict(zip(colunas, cursor.fetchall()[0]))
+    return linha.get('partitions'), linha.get('rows')
+
+
+def time_query(cursor, sql, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        cursor.execute(sql)
+        cursor.fetchall()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, default=10_000_000)
+    parser.add_argument('--anos', type=int, default=1, help='anos cobertos pelos dados sintéticos')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--reusar', action='store_true', help='não recria as tabelas sintéticas')
+    args = parser.parse_args()
+
+    conn = open_connection()
+    cursor = conn.cursor()
+    try:
+        if not args.reusar:
+            dias = 366 * args.anos
+            print(f"Gerando {args.linhas:,} aplicações em {args.anos} ano(s)...")
+            create_bench_table(cursor, TABELA_PART, particionada=True)
+            extend_partitions(conn, TABELA_PART, '2024-01-01', dias)
+            fill_synthetic(conn, TABELA_PART, args.linhas, dias=dias)
+            create_bench_table(cursor, TABELA_PLANA, particionada=False)
+            cursor.execute(f"INSERT INTO {TABELA_PLANA} SELECT * FROM {TABELA_PART}")
+            conn.commit()
+            for tabela in (TABELA_PART, TABELA_PLANA):
+                cursor.execute(f"ANALYZE TABLE {tabela}")
+                cursor.fetchall()
+
+        print(f"\n{'consulta':<20} {'tabela':<12} {'partições lidas':<24} {'linhas est.':>12} {'mediana (s)':>12}")
+        for nome, modelo in CONSULTAS.items():
+            for rotulo, tabela in (('particionada', TABELA_PART), ('plana', TABELA_PLANA)):
+                sql = modelo.format(tabela=tabela)
+                particoes, linhas = explain_partitions(cursor, sql)
+                mediana = time_query(cursor, sql, args.repeticoes)
+                print(f"{nome:<20} {rotulo:<12} {str(particoes or '-'):<24} {linhas or 0:>12,} {mediana:>12.3f}")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Custo por consulta do caminho antigo e do atual de execute_query.
+
+Antes: conector em Python puro, protocolo texto (o servidor analisa o SQL a
+cada chamada) e DataFrame montado a partir das tuplas. Depois: extensão C
+(se instalada), prepared statements reaproveitados por conexão (protocolo
+binário) e colunas tipadas com `typed_frame`. Mede a mediana de cada seção
+do painel com parâmetros variando a cada repetição, como no app.
+
+Uso: cd app && uv run python -m bench.protocolo --repeticoes 50
+"""
+import argparse
+import contextlib
+import statistics
+import time
+from datetime import date, timedelta
+
+import mysql.connector
+import pandas as pd
+
+from utils.backends import MySQLBackend, with_timeout
+from utils.constants import DB_CONFIG, QUERY_TIMEOUT_MS
+from utils.painel import SECOES, section_query
+
+INICIO = date(2024, 1, 1)
+
+
+def legacy_run(conn, query, params):
+    """execute_query como era: cursor comum e DataFrame inferido das tuplas"""
+    cursor = conn.cursor()
+    cursor.execute(with_timeout(query, QUERY_TIMEOUT_MS), params)
+    colunas = [d[0] for d in cursor.description]
+    df = pd.DataFrame(cursor.fetchall(), columns=colunas)
+    cursor.close()
+    return df
+
+
+def periods(repeticoes, dias=30):
+    """Janelas de `dias` deslocadas um dia a cada repetição (parâmetros distintos)"""
+    return [(INICIO + timedelta(days=i), INICIO + timedelta(days=i + dias)) for i in range(repeticoes)]
+
+
+def time_calls(executar, nome, janelas):
+    tempos = []
+    for inicio, fim in janelas:
+        query, params = section_query(nome, inicio, fim, [], [], [])
+        t0 = time.perf_counter()
+        executar(query, params)
+        tempos.append(time.perf_counter() - t0)
+    return statistics.median(tempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=50)
+    parser.add_argument('--dias', type=int, default=30, help='tamanho da janela de datas de cada consulta')
+    args = parser.parse_args()
+
+    antigo = mysql.connector.connect(use_pure=True, **DB_CONFIG)
+    novo = mysql.connector.connect(use_pure=False, **DB_CONFIG)
+    backend = MySQLBackend(lambda: contextlib.nullcontext(novo), killer=None)
+    print(f"Extensão C: {'sim' if not isinstance(novo, type(antigo)) else 'não (conector em Python puro)'}")
+
+    janelas = periods(args.repeticoes, args.dias)
+    resultados = []
+    try:
+        for nome in SECOES:
+            # Uma chamada de aquecimento por caminho (cache do servidor, preparação)
+            query, params = section_query(nome, *janelas[0], [], [], [])
+            legacy_run(antigo, query, params)
+            backend.run(query, params, QUERY_TIMEOUT_MS)
+
+            t_antes = time_calls(lambda q, p: legacy_run(antigo, q, p), nome, janelas)
+            t_depois = time_calls(lambda q, p: backend.run(q, p, QUERY_TIMEOUT_MS), nome, janelas)
+            resultados.append((nome, t_antes, t_depois))
+    finally:
+        antigo.close()
+        novo.close()
+
+    print(f"\n{'seção':<18} {'antes (ms)':>11} {'depois (ms)':>12} {'ganho':>8}")
+    for nome, t_antes, t_depois in resultados:
+        print(f"{nome:<18} {t_antes:>11.2f} {t_depois:>12.2f} {t_antes / t_depois:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Tempo da verificação de qualidade dos dados (utils.qualidade) em escala.
+
+Gera aplicações sintéticas numa cópia particionada de AplicacaoDoseCompacta
+e roda a verificação completa sobre ela, sem gravar QualidadeDados: mostra o
+tempo de cada fase (referências e aplicações), a vazão e as ocorrências
+encontradas. Falha (código de saída 1) se o total passar do alvo.
+
+Uso: cd app && uv run python -m bench.qualidade --linhas 10000000 --processos 8
+"""
+import argparse
+import os
+import sys
+import time
+
+from bench.sintetico import create_bench_table, extend_partitions, fill_synthetic
+from utils.db_functions import get_backend, open_connection
+from utils.qualidade import LOTE, VERIFICACOES, scan, scan_references
+
+TABELA = 'bench_qualidade'
+INICIO = '2024-01-01'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, default=10_000_000)
+    parser.add_argument('--processos', type=int, default=os.cpu_count())
+    parser.add_argument('--lote', type=int, default=LOTE)
+    parser.add_argument('--dias', type=int, help='janelas de N dias em vez de um mês')
+    parser.add_argument('--alvo-s', type=float, default=60)
+    parser.add_argument('--reusar', action='store_true', help='não recria a tabela sintética')
+    args = parser.parse_args()
+
+    if not args.reusar:
+        print(f"Gerando {args.linhas:,} aplicações...")
+        conn = open_connection()
+        cursor = conn.cursor()
+        try:
+            create_bench_table(cursor, TABELA, particionada=True)
+            extend_partitions(conn, TABELA, INICIO, 366)
+            fill_synthetic(conn, TABELA, args.linhas, inicio=INICIO, dias=366)
+        finally:
+            cursor.close()
+            conn.close()
+
+    inicio = time.perf_counter()
+    scan_references(get_backend(), args.lote)
+    referencias = time.perf_counter() - inicio
+
+    achados, linhas, total = scan(args.processos, TABELA, args.lote, args.dias)
+    print(f"\nReferências e pacientes: {referencias:.1f} s")
+    print(f"Total ({args.processos} processos): {total:.1f} s, {linhas:,} aplicações "
+          f"({linhas / max(total - referencias, 1e-9):,.0f} linhas/s na fase das aplicações)\n")
+    for nome, (_, descricao) in VERIFICACOES.items():
+        ocorrencias = achados.get(nome, (0,))[0]
+        if ocorrencias:
+            print(f"  {ocorrencias:>12,}  {descricao}")
+
+    estourou = total > args.alvo_s
+    print(f"\nAlvo: {args.alvo_s:.0f} s — {'ACIMA DO ALVO' if estourou else 'ok'}")
+    sys.exit(1 if estourou else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Latência das consultas pontuais de rastreamento (lotes e histórico de paciente) em escala.
+
+Gera aplicações sintéticas numa cópia de AplicacaoDoseCompacta (com os
+índices de cobertura da migração 005), sorteia lotes e pacientes presentes
+nela e mede mediana e p95 da primeira página e de uma página adiante
+(keyset), para um lote, um lote de `--lotes-por-consulta` lotes e o
+histórico de um paciente. Falha (código de saída 1) se alguma mediana
+passar do alvo.
+
+Uso: cd app && uv run python -m bench.rastreamento --linhas 10000000
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from bench.sintetico import create_bench_table, extend_partitions, fill_synthetic
+from utils.db_functions import open_connection
+from utils.rastreamento import (CHAVE_LOTE, CHAVE_PACIENTE, history_page_query, lot_page_query)
+
+TABELA = 'bench_rastreamento'
+INICIO = '2024-01-01'
+
+
+def run_page(cursor, query, params, chave):
+    """Executa a página e devolve a chave da próxima (ou None)"""
+    cursor.execute(query, params)
+    colunas = [d[0] for d in cursor.description]
+    linhas = cursor.fetchall()
+    if not linhas:
+        return None
+    ultima = dict(zip(colunas, linhas[-1]))
+    return tuple(ultima[c] for c in chave)
+
+
+def measure(cursor, montar, chave, alvos, paginas):
+    """Tempos (ms) da primeira página e da página `paginas` de cada alvo"""
+    primeira, adiante = [], []
+    for alvo in alvos:
+        apos = None
+        for pagina in range(1, paginas + 1):
+            query, params = montar(alvo, apos)
+            inicio = time.perf_counter()
+            apos = run_page(cursor, query, params, chave)
+            decorrido = (time.perf_counter() - inicio) * 1000
+            if pagina == 1:
+                primeira.append(decorrido)
+            elif pagina == paginas:
+                adiante.append(decorrido)
+            if apos is None:
+                break
+    return primeira, adiante
+
+
+def summary(tempos):
+    if not tempos:
+        return '-', '-'
+    p95 = statistics.quantiles(tempos, n=20)[-1] if len(tempos) > 1 else tempos[0]
+    return f"{statistics.median(tempos):.1f}", f"{p95:.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, default=10_000_000)
+    parser.add_argument('--amostras', type=int, default=100, help='lotes/pacientes sorteados')
+    parser.add_argument('--lotes-por-consulta', type=int, default=10)
+    parser.add_argument('--paginas', type=int, default=5, help='página medida além da primeira')
+    parser.add_argument('--alvo-ms', type=float, default=100)
+    parser.add_argument('--reusar', action='store_true', help='não recria a tabela sintética')
+    args = parser.parse_args()
+
+    conn = open_connection()
+    cursor = conn.cursor()
+    try:
+        if not args.reusar:
+            print(f"Gerando {args.linhas:,} aplicações...")
+            create_bench_table(cursor, TABELA, particionada=True)
+            extend_partitions(conn, TABELA, INICIO, 366)
+            fill_synthetic(conn, TABELA, args.linhas, inicio=INICIO, dias=366)
+            cursor.execute(f"ANALYZE TABLE {TABELA}")
+            cursor.fetchall()
+
+        cursor.execute(f"SELECT DISTINCT id_lote FROM {TABELA} ORDER BY RAND(489) LIMIT %s", (args.amostras,))
+        lotes = [l for (l,) in cursor.fetchall()]
+        cursor.execute(f"""
+            SELECT p.id_paciente FROM (SELECT DISTINCT sk_paciente FROM {TABELA} ORDER BY RAND(489) LIMIT %s) s
+            JOIN PacienteCompacto p ON p.sk_paciente = s.sk_paciente
+        """, (args.amostras,))
+        pacientes = [p for (p,) in cursor.fetchall()]
+        grupos = [lotes[i:i + args.lotes_por_consulta] for i in range(0, len(lotes), args.lotes_por_consulta)]
+
+        cenarios = {
+            '1 lote': ([[l] for l in lotes], CHAVE_LOTE,
+                       lambda ids, apos: lot_page_query(ids, apos, tabela=TABELA)),
+            f'{args.lotes_por_consulta} lotes': (grupos, CHAVE_LOTE,
+                                                 lambda ids, apos: lot_page_query(ids, apos, tabela=TABELA)),
+            'paciente': (pacientes, CHAVE_PACIENTE,
+                         lambda pid, apos: history_page_query(pid, apos, tabela=TABELA)),
+        }
+
+        # O plano deve ler só o índice da tabela de aplicações ("Using index"), já na ordem (sem "Using filesort")
+        query, params = cenarios['1 lote'][2]([lotes[0]], None)
+        cursor.execute("EXPLAIN " + query, params)
+        colunas = [d[0] for d in cursor.description]
+        plano = next(dict(zip(colunas, l)) for l in cursor.fetchall() if dict(zip(colunas, l))['table'] == 'ad')
+        print(f"\nPlano (lote): índice {plano['key']}, {plano['Extra']}")
+
+        estourou = False
+        print(f"\n{'consulta':<12} {'página 1 med/p95 (ms)':>24} {f'página {args.paginas} med/p95 (ms)':>24}")
+        for nome, (alvos, chave, montar) in cenarios.items():
+            primeira, adiante = measure(cursor, montar, chave, alvos, args.paginas)
+            estourou |= any(t and statistics.median(t) > args.alvo_ms for t in (primeira, adiante))
+            print(f"{nome:<12} {'/'.join(summary(primeira)):>24} {'/'.join(summary(adiante)):>24}")
+    finally:
+        cursor.close()
+        conn.close()
+
+    print(f"\nAlvo: mediana abaixo de {args.alvo_ms:.0f} ms — {'ACIMA DO ALVO' if estourou else 'ok'}")
+    sys.exit(1 if estourou else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Vazão de leitura do painel com 0, 1, ..., N réplicas (DB_REPLICAS).
+
+Várias threads repetem a consulta de KPIs do painel durante alguns segundos,
+roteadas como no app (rodízio entre as réplicas saudáveis); com 0 réplicas
+todas vão para o primário.
+
+Uso: cd app && DB_REPLICAS=localhost:3311 uv run python -m bench.replicas --threads 16 --segundos 10
+"""
+import argparse
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from utils.backends import MySQLBackend
+from utils.constants import DB_CONFIG, DB_REPLICAS, REPLICA_MAX_LAG_S
+from utils.painel import section_query
+from utils.replicas import HostPool, ReplicaRouter
+
+
+def read_connection(router):
+    @contextmanager
+    def conexao():
+        conn = router.read_hosts()[0].pool().get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+    return conexao
+
+
+def throughput(backend, query, params, threads, segundos):
+    fim = time.monotonic() + segundos
+    contagens = [0] * threads
+
+    def trabalhador(i):
+        while time.monotonic() < fim:
+            backend.run(query, params)
+            contagens[i] += 1
+
+    ativas = [threading.Thread(target=trabalhador, args=(i,)) for i in range(threads)]
+    for t in ativas:
+        t.start()
+    for t in ativas:
+        t.join()
+    return sum(contagens) / segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--segundos', type=float, default=10)
+    args = parser.parse_args()
+
+    query, params = section_query('kpis', date(2024, 1, 1), date(2024, 1, 31), [], [], [])
+    primario = HostPool('bench_primario', DB_CONFIG, args.threads)
+    replicas = [HostPool(f'bench_replica{i}', config, args.threads) for i, config in enumerate(DB_REPLICAS, 1)]
+
+    print(f"{'réplicas':>8} {'consultas/s':>12}")
+    for n in range(len(replicas) + 1):
+        router = ReplicaRouter(primario, replicas[:n], REPLICA_MAX_LAG_S, intervalo=60)
+        backend = MySQLBackend(read_connection(router), killer=None)
+        print(f"{n:>8} {throughput(backend, query, params, args.threads, args.segundos):>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
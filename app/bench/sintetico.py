@@ -0,0 +1,98 @@
+"""Geração de aplicações sintéticas para benchmarks em escala (10M+ linhas).
+
+As linhas são geradas no próprio servidor sobre o esquema compacto,
+reaproveitando pacientes, estabelecimentos, vacinas, estratégias e as
+entradas dos dicionários existentes, para que as junções do painel
+continuem válidas.
+"""
+from datetime import date, timedelta
+
+from utils.particoes import ensure_partitions, next_month
+
+BLOCO = 1_000_000
+
+# (tabela auxiliar, tabela de origem, coluna amostrada)
+AUXILIARES = [
+    ('_bench_pac', 'PacienteCompacto', 'sk_paciente'),
+    ('_bench_est', 'Estabelecimento', 'id_cnes'),
+    ('_bench_vac', 'Vacina', 'id'),
+    ('_bench_ev', 'EstrategiaVacinacao', 'id'),
+    ('_bench_dose', 'DoseVacina', 'id'),
+    ('_bench_loc', 'LocalAplicacao', 'id'),
+    ('_bench_via', 'ViaAdministracao', 'id'),
+    ('_bench_lote', 'LoteVacina', 'id'),
+]
+
+
+def create_bench_table(cursor, nome, particionada=True):
+    """Cria uma cópia vazia de AplicacaoDoseCompacta, com ou sem particionamento"""
+    cursor.execute(f"DROP TABLE IF EXISTS {nome}")
+    cursor.execute(f"CREATE TABLE {nome} LIKE AplicacaoDoseCompacta")
+    if not particionada:
+        cursor.execute(f"ALTER TABLE {nome} REMOVE PARTITIONING")
+
+
+def _prepare_helpers(cursor):
+    cursor.execute("DROP TABLE IF EXISTS _bench_seq")
+    cursor.execute("CREATE TABLE _bench_seq (n INT PRIMARY KEY)")
+    cursor.execute("""
+        INSERT INTO _bench_seq
+        WITH d AS (SELECT 0 AS x UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4
+                   UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9)
+        SELECT a.x + 10*b.x + 100*c.x + 1000*e.x + 10000*f.x + 100000*g.x
+        FROM d a, d b, d c, d e, d f, d g
+    """)
+    totais = {}
+    for apelido, tabela, coluna in AUXILIARES:
+        cursor.execute(f"DROP TABLE IF EXISTS {apelido}")
+        cursor.execute(f"""
+            CREATE TABLE {apelido} (rn INT PRIMARY KEY, valor VARCHAR(64))
+            SELECT ROW_NUMBER() OVER (ORDER BY {coluna}) - 1 AS rn, {coluna} AS valor FROM {tabela}
+        """)
+        cursor.execute(f"SELECT COUNT(*) FROM {apelido}")
+        totais[apelido] = max(cursor.fetchone()[0], 1)
+    return totais
+
+
+def _drop_helpers(cursor):
+    for apelido in ['_bench_seq'] + [apelido for apelido, _, _ in AUXILIARES]:
+        cursor.execute(f"DROP TABLE IF EXISTS {apelido}")
+
+
+def fill_synthetic(conn, tabela, linhas, inicio='2024-01-01', dias=366):
+    """Insere `linhas` aplicações sintéticas em `tabela`, em blocos de 1M"""
+    cursor = conn.cursor()
+    totais = _prepare_helpers(cursor)
+    try:
+        for base in range(0, linhas, BLOCO):
+            n = f"(s.n + {base})"
+            juncoes = '\n'.join(
+                f"JOIN {apelido} {apelido[7:]} ON {apelido[7:]}.rn = MOD(CRC32(CONCAT('{apelido}', {n})), {totais[apelido]})"
+                for apelido, _, _ in AUXILIARES
+            )
+            cursor.execute(f"""
+                INSERT INTO {tabela} (id_aplicacao, data_vacina, id_dose, id_local, id_via, id_lote,
+                                      cnes, id_vacina, sk_paciente, id_estrategia_vacinacao)
+                SELECT
+                    CONCAT('sint-', {n}),
+                    DATE_ADD(%s, INTERVAL MOD(CRC32({n}), {dias}) DAY),
+                    dose.valor, loc.valor, via.valor, lote.valor,
+                    est.valor, vac.valor, pac.valor, ev.valor
+                FROM _bench_seq s
+                {juncoes}
+                WHERE s.n < %s
+            """, (inicio, min(BLOCO, linhas - base)))
+            conn.commit()
+            print(f"  {min(base + BLOCO, linhas):,} linhas em {tabela}")
+    finally:
+        _drop_helpers(cursor)
+        cursor.close()
+
+
+def extend_partitions(conn, tabela, inicio, dias):
+    """Garante partições mensais para todo o intervalo sintético"""
+    fim = date.fromisoformat(inicio) + timedelta(days=dias)
+    cursor = conn.cursor()
+    criadas = ensure_partitions(cursor, next_month(fim), tabela)
+    cursor.close()
+    return criadas
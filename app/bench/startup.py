@@ -0,0 +1,91 @@
+"""Perfil de importação na partida do app e na primeira renderização de cada página.
+
+Para cada script, coleta os imports de nível de módulo (os que rodam antes
+de qualquer coisa ser desenhada) e os importa num interpretador novo com
+`python -X importtime`. Mostra a mediana do tempo total, os pacotes mais
+pesados e falha (código de saída 1) se algum script passar do orçamento.
+
+Uso: cd app && uv run python -m bench.startup --repeticoes 5
+"""
+import argparse
+import ast
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+# Orçamento (ms) de importação por script, medido num interpretador novo
+ORCAMENTO_MS = {
+    'app.py': 500,
+    'views/1_home.py': 500,
+    'views/2_painel.py': 1000,
+    'views/3_estatisticas.py': 1000,
+    'views/5_sequencias.py': 1000,
+    'views/6_rastreamento.py': 1000,
+    'views/7_proximidade.py': 1000,
+    'views/8_qualidade.py': 1000,
+}
+
+
+def module_imports(script):
+    """Módulos importados no nível do módulo do script (fora de funções)"""
+    arvore = ast.parse((APP_DIR / script).read_text(encoding='utf-8'))
+    modulos = []
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            modulos += [alias.name for alias in no.names]
+        elif isinstance(no, ast.ImportFrom) and no.module and not no.level:
+            modulos.append(no.module)
+    return list(dict.fromkeys(modulos))
+
+
+def profile_imports(modulos, ignorar=()):
+    """Importa os módulos num interpretador novo; retorna (total_ms, {pacote: ms}).
+
+    `ignorar` lista os módulos da partida do próprio interpretador (site, ...).
+    """
+    codigo = '; '.join(f'import {m}' for m in modulos)
+    saida = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', codigo],
+        cwd=APP_DIR, capture_output=True, text=True, check=True,
+    ).stderr
+
+    pacotes = {}
+    for linha in saida.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, cumulativo, nome = linha.split('|')
+        # Só os imports de primeiro nível: os aninhados já estão no cumulativo
+        if nome.startswith('  ') or not nome.strip() or nome.strip() in ignorar:
+            continue
+        pacotes[nome.strip()] = int(cumulativo) / 1000
+    return sum(pacotes.values()), pacotes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5, help='pacotes mais pesados listados por script')
+    args = parser.parse_args()
+
+    interpretador = set(profile_imports([])[1])
+    estourou = False
+    for script, orcamento in ORCAMENTO_MS.items():
+        modulos = module_imports(script)
+        medicoes = [profile_imports(modulos, interpretador) for _ in range(args.repeticoes)]
+        total = statistics.median(m[0] for m in medicoes)
+        pacotes = medicoes[-1][1]
+
+        situacao = 'ok' if total <= orcamento else 'ACIMA DO ORÇAMENTO'
+        estourou |= total > orcamento
+        print(f"\n{script}: {total:,.0f} ms (orçamento {orcamento:,} ms) {situacao}")
+        for nome, ms in sorted(pacotes.items(), key=lambda p: -p[1])[:args.top]:
+            print(f"    {ms:>8,.0f} ms  {nome}")
+
+    sys.exit(1 if estourou else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""Controle de admissão das consultas de leitura, para não sobrecarregar o banco.
+
+Cada consulta pede uma vaga antes de executar. Há no máximo `limite`
+consultas executando por processo e no máximo `por_sessao` de uma mesma
+sessão; as demais esperam numa fila de até `fila` pedidos. Quando vaga uma
+vaga, entra o pedido de maior prioridade (INTERATIVA: indicadores e opções
+de filtro; NORMAL; PESADA: junções completas e exportações) e, entre os de
+mesma prioridade, o da sessão com menos consultas executando e, depois, o da
+sessão atendida há mais tempo (rodízio entre as sessões), por fim o mais
+antigo.
+
+A prioridade só ordena a fila; para que os indicadores não esperem uma
+junção completa terminar, parte das vagas fica reservada às consultas
+INTERATIVA (`reserva`) e as PESADA ocupam no máximo `max_pesadas` vagas.
+
+Com a fila cheia, um pedido novo de prioridade maior que o pior da fila toma
+o lugar dele; senão é recusado. Pedidos que esperam mais de `espera_s`
+segundos também são recusados. A recusa é um QueryRejected (um
+mysql.connector.Error), tratado como os demais erros de consulta.
+
+`AdmittedBackend` envolve um backend (utils.backends) e passa cada run e
+stream pelo controle, lendo a sessão e a prioridade do QueryHandle.
+"""
+import itertools
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from mysql.connector import Error
+
+from utils.query_control import QueryCancelled
+
+INTERATIVA, NORMAL, PESADA = 0, 1, 2
+PRIORIDADES = {INTERATIVA: 'interativa', NORMAL: 'normal', PESADA: 'pesada'}
+
+# Intervalo (s) entre as verificações de cancelamento e de limite de espera
+INTERVALO = 0.1
+
+
+class QueryRejected(Error):
+    """A consulta foi recusada pelo controle de admissão (fila cheia ou espera longa demais)"""
+
+
+class _Pedido:
+    __slots__ = ('prioridade', 'sessao', 'ordem', 'chegada', 'admitido', 'recusa')
+
+    def __init__(self, prioridade, sessao, ordem):
+        self.prioridade = prioridade
+        self.sessao = sessao
+        self.ordem = ordem
+        self.chegada = time.monotonic()
+        self.admitido = False
+        self.recusa = None
+
+
+class AdmissionController:
+    """Limite global de consultas simultâneas, fila com prioridade e cota por sessão.
+
+    Sessão None (scripts, tarefas sem sessão) não tem cota própria, só o
+    limite global.
+    """
+
+    def __init__(self, limite, fila, por_sessao, espera_s, reserva=None, max_pesadas=None, amostras=2000):
+        self.limite = limite
+        # Padrões: um quarto das vagas reservado (ao menos uma, sem tomar todas) e metade para as pesadas
+        self.reserva = min(max(1, limite // 4), limite - 1) if reserva is None else reserva
+        self.max_pesadas = max(1, limite // 2) if max_pesadas is None else max_pesadas
+        self.tamanho_fila = fila
+        self.por_sessao = por_sessao
+        self.espera_s = espera_s
+        self._cond = threading.Condition()
+        self._ordem = itertools.count()
+        self._fila = []
+        self._executando = 0
+        self._por_prioridade = Counter()
+        self._por_sessao = Counter()
+        # Número da última admissão de cada sessão com pedidos na fila ou executando
+        self._atendida = {}
+        self._admissoes = itertools.count()
+        self._amostras = amostras
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        with self._cond:
+            self._esperas = {p: deque(maxlen=self._amostras) for p in PRIORIDADES}
+            self._admitidas = Counter()
+            self._recusadas = Counter()
+            self._canceladas = 0
+            self._fila_max = len(self._fila)
+            self._executando_max = self._executando
+
+    # ----- escalonamento (com o lock) -----
+    def _eligible(self, pedido):
+        if pedido.sessao is not None and self._por_sessao[pedido.sessao] >= self.por_sessao:
+            return False
+        if pedido.prioridade == INTERATIVA:
+            return True
+        if pedido.prioridade == PESADA and self._por_prioridade[PESADA] >= self.max_pesadas:
+            return False
+        return self._executando < self.limite - self.reserva
+
+    def _dispatch(self):
+        """Admite os melhores pedidos elegíveis enquanto houver vaga"""
+        admitiu = False
+        while self._executando < self.limite:
+            elegiveis = [p for p in self._fila if self._eligible(p)]
+            if not elegiveis:
+                break
+            pedido = min(elegiveis, key=lambda p: (p.prioridade, self._por_sessao[p.sessao],
+                                                   self._atendida.get(p.sessao, -1), p.ordem))
+            self._fila.remove(pedido)
+            pedido.admitido = True
+            self._executando += 1
+            self._por_prioridade[pedido.prioridade] += 1
+            self._executando_max = max(self._executando_max, self._executando)
+            if pedido.sessao is not None:
+                self._por_sessao[pedido.sessao] += 1
+                self._atendida[pedido.sessao] = next(self._admissoes)
+            self._admitidas[pedido.prioridade] += 1
+            self._esperas[pedido.prioridade].append(time.monotonic() - pedido.chegada)
+            admitiu = True
+        if admitiu:
+            self._cond.notify_all()
+
+    def _enqueue(self, pedido):
+        """Põe o pedido na fila; com ela cheia, desloca o pior pedido de prioridade menor ou recusa"""
+        vaga_imediata = self._executando < self.limite and self._eligible(pedido)
+        if len(self._fila) >= self.tamanho_fila and not vaga_imediata:
+            pior = max(self._fila, key=lambda p: (p.prioridade, p.ordem), default=None)
+            if pior is None or pior.prioridade <= pedido.prioridade:
+                self._reject(pedido, 'fila cheia')
+                raise self._error(pedido)
+            self._fila.remove(pior)
+            self._reject(pior, 'fila cheia')
+            self._cond.notify_all()
+        self._fila.append(pedido)
+        self._fila_max = max(self._fila_max, len(self._fila))
+
+    def _reject(self, pedido, motivo):
+        pedido.recusa = motivo
+        self._recusadas[(pedido.prioridade, motivo)] += 1
+
+    def _error(self, pedido):
+        if pedido.recusa == 'fila cheia':
+            return QueryRejected(msg=f"Banco de dados sobrecarregado ({self._executando} consultas executando e "
+                                     f"{len(self._fila)} na fila). Tente novamente em alguns segundos.")
+        return QueryRejected(msg=f"A consulta esperou mais de {self.espera_s:g}s por uma vaga no banco de dados. "
+                                 "Tente novamente em alguns segundos ou reduza o período.")
+
+    def _release(self, pedido):
+        self._executando -= 1
+        self._por_prioridade[pedido.prioridade] -= 1
+        if pedido.sessao is not None:
+            self._por_sessao[pedido.sessao] -= 1
+            if not self._por_sessao[pedido.sessao]:
+                del self._por_sessao[pedido.sessao]
+            self._forget(pedido.sessao)
+        self._dispatch()
+
+    def _forget(self, sessao):
+        """Descarta o rodízio da sessão sem pedidos executando nem na fila"""
+        if sessao not in self._por_sessao and not any(p.sessao == sessao for p in self._fila):
+            self._atendida.pop(sessao, None)
+
+    # ----- interface -----
+    @contextmanager
+    def admit(self, prioridade=NORMAL, sessao=None, handle=None, aguardar=None):
+        """Espera uma vaga e a ocupa durante o bloco.
+
+        Levanta QueryRejected se a fila estiver cheia ou a espera passar de
+        `espera_s`, e QueryCancelled se `handle` for cancelado na fila.
+        `aguardar` é chamado a cada INTERVALO enquanto espera (ponto de
+        interrupção do Streamlit) e pode levantar exceção para desistir.
+        """
+        pedido = _Pedido(prioridade, sessao, next(self._ordem))
+        with self._cond:
+            self._enqueue(pedido)
+            self._dispatch()
+        try:
+            while True:
+                with self._cond:
+                    if pedido.admitido:
+                        break
+                    if pedido.recusa:
+                        raise self._error(pedido)
+                    if handle is not None and handle.cancelled:
+                        self._canceladas += 1
+                        raise QueryCancelled()
+                    if time.monotonic() - pedido.chegada >= self.espera_s:
+                        self._reject(pedido, 'espera')
+                        raise self._error(pedido)
+                    self._cond.wait(INTERVALO)
+                if aguardar is not None:
+                    aguardar()
+        except BaseException:
+            with self._cond:
+                if pedido.admitido:
+                    self._release(pedido)
+                elif pedido in self._fila:
+                    self._fila.remove(pedido)
+                    self._forget(pedido.sessao)
+            raise
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._release(pedido)
+
+    def metrics(self):
+        """Fila, consultas executando, admissões, recusas e espera (p50/p95/máx, ms) por prioridade"""
+        with self._cond:
+            fila = Counter(p.prioridade for p in self._fila)
+            resumo = {
+                'limite': self.limite,
+                'reserva': self.reserva,
+                'max_pesadas': self.max_pesadas,
+                'executando': self._executando,
+                'executando_max': self._executando_max,
+                'fila': len(self._fila),
+                'fila_max': self._fila_max,
+                'tamanho_fila': self.tamanho_fila,
+                'sessoes_executando': len(self._por_sessao),
+                'canceladas_na_fila': self._canceladas,
+                'prioridades': {},
+            }
+            for prioridade, nome in PRIORIDADES.items():
+                esperas = sorted(self._esperas[prioridade])
+                resumo['prioridades'][nome] = {
+                    'executando': self._por_prioridade[prioridade],
+                    'fila': fila[prioridade],
+                    'admitidas': self._admitidas[prioridade],
+                    'recusadas_fila_cheia': self._recusadas[(prioridade, 'fila cheia')],
+                    'recusadas_espera': self._recusadas[(prioridade, 'espera')],
+                    'espera_p50_ms': _percentile_ms(esperas, 50),
+                    'espera_p95_ms': _percentile_ms(esperas, 95),
+                    'espera_max_ms': _percentile_ms(esperas, 100),
+                }
+            return resumo
+
+
+def _percentile_ms(ordenados, p):
+    if not ordenados:
+        return 0.0
+    return round(ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))] * 1000, 1)
+
+
+class AdmittedBackend:
+    """Backend que passa cada consulta pelo controle de admissão antes de executá-la.
+
+    A sessão e a prioridade vêm do handle da consulta; sem prioridade, run
+    é NORMAL e stream (exportações) é PESADA.
+    """
+
+    def __init__(self, backend, controle, aguardar=None):
+        self.backend = backend
+        self.controle = controle
+        self._aguardar = aguardar
+
+    def _admit(self, handle, padrao):
+        prioridade = getattr(handle, 'prioridade', None)
+        return self.controle.admit(padrao if prioridade is None else prioridade, getattr(handle, 'sessao', None),
+                                   handle, self._aguardar)
+
+    def run(self, query, params=None, timeout_ms=None, handle=None):
+        with self._admit(handle, NORMAL):
+            return self.backend.run(query, params, timeout_ms, handle)
+
+    def stream(self, query, params=None, lote=50_000, handle=None, timeout_ms=None):
+        """Como o stream do backend; a vaga fica ocupada até o gerador terminar ou ser fechado"""
+        with self._admit(handle, PESADA):
+            yield from self.backend.stream(query, params, lote, handle, timeout_ms)
+
+    def kill(self, connection_id):
+        self.backend.kill(connection_id)
+
+    def __getattr__(self, nome):
+        return getattr(self.backend, nome)
@@ -0,0 +1,106 @@
+"""Amostra estratificada das aplicações e estimativas com intervalo de confiança.
+
+A amostra é estratificada por mês e município do estabelecimento: cada
+estrato h com N_h aplicações contribui com n_h linhas sorteadas. O total de
+uma categoria c é estimado por
+
+    N̂_c = Σ_h N_h · n_hc / n_h
+
+com variância Σ_h N_h² (1 − n_h/N_h) p_hc (1 − p_hc) / (n_h − 1), p_hc = n_hc/n_h.
+
+Uso: cd app && uv run python -m utils.amostragem --fracao 0.01
+"""
+import argparse
+
+import numpy as np
+
+from utils.db_functions import open_connection
+
+Z_95 = 1.96
+
+
+def refresh_sample(conn, fracao=0.01, minimo=50, semente=489):
+    """Regera EstratoAmostra e AmostraAplicacao.
+
+    Cada estrato é amostrado com taxa `fracao`, elevada para garantir cerca de
+    `minimo` linhas nos estratos pequenos (estratos menores são copiados
+    inteiros).
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM AmostraAplicacao")
+    cursor.execute("DELETE FROM EstratoAmostra")
+    cursor.execute("""
+        INSERT INTO EstratoAmostra (mes, municipio, total)
+        SELECT DATE_SUB(ad.data_vacina, INTERVAL (DAYOFMONTH(ad.data_vacina) - 1) DAY),
+               COALESCE(e.municipio, ''),
+               COUNT(*)
+        FROM AplicacaoDoseCompacta ad
+        LEFT JOIN Estabelecimento e ON ad.cnes = e.id_cnes
+        GROUP BY 1, 2
+    """)
+    cursor.execute("""
+        INSERT INTO AmostraAplicacao
+            (id_aplicacao, data_vacina, mes, estrato, id_dose, id_vacina,
+             sk_paciente, cnes, id_estrategia_vacinacao)
+        SELECT ad.id_aplicacao, ad.data_vacina, ea.mes, ea.municipio, ad.id_dose, ad.id_vacina,
+               ad.sk_paciente, ad.cnes, ad.id_estrategia_vacinacao
+        FROM AplicacaoDoseCompacta ad
+        LEFT JOIN Estabelecimento e ON ad.cnes = e.id_cnes
+        JOIN EstratoAmostra ea
+          ON ea.mes = DATE_SUB(ad.data_vacina, INTERVAL (DAYOFMONTH(ad.data_vacina) - 1) DAY)
+         AND ea.municipio = COALESCE(e.municipio, '')
+        WHERE RAND(%s) < GREATEST(%s, %s / ea.total)
+    """, (semente, fracao, minimo))
+    cursor.execute("""
+        UPDATE EstratoAmostra ea
+        JOIN (SELECT mes, estrato, COUNT(*) AS n FROM AmostraAplicacao GROUP BY mes, estrato) a
+          ON a.mes = ea.mes AND a.estrato = ea.municipio
+        SET ea.amostrados = a.n
+    """)
+    conn.commit()
+    cursor.execute("SELECT COUNT(*), SUM(total) FROM EstratoAmostra WHERE amostrados > 0")
+    estratos, _ = cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) FROM AmostraAplicacao")
+    (linhas,) = cursor.fetchone()
+    cursor.close()
+    return estratos, linhas
+
+
+def estimate_totals(amostra, chaves, z=Z_95):
+    """Estima contagens por categoria a partir das contagens por estrato.
+
+    `amostra` tem as colunas `chaves`, count (n_hc), total_estrato (N_h) e
+    amostrados_estrato (n_h), uma linha por (categoria, estrato). Retorna as chaves com count (estimado), erro (meia
+    largura do IC) e as colunas ic_inf/ic_sup.
+    """
+    N = amostra['total_estrato'].astype(float)
+    n = amostra['amostrados_estrato'].astype(float)
+    p = amostra['count'].astype(float) / n
+    fpc = (1 - n / N).clip(lower=0)
+    variancia = np.where(n > 1, N ** 2 * fpc * p * (1 - p) / (n - 1).clip(lower=1), 0.0)
+
+    parcial = amostra[chaves].copy()
+    parcial['count'] = N * p
+    parcial['variancia'] = variancia
+    estimado = parcial.groupby(chaves, as_index=False, dropna=False)[['count', 'variancia']].sum()
+
+    erro = z * np.sqrt(estimado.pop('variancia'))
+    estimado['erro'] = erro.round()
+    estimado['ic_inf'] = (estimado['count'] - erro).clip(lower=0).round()
+    estimado['ic_sup'] = (estimado['count'] + erro).round()
+    estimado['count'] = estimado['count'].round()
+    return estimado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fracao', type=float, default=0.01, help='fração amostrada por estrato')
+    parser.add_argument('--minimo', type=int, default=50, help='linhas mínimas por estrato')
+    args = parser.parse_args()
+
+    conn = open_connection()
+    try:
+        estratos, linhas = refresh_sample(conn, args.fracao, args.minimo)
+        print(f"Amostra regerada: {linhas:,} linhas em {estratos:,} estratos")
+    finally:
+        conn.close()
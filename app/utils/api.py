@@ -0,0 +1,211 @@
+"""API HTTP somente leitura com os resultados do painel e da página de estatísticas, em JSON ou Arrow.
+
+Rotas (GET):
+  /secoes                       seções do painel e consultas de estatísticas disponíveis
+  /secoes/<nome>?inicio=2024-01-01&fim=2024-01-31[&municipio=..][&dose=..][&vacina=..][&cnes=..][&uf=..]
+                                seção do painel (ou "temporal"), com os mesmos filtros (repetíveis)
+  /estatisticas/<nome>          consulta nomeada da página de estatísticas
+  /metricas                     fila e tempos de espera do controle de admissão deste processo
+
+O formato padrão é JSON (lista de registros); Arrow IPC (stream) com
+?formato=arrow ou Accept: application/vnd.apache.arrow.stream.
+
+Cada resposta leva um ETag calculado da versão dos dados (load_data_version),
+da rota e dos parâmetros, antes de montar qualquer consulta: um
+If-None-Match igual devolve 304 sem trabalho no banco. As consultas são as
+mesmas das páginas (section_request, time_series_request, statistic_request) e os
+resultados passam pelo store compartilhado, que coalesce pedidos iguais.
+Cada cliente (endereço IP) conta como uma sessão no controle de admissão;
+consultas recusadas por ele respondem 503.
+
+Uso: cd app && uv run python -m utils.api --porta 8600
+"""
+import argparse
+import functools
+import hashlib
+import json
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pyarrow as pa
+from mysql.connector import Error, errorcode, pooling
+
+from utils.db_functions import (QueryRejected, dashboard_key, get_admission, get_result_store, kill_query,
+                                load_data_version, time_series_request)
+from utils.estatisticas import CONSULTAS, statistic_request
+from utils.painel import SECOES, section_request
+from utils.query_control import QueryCancelled, QueryHandle
+
+ARROW = 'application/vnd.apache.arrow.stream'
+JSON = 'application/json; charset=utf-8'
+
+# Parâmetro da URL -> filtro do painel (repetíveis)
+FILTROS = {'municipio': 'municipios', 'dose': 'doses', 'vacina': 'vacinas', 'cnes': 'estabelecimentos', 'uf': 'ufs'}
+
+
+class ApiError(Exception):
+    """Erro com o status HTTP da resposta"""
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _period(params):
+    try:
+        return date.fromisoformat(params['inicio'][0]), date.fromisoformat(params['fim'][0])
+    except KeyError:
+        raise ApiError(400, "Parâmetros inicio e fim são obrigatórios (AAAA-MM-DD)")
+    except ValueError as e:
+        raise ApiError(400, f"Data inválida: {e}")
+
+
+def panel_request(nome, params):
+    """(chave, loader) da seção do painel com os filtros da URL"""
+    inicio, fim = _period(params)
+    filtros = {destino: params.get(origem, []) for origem, destino in FILTROS.items()}
+    try:
+        filtros['estabelecimentos'] = [int(c) for c in filtros['estabelecimentos']]
+    except ValueError:
+        raise ApiError(400, "cnes deve ser numérico")
+    posicionais = (inicio, fim, filtros['municipios'], filtros['doses'], filtros['vacinas'],
+                   filtros['estabelecimentos'], filtros['ufs'])
+
+    if nome == 'temporal':
+        chave, loader, _ = time_series_request(*posicionais)
+        return chave, loader
+    if nome not in SECOES:
+        raise ApiError(404, f"Seção desconhecida: {nome}")
+    return section_request(nome, dashboard_key(inicio, fim, **filtros)[1:], *posicionais)
+
+
+def statistics_request(nome):
+    """(chave, loader) da consulta nomeada da página de estatísticas"""
+    if nome not in CONSULTAS:
+        raise ApiError(404, f"Consulta desconhecida: {nome}")
+    return statistic_request(nome)
+
+
+def resolve(caminho, params):
+    partes = [p for p in caminho.split('/') if p]
+    if len(partes) == 2 and partes[0] == 'secoes':
+        return panel_request(partes[1], params)
+    if len(partes) == 2 and partes[0] == 'estatisticas':
+        return statistics_request(partes[1])
+    raise ApiError(404, f"Rota desconhecida: {caminho}")
+
+
+def etag(versao, caminho, params, formato):
+    """ETag forte da resposta; a ordem dos parâmetros e dos valores repetidos não importa"""
+    canonico = (versao, caminho.rstrip('/'), formato,
+                sorted((k, sorted(v)) for k, v in params.items() if k != 'formato'))
+    return '"' + hashlib.sha1(repr(canonico).encode()).hexdigest()[:24] + '"'
+
+
+def render(versao, chave, loader, formato, sessao=None):
+    """Corpo da resposta, carregado pelo store (a versão dos dados entra na chave)"""
+    store = get_result_store()
+    chave = ('api', versao) + chave
+    handle = QueryHandle(killer=kill_query, sessao=sessao)
+    df, lease = store.acquire(chave, functools.partial(loader, handle))
+    try:
+        if formato == 'arrow':
+            tabela = store.arrow(chave)
+            if tabela is None:
+                tabela = pa.Table.from_pandas(df, preserve_index=False)
+            saida = pa.BufferOutputStream()
+            with pa.ipc.new_stream(saida, tabela.schema) as escritor:
+                escritor.write_table(tabela)
+            return saida.getvalue().to_pybytes()
+        return df.to_json(orient='records', date_format='iso', force_ascii=False, default_handler=str).encode()
+    finally:
+        lease.release()
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalhos e corpo saem em escritas separadas: com Nagle, a conexão
+    # persistente esperaria o ACK atrasado do cliente (~40 ms) a cada resposta
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        arrow = params.get('formato') == ['arrow'] or ARROW in self.headers.get('Accept', '')
+        formato = 'arrow' if arrow else 'json'
+        try:
+            if url.path.rstrip('/') in ('', '/secoes'):
+                indice = {'secoes': list(SECOES) + ['temporal'], 'estatisticas': list(CONSULTAS)}
+                self._send(200, json.dumps(indice).encode(), JSON)
+                return
+            if url.path.rstrip('/') == '/metricas':
+                self._send(200, json.dumps(get_admission().metrics()).encode(), JSON)
+                return
+
+            try:
+                versao = load_data_version()
+            except LookupError as e:
+                raise ApiError(503, str(e)) from e
+            tag = etag(versao, url.path, params, formato)
+            enviadas = [t.strip() for t in self.headers.get('If-None-Match', '').split(',')]
+            if tag in enviadas or '*' in enviadas:
+                self._send(304, b'', None, tag)
+                return
+
+            chave, loader = resolve(url.path, params)
+            corpo = render(versao, chave, loader, formato, sessao=('api', self.client_address[0]))
+            self._send(200, corpo, ARROW if arrow else JSON, tag)
+        except ApiError as e:
+            self._error(e.status, str(e))
+        except QueryCancelled as e:
+            self._error(503, str(e))
+        except QueryRejected as e:
+            self._error(503, e.msg)
+        except pooling.PoolError as e:
+            self._error(503, f"Banco de dados ocupado: {e}")
+        except Error as e:
+            self._error(504 if e.errno == errorcode.ER_QUERY_TIMEOUT else 500, str(e))
+
+    def _send(self, status, corpo, tipo, tag=None):
+        self.send_response(status)
+        if tipo:
+            self.send_header('Content-Type', tipo)
+        if tag:
+            self.send_header('ETag', tag)
+            # O cliente pode guardar, mas revalida sempre (barato com If-None-Match)
+            self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _error(self, status, mensagem):
+        self._send(status, json.dumps({'erro': mensagem}, ensure_ascii=False).encode(), JSON)
+
+    def log_message(self, formato, *args):
+        if self.server.registrar:
+            super().log_message(formato, *args)
+
+
+def make_server(host='127.0.0.1', porta=8600, registrar=True):
+    """Servidor com uma thread por conexão; a concorrência no banco é limitada pelo controle de admissão"""
+    servidor = ThreadingHTTPServer((host, porta), ApiHandler)
+    servidor.daemon_threads = True
+    servidor.registrar = registrar
+    return servidor
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8600)
+    args = parser.parse_args()
+
+    servidor = make_server(args.host, args.porta)
+    print(f"API em http://{args.host}:{servidor.server_port}/secoes")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
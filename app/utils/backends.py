@@ -0,0 +1,364 @@
+"""Backends de execução das consultas de leitura do app.
+
+`MySQLBackend` executa no servidor, em conexões do pool. `DuckDBBackend`
+executa as mesmas consultas em processo, sobre um snapshot local gerado por
+`python -m utils.snapshot`; o SQL do app passa por `translate_mysql`, que
+cobre as diferenças de dialeto usadas pelas páginas.
+
+Os dois expõem run(query, params, timeout_ms, handle) -> DataFrame,
+stream(query, params, lote, handle) -> RecordBatches do Arrow (exportação) e
+kill(connection_id), e sinalizam erros com mysql.connector.Error para que o
+tratamento existente (report_query_error, stream_results) valha para ambos.
+"""
+import itertools
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from mysql.connector import HAVE_CEXT, Error, errorcode
+from mysql.connector.constants import FieldType
+
+from utils.query_control import QueryCancelled
+
+_SELECT = re.compile(r'^\s*SELECT\b', re.IGNORECASE)
+
+
+def with_timeout(query, timeout_ms):
+    """Adiciona o hint MAX_EXECUTION_TIME a consultas SELECT"""
+    if not timeout_ms or not _SELECT.match(query):
+        return query
+    return _SELECT.sub(lambda m: f"{m.group(0)} /*+ MAX_EXECUTION_TIME({int(timeout_ms)}) */", query, count=1)
+
+
+_INTEIROS = {FieldType.TINY, FieldType.SHORT, FieldType.INT24, FieldType.LONG, FieldType.LONGLONG, FieldType.YEAR}
+_REAIS = {FieldType.FLOAT, FieldType.DOUBLE, FieldType.DECIMAL, FieldType.NEWDECIMAL}
+_DATAS = {FieldType.DATE, FieldType.NEWDATE, FieldType.DATETIME, FieldType.TIMESTAMP}
+
+
+def typed_frame(descricao, linhas):
+    """Monta o DataFrame coluna a coluna, com arrays do tipo declarado pelo servidor.
+
+    Inteiros viram int64 (Int64 se houver NULL), decimais e reais float64 e
+    datas datetime64; o resto fica como objeto. Evita a inferência de tipos
+    do pandas sobre as tuplas e as colunas de Decimal/date como objetos.
+    """
+    nomes = [d[0] for d in descricao]
+    valores = list(zip(*linhas)) if linhas else [()] * len(nomes)
+    colunas = {}
+    for (nome, tipo, *_), coluna in zip(descricao, valores):
+        if tipo in _INTEIROS:
+            colunas[nome] = (pd.array(coluna, dtype='Int64') if None in coluna
+                             else np.array(coluna, dtype=np.int64))
+        elif tipo in _REAIS:
+            colunas[nome] = np.array(coluna, dtype=np.float64)
+        elif tipo in _DATAS:
+            colunas[nome] = np.array(coluna, dtype='datetime64[ns]')
+        else:
+            colunas[nome] = np.array(coluna, dtype=object)
+    return pd.DataFrame(colunas, columns=nomes)
+
+
+def typed_batch(descricao, linhas):
+    """RecordBatch do Arrow com o mesmo mapeamento de tipos de `typed_frame`.
+
+    O tipo de cada coluna vem da descrição do cursor, não dos valores, para
+    que todos os lotes de um mesmo resultado tenham o mesmo esquema.
+    """
+    # pyarrow só é carregado por quem exporta
+    import pyarrow as pa
+
+    valores = list(zip(*linhas)) if linhas else [()] * len(descricao)
+    campos, arrays = [], []
+    for (nome, tipo, *_), coluna in zip(descricao, valores):
+        if tipo in _INTEIROS:
+            array = pa.array(coluna, type=pa.int64())
+        elif tipo in _REAIS:
+            array = pa.array(np.array(coluna, dtype=np.float64), from_pandas=True)
+        elif tipo in (FieldType.DATE, FieldType.NEWDATE):
+            array = pa.array(coluna, type=pa.date32())
+        elif tipo in _DATAS:
+            array = pa.array(coluna, type=pa.timestamp('us'))
+        else:
+            array = pa.array(coluna, type=pa.string())
+        campos.append(pa.field(nome, array.type))
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, schema=pa.schema(campos))
+
+
+class MySQLBackend:
+    """Consultas no MySQL; `conexao()` empresta uma conexão (context manager).
+
+    SELECTs rodam como prepared statements (protocolo binário), guardados por
+    conexão física e pelo texto do comando: as consultas do app são um
+    conjunto pequeno e fixo, então cada uma é analisada pelo servidor uma
+    vez por conexão. As conexões do pool não podem ter a sessão reiniciada
+    ao serem devolvidas (pool_reset_session=False), o que descartaria os
+    statements no servidor. Sem a extensão C do conector, as consultas usam
+    cursores comuns (protocolo de texto).
+    """
+
+    nome = 'mysql'
+
+    def __init__(self, conexao, killer, preparar=HAVE_CEXT, max_preparadas=64):
+        self._conexao = conexao
+        self._killer = killer
+        self.preparar = preparar
+        self.max_preparadas = max_preparadas
+        self._preparadas = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _prepared_cursor(self, conn, sql):
+        """(texto, cursor) preparado para o comando nesta conexão física.
+
+        O cursor só reaproveita o statement se receber o mesmo objeto str da
+        preparação, por isso o texto guardado é devolvido junto.
+        """
+        fisica = getattr(conn, '_cnx', conn)
+        with self._lock:
+            cache = self._preparadas.setdefault(fisica, OrderedDict())
+        item = cache.get(sql)
+        if item is not None:
+            cache.move_to_end(sql)
+            return item
+        item = cache[sql] = (sql, conn.cursor(prepared=True))
+        if len(cache) > self.max_preparadas:
+            _, (_, antigo) = cache.popitem(last=False)
+            self._close_quietly(antigo)
+        return item
+
+    def _forget(self, conn):
+        """Descarta os statements da conexão (sessão reconectada ou reiniciada)"""
+        with self._lock:
+            cache = self._preparadas.pop(getattr(conn, '_cnx', conn), {})
+        for _, cursor in cache.values():
+            self._close_quietly(cursor)
+
+    @staticmethod
+    def _close_quietly(cursor):
+        try:
+            cursor.close()
+        except Error:
+            pass
+
+    def _execute(self, conn, sql, params):
+        if self.preparar and _SELECT.match(sql):
+            for tentativa in range(2):
+                texto, cursor = self._prepared_cursor(conn, sql)
+                try:
+                    cursor.execute(texto, params or ())
+                    return cursor.description, cursor.fetchall()
+                except Error as e:
+                    # Statement perdido no servidor (reconexão): prepara de novo uma vez
+                    if tentativa or e.errno not in (errorcode.ER_UNKNOWN_STMT_HANDLER, errorcode.ER_NEED_REPREPARE):
+                        raise
+                    self._forget(conn)
+
+        cursor = conn.cursor()
+        if params:
+            cursor.execute(sql, params)
+        else:
+            cursor.execute(sql)
+        descricao, linhas = cursor.description, cursor.fetchall()
+        cursor.close()
+        return descricao, linhas
+
+    @contextmanager
+    def _borrowed(self, handle):
+        """Conexão emprestada com o handle ligado a ela; traduz o cancelamento"""
+        with self._conexao() as conn:
+            if handle is not None:
+                # O id da conexão só identifica o comando dentro do servidor (pool) de origem
+                handle.attach((getattr(conn, 'pool_name', None), conn.connection_id))
+            try:
+                yield conn
+            except Error as e:
+                if handle is not None and handle.cancelled and e.errno == errorcode.ER_QUERY_INTERRUPTED:
+                    raise QueryCancelled() from e
+                raise
+            finally:
+                # Ainda dentro do empréstimo: detach() espera um KILL em curso antes de a conexão voltar ao pool
+                if handle is not None:
+                    handle.detach()
+
+    def run(self, query, params=None, timeout_ms=None, handle=None):
+        with self._borrowed(handle) as conn:
+            descricao, linhas = self._execute(conn, with_timeout(query, timeout_ms), params)
+        return typed_frame(descricao, linhas)
+
+    def stream(self, query, params=None, lote=50_000, handle=None, timeout_ms=None):
+        """Gera o resultado em RecordBatches de até `lote` linhas (cursor sem buffer).
+
+        Só um lote fica em memória. Se o consumidor parar antes do fim, o
+        comando é interrompido no servidor antes de a conexão voltar ao pool.
+        """
+        with self._borrowed(handle) as conn:
+            cursor = conn.cursor()
+            completo = False
+            try:
+                cursor.execute(with_timeout(query, timeout_ms), params or ())
+                linhas = cursor.fetchmany(lote)
+                # Resultado vazio ainda gera um lote, com o esquema das colunas
+                yield typed_batch(cursor.description, linhas)
+                while linhas:
+                    linhas = cursor.fetchmany(lote)
+                    if linhas:
+                        yield typed_batch(cursor.description, linhas)
+                completo = True
+            finally:
+                if not completo:
+                    self._abandon(conn)
+                self._close_quietly(cursor)
+
+    def _abandon(self, conn):
+        """Interrompe o resultado não lido da conexão para que ela possa ser reusada"""
+        try:
+            if self._killer is None:
+                raise Error(msg="sem como interromper o comando no servidor")
+            self.kill((getattr(conn, 'pool_name', None), conn.connection_id))
+            conn.consume_results()
+        except Error:
+            # Conexão em estado incerto: o pool reconecta no próximo empréstimo
+            self._forget(conn)
+            getattr(conn, '_cnx', conn).disconnect()
+
+    def kill(self, connection_id):
+        self._killer(connection_id)
+
+
+# ============= DIALETO =============
+# Funções do MySQL sem equivalente direto no DuckDB (ou com outra semântica,
+# como WEEKDAY e DATE_SUB) viram macros de mesmo comportamento
+_FUNCOES_MYSQL = ['DATE_SUB', 'WEEKDAY', 'MAKEDATE', 'ELT', 'CONV']
+_FUNCAO = re.compile(r'\b(' + '|'.join(_FUNCOES_MYSQL) + r')\s*\(', re.IGNORECASE)
+
+MACROS_DUCKDB = [
+    "CREATE OR REPLACE TEMP MACRO mysql_date_sub(d, i) AS CAST(d - i AS DATE)",
+    "CREATE OR REPLACE TEMP MACRO mysql_weekday(d) AS isodow(d) - 1",
+    "CREATE OR REPLACE TEMP MACRO mysql_makedate(a, n) AS make_date(CAST(a AS INTEGER), 1, 1) + CAST(n - 1 AS INTEGER)",
+    # A pirâmide etária usa ELT com as 9 faixas de FAIXAS_ETARIAS
+    """CREATE OR REPLACE TEMP MACRO mysql_elt(n, a1, a2, a3, a4, a5, a6, a7, a8, a9)
+       AS [a1, a2, a3, a4, a5, a6, a7, a8, a9][CAST(n AS BIGINT)]""",
+    # Esboços HLL (utils.shards): só de hexadecimal para decimal ou binário, como texto
+    """CREATE OR REPLACE TEMP MACRO mysql_conv(s, de, para) AS CASE WHEN para = 2
+       THEN bin(CAST('0x' || s AS UBIGINT)) ELSE CAST(CAST('0x' || s AS UBIGINT) AS VARCHAR) END""",
+]
+
+_HINT = re.compile(r'/\*\+.*?\*/', re.DOTALL)
+# O DuckDB só aceita chamada de função em INTERVAL entre parênteses
+_INTERVALO = re.compile(r'\bINTERVAL\s+(mysql_\w+\([^()]*\))', re.IGNORECASE)
+
+
+def translate_mysql(query, params=None, esquema='vacinacao'):
+    """Converte SQL escrito para o MySQL (e para o mysql.connector) para o DuckDB.
+
+    Remove hints e o prefixo do esquema, troca crases por aspas duplas, os
+    marcadores %s por ? e as funções de _FUNCOES_MYSQL pelas macros.
+    """
+    sql = _HINT.sub('', query)
+    sql = re.sub(rf'`?\b{re.escape(esquema)}\b`?\.', '', sql)
+    sql = sql.replace('`', '"')
+    sql = _FUNCAO.sub(lambda m: f"mysql_{m.group(1).lower()}(", sql)
+    sql = _INTERVALO.sub(r'INTERVAL (\1)', sql)
+    if params:
+        sql = sql.replace('%s', '?').replace('%%', '%')
+    return sql, list(params or [])
+
+
+class DuckDBBackend:
+    """Consultas em processo sobre o snapshot DuckDB (somente leitura).
+
+    Cada thread usa um cursor próprio sobre o mesmo banco; o limite de tempo
+    e o cancelamento interrompem o cursor com interrupt().
+    """
+
+    nome = 'duckdb'
+
+    def __init__(self, caminho, esquema='vacinacao'):
+        import duckdb
+
+        self._banco = duckdb.connect(caminho, read_only=True)
+        self._esquema = esquema
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._em_execucao = {}
+        self._expiradas = set()
+
+    def _cursor(self):
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None:
+            cursor = self._banco.cursor()
+            for macro in MACROS_DUCKDB:
+                cursor.execute(macro)
+            self._local.cursor = cursor
+        return cursor
+
+    @contextmanager
+    def _executing(self, handle, timeout_ms):
+        """Cursor da thread registrado para kill() durante a consulta, com o limite de tempo"""
+        import duckdb
+
+        cursor = self._cursor()
+        consulta_id = next(self._ids)
+        with self._lock:
+            self._em_execucao[consulta_id] = cursor
+        relogio = None
+        try:
+            if handle is not None:
+                handle.attach(consulta_id)
+            if timeout_ms:
+                relogio = threading.Timer(timeout_ms / 1000, self._expire, (consulta_id,))
+                relogio.daemon = True
+                relogio.start()
+            yield cursor
+        except duckdb.InterruptException as e:
+            if consulta_id in self._expiradas:
+                raise Error(msg="Tempo limite da consulta excedido", errno=errorcode.ER_QUERY_TIMEOUT) from e
+            raise QueryCancelled() from e
+        except duckdb.Error as e:
+            raise Error(msg=str(e)) from e
+        finally:
+            if relogio is not None:
+                relogio.cancel()
+            with self._lock:
+                self._em_execucao.pop(consulta_id, None)
+                self._expiradas.discard(consulta_id)
+            if handle is not None:
+                handle.detach()
+
+    def run(self, query, params=None, timeout_ms=None, handle=None):
+        sql, valores = translate_mysql(query, params, self._esquema)
+        with self._executing(handle, timeout_ms) as cursor:
+            return cursor.execute(sql, valores).df()
+
+    def stream(self, query, params=None, lote=50_000, handle=None, timeout_ms=None):
+        """Gera o resultado em RecordBatches de até `lote` linhas"""
+        import pyarrow as pa
+
+        sql, valores = translate_mysql(query, params, self._esquema)
+        with self._executing(handle, timeout_ms) as cursor:
+            resultado = cursor.execute(sql, valores)
+            # to_arrow_reader substituiu fetch_record_batch nas versões recentes
+            leitor = getattr(resultado, 'to_arrow_reader', resultado.fetch_record_batch)(lote)
+            vazio = True
+            for batch in leitor:
+                vazio = False
+                yield batch
+            if vazio:
+                yield pa.RecordBatch.from_pylist([], schema=leitor.schema)
+
+    def _expire(self, consulta_id):
+        with self._lock:
+            self._expiradas.add(consulta_id)
+        self.kill(consulta_id)
+
+    def kill(self, connection_id):
+        with self._lock:
+            cursor = self._em_execucao.get(connection_id)
+            # Só interrompe se a consulta ainda está em execução
+            if cursor is not None:
+                cursor.interrupt()
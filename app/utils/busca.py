@@ -0,0 +1,173 @@
+"""Busca de estabelecimentos por nome fantasia ou CNES para o filtro do painel.
+
+O índice fica em memória e é montado uma vez por versão dos dados,
+compartilhado entre as sessões: nenhuma sessão carrega a lista completa de
+estabelecimentos. Cada nome normalizado (sem acentos, minúsculo) entra em
+duas listas invertidas guardadas como fatias contíguas de arrays ordenados:
+
+- palavras ordenadas, para casar cada termo digitado como prefixo de uma
+  palavra do nome (busca binária pelo intervalo de palavras);
+- trigramas, para tolerar erros de digitação pela semelhança (Jaccard) entre
+  os trigramas da consulta e os do nome.
+
+Códigos numéricos casam como prefixo do CNES.
+
+Uso: cd app && uv run python -m utils.busca "ubs centro"
+"""
+import argparse
+import re
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.db_functions import INTERATIVA, execute_query
+
+LIMITE = 20
+
+# Semelhança mínima de trigramas para um nome entrar no resultado sem casar os prefixos
+SIMILARIDADE_MINIMA = 0.3
+
+
+def normalize(texto):
+    """Minúsculas, sem acentos e só com letras, dígitos e espaços simples"""
+    sem_acentos = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode()
+    return ' '.join(re.findall(r'[a-z0-9]+', sem_acentos.lower()))
+
+
+def word_trigrams(palavra):
+    """Trigramas da palavra, com espaços nas bordas como no pg_trgm"""
+    borda = f"  {palavra} "
+    return {borda[i:i + 3] for i in range(len(palavra) + 1)}
+
+
+def trigrams(texto):
+    return set().union(*map(word_trigrams, texto.split()))
+
+
+def _inverted(chaves, linhas, n_chaves):
+    """Lista invertida (chave -> linhas) como offsets sobre um array de linhas ordenado por chave"""
+    ordem = np.argsort(chaves, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(chaves, minlength=n_chaves))])
+    return offsets, linhas[ordem]
+
+
+def _flatten(listas):
+    """(ids das chaves, linha de cada uma, chaves em ordem) de uma lista de coleções de chaves por linha"""
+    chaves, unicas = pd.factorize(pd.Series([c for lista in listas for c in lista], dtype=object), sort=True)
+    linhas = np.repeat(np.arange(len(listas)), [len(lista) for lista in listas])
+    return chaves, linhas, unicas.to_numpy()
+
+
+class EstablishmentIndex:
+    """Índice de palavras e trigramas sobre id_cnes, nome_fantasia e municipio"""
+
+    def __init__(self, estabelecimentos):
+        self.dados = estabelecimentos.reset_index(drop=True)
+        nomes = [normalize(n) for n in self.dados['nome_fantasia'].fillna('')]
+
+        por_nome = [set(nome.split()) for nome in nomes]
+        chaves, linhas, self._palavras = _flatten(por_nome)
+        self._por_palavra = _inverted(chaves, linhas, len(self._palavras))
+
+        # Os nomes repetem muito as mesmas palavras: trigramas calculados uma vez por palavra
+        da_palavra = {p: word_trigrams(p) for p in self._palavras}
+        grams = [set().union(*(da_palavra[p] for p in palavras)) for palavras in por_nome]
+        chaves, linhas, unicos = _flatten(grams)
+        self._id_trigrama = {t: i for i, t in enumerate(unicos)}
+        self._por_trigrama = _inverted(chaves, linhas, len(unicos))
+        self._n_trigramas = np.fromiter(map(len, grams), dtype=np.int64, count=len(grams))
+
+        self._linha_cnes = {c: i for i, c in enumerate(self.dados['id_cnes'].tolist())}
+        cnes = self.dados['id_cnes'].astype(str).to_numpy()
+        self._ordem_cnes = np.argsort(cnes, kind='stable')
+        self._cnes = cnes[self._ordem_cnes]
+
+    def __len__(self):
+        return len(self.dados)
+
+    def _prefix_mask(self, termo):
+        """Marca as linhas com alguma palavra começando por `termo`"""
+        inicio = np.searchsorted(self._palavras, termo, side='left')
+        fim = np.searchsorted(self._palavras, termo + '\x7f', side='left')
+        offsets, linhas = self._por_palavra
+        mascara = np.zeros(len(self), dtype=bool)
+        mascara[linhas[offsets[inicio]:offsets[fim]]] = True
+        return mascara
+
+    def _similarity(self, consulta):
+        """Jaccard entre os trigramas da consulta e os de cada nome (0 para todos sem nenhum em comum)"""
+        grams = trigrams(consulta)
+        ids = [self._id_trigrama[t] for t in grams if t in self._id_trigrama]
+        offsets, linhas = self._por_trigrama
+        # Contagem densa: soma as listas sem ordenar, custo linear nos postings
+        comuns = np.bincount(np.concatenate([linhas[offsets[i]:offsets[i + 1]] for i in ids] + [linhas[:0]]),
+                             minlength=len(self))
+        return comuns / (len(grams) + self._n_trigramas - comuns)
+
+    def search(self, texto, limite=LIMITE):
+        """Até `limite` estabelecimentos ordenados pela relevância para `texto`.
+
+        Primeiro os que casam todos os termos como prefixo de palavras do
+        nome, depois os parecidos; dentro de cada grupo, pela semelhança.
+        """
+        consulta = normalize(texto)
+        if not consulta:
+            return self.dados.iloc[:0]
+        if consulta.isdigit():
+            inicio = np.searchsorted(self._cnes, consulta, side='left')
+            fim = np.searchsorted(self._cnes, consulta + '\x7f', side='left')
+            return self.dados.iloc[self._ordem_cnes[inicio:min(fim, inicio + limite)]]
+
+        semelhanca = self._similarity(consulta)
+        prefixo = np.logical_and.reduce([self._prefix_mask(termo) for termo in consulta.split()])
+        # Casar os prefixos vale mais que qualquer semelhança (que fica em [0, 1])
+        pontuacao = semelhanca + prefixo * 2
+        candidatas = np.flatnonzero(prefixo | (semelhanca >= SIMILARIDADE_MINIMA))
+        if len(candidatas) > limite:
+            candidatas = candidatas[np.argpartition(-pontuacao[candidatas], limite - 1)[:limite]]
+        ordem = np.lexsort((candidatas, -pontuacao[candidatas]))
+        return self.dados.iloc[candidatas[ordem]]
+
+    def label(self, cnes):
+        """Rótulo de exibição do estabelecimento"""
+        linha = self._linha_cnes.get(cnes)
+        if linha is None:
+            return str(cnes)
+        nome, municipio = self.dados.iloc[linha][['nome_fantasia', 'municipio']]
+        return f"{nome} — {municipio} ({cnes})"
+
+
+def load_establishments():
+    """id_cnes, nome_fantasia e municipio de todos os estabelecimentos"""
+    return execute_query("SELECT id_cnes, nome_fantasia, municipio FROM Estabelecimento", prioridade=INTERATIVA)
+
+
+@st.cache_resource(max_entries=2)
+def get_establishment_index(versao):
+    """Índice de busca para a versão dos dados, compartilhado entre as sessões.
+
+    Erro na consulta (resultado vazio) levanta LookupError, que não fica no
+    cache: a próxima execução tenta de novo.
+    """
+    estabelecimentos = load_establishments()
+    if estabelecimentos.empty:
+        raise LookupError("Nenhum estabelecimento cadastrado")
+    return EstablishmentIndex(estabelecimentos)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('texto')
+    parser.add_argument('--limite', type=int, default=LIMITE)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    indice = EstablishmentIndex(load_establishments())
+    print(f"Índice com {len(indice):,} estabelecimentos em {time.perf_counter() - inicio:.2f} s")
+    inicio = time.perf_counter()
+    resultado = indice.search(args.texto, args.limite)
+    print(f"{len(resultado)} resultados em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    print(resultado.to_string(index=False))
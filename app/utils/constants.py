@@ -6,4 +6,59 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'root'),
     'database': os.getenv('DB_NAME', 'vacinacao'),
     'port': int(os.getenv('DB_PORT', 3310))
-}
\ No newline at end of file
+}
+
+# Réplicas de leitura, em DB_REPLICAS="host:porta,host:porta"; usam as mesmas
+# credenciais e banco do primário (DB_CONFIG)
+DB_REPLICAS = [
+    {**DB_CONFIG, 'host': host, 'port': int(porta or 3306)}
+    for host, _, porta in (r.strip().partition(':') for r in os.getenv('DB_REPLICAS', '').split(',') if r.strip())
+]
+
+# Shards das aplicações por UF de residência do paciente, em
+# DB_SHARDS="RJ,ES=host:porta;SP=host:porta;*=host:porta" ('*' recebe as UFs
+# não listadas e os pacientes sem UF); usam as credenciais e o banco do
+# primário, que continua com as tabelas de referência e as demais páginas
+DB_SHARDS = [
+    (frozenset(uf.strip().upper() for uf in ufs.split(',') if uf.strip()),
+     {**DB_CONFIG, 'host': host.strip(), 'port': int(porta or 3306)})
+    for ufs, _, endereco in (s.strip().partition('=') for s in os.getenv('DB_SHARDS', '').split(';') if s.strip())
+    for host, _, porta in [endereco.strip().partition(':')]
+]
+
+# Atraso máximo (s) de uma réplica para receber leituras e intervalo (s) entre verificações
+REPLICA_MAX_LAG_S = int(os.getenv('REPLICA_MAX_LAG_S', 5))
+REPLICA_CHECK_INTERVAL_S = float(os.getenv('REPLICA_CHECK_INTERVAL_S', 10))
+
+# Backend das consultas de leitura: 'mysql' ou 'duckdb' (snapshot local gerado
+# por `python -m utils.snapshot`)
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql')
+DUCKDB_PATH = os.getenv(
+    'DUCKDB_PATH',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'db', 'snapshot', 'vacinacao.duckdb')
+)
+
+# Conexões simultâneas por processo e espera máxima (s) por uma conexão livre
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))
+DB_POOL_WAIT = float(os.getenv('DB_POOL_WAIT', 10))
+
+# Controle de admissão das leituras (utils.admissao): consultas executando ao
+# mesmo tempo por processo (padrão: um pool cheio por servidor de leitura),
+# pedidos na fila, consultas simultâneas de uma sessão e espera máxima (s)
+ADMISSAO_LIMITE = int(os.getenv('ADMISSAO_LIMITE', DB_POOL_SIZE * max(1, len(DB_REPLICAS))))
+ADMISSAO_FILA = int(os.getenv('ADMISSAO_FILA', 64))
+ADMISSAO_POR_SESSAO = int(os.getenv('ADMISSAO_POR_SESSAO', 4))
+ADMISSAO_ESPERA_S = float(os.getenv('ADMISSAO_ESPERA_S', 20))
+
+# Limite de execução de cada consulta no servidor (MAX_EXECUTION_TIME, em ms)
+QUERY_TIMEOUT_MS = int(os.getenv('QUERY_TIMEOUT_MS', 30000))
+
+# Orçamento (ms) das consultas do modo aproximado, que leem apenas a amostra
+APPROX_BUDGET_MS = int(os.getenv('APPROX_BUDGET_MS', 1500))
+
+# GeoJSON com os polígonos dos municípios (nome em uma propriedade), para o
+# mapa coroplético do painel
+GEOJSON_MUNICIPIOS = os.getenv(
+    'GEOJSON_MUNICIPIOS',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'db', 'geo', 'municipios.geojson')
+)
@@ -1,71 +1,349 @@
+import functools
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from contextlib import contextmanager
+
 import streamlit as st
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode, pooling
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
-from utils.constants import DB_CONFIG
+from utils.admissao import INTERATIVA, NORMAL, PESADA, AdmissionController, AdmittedBackend, QueryRejected
+from utils.backends import DuckDBBackend, MySQLBackend
+from utils.constants import (ADMISSAO_ESPERA_S, ADMISSAO_FILA, ADMISSAO_LIMITE, ADMISSAO_POR_SESSAO, DB_BACKEND,
+                             DB_CONFIG, DB_POOL_SIZE, DB_POOL_WAIT, DB_REPLICAS, DB_SHARDS, DUCKDB_PATH,
+                             QUERY_TIMEOUT_MS, REPLICA_CHECK_INTERVAL_S, REPLICA_MAX_LAG_S)
+from utils.query_control import QueryCancelled, QueryHandle, QueryRegistry
+from utils.replicas import HostPool, ReplicaRouter
+from utils.shards import Shard, ShardMap, merge_partials
 
 def formatar_numero(num):
     """Formata números com separadores"""
     return f"{num:,.0f}".replace(',', '.')
 
 # ============= GERENCIAMENTO DE CONEXÃO =============
+def open_connection(**overrides):
+    """Abre uma conexão dedicada, fora do cache (scripts e tarefas em lote)"""
+    return mysql.connector.connect(**{**DB_CONFIG, **overrides})
+
 @st.cache_resource
-def get_db_connection():
-    """Cria e retorna conexão com o banco de dados"""
+def get_router():
+    """Pools do primário e das réplicas de leitura, com o roteamento entre eles"""
+    return ReplicaRouter(
+        HostPool('vacinacao', DB_CONFIG, DB_POOL_SIZE),
+        [HostPool(f'replica{i}', config, DB_POOL_SIZE) for i, config in enumerate(DB_REPLICAS, 1)],
+        REPLICA_MAX_LAG_S, REPLICA_CHECK_INTERVAL_S,
+    )
+
+def _borrow(pool, espera):
+    limite = time.monotonic() + espera
+    while True:
+        try:
+            return pool.get_connection()
+        except pooling.PoolError:
+            if time.monotonic() >= limite:
+                raise
+            time.sleep(0.05)
+
+@contextmanager
+def pooled_connection(espera=DB_POOL_WAIT, leitura=False, host=None):
+    """Empresta uma conexão do pool, aguardando até `espera` segundos por uma livre.
+
+    Com `leitura`, usa uma réplica saudável (em rodízio) e passa para a
+    seguinte, ou para o primário, se ela não aceitar conexão ou estiver com o
+    pool esgotado. Sem `leitura`, usa o primário ou o `host` indicado.
+    """
+    router = get_router()
+    hosts = router.read_hosts() if leitura else [host or router.primario]
+    for candidato in hosts:
+        try:
+            conn = _borrow(candidato.pool(), espera)
+            break
+        except pooling.PoolError:
+            # Pool cheio não é falha do host: tenta o seguinte sem tirá-lo do rodízio
+            if candidato is hosts[-1]:
+                raise
+        except Error as e:
+            if candidato is hosts[-1]:
+                raise
+            router.mark_down(candidato, e)
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        if conn.is_connected():
-            return conn
-    except Error as e:
-        st.error(f"❌ Erro na conexão: {e}")
+        yield conn
+    finally:
+        try:
+            conn.close()
+        except Error:
+            pass
+
+def _kill_mysql_query(alvo):
+    """Interrompe o comando em execução na conexão (pool, connection_id) indicada"""
+    nome_pool, connection_id = alvo
+    router = get_router()
+    _kill_on_host(router.hosts().get(nome_pool, router.primario), connection_id)
+
+def _kill_on_host(host, connection_id):
+    try:
+        with pooled_connection(espera=1, host=host) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"KILL QUERY {int(connection_id)}")
+            cursor.close()
+    except Error:
+        # Sem conexão livre no pool: usa uma dedicada para não esperar
+        try:
+            conn = host.connect()
+        except Error:
+            return
+        try:
+            conn.cmd_query(f"KILL QUERY {int(connection_id)}")
+        except Error:
+            pass
+        finally:
+            conn.close()
+
+@st.cache_resource
+def get_admission():
+    """Controle de admissão das leituras do processo (limite global, fila com prioridade, cota por sessão)"""
+    return AdmissionController(ADMISSAO_LIMITE, ADMISSAO_FILA, ADMISSAO_POR_SESSAO, ADMISSAO_ESPERA_S)
+
+def _yield_if_script():
+    """Ponto de interrupção durante a espera por uma vaga, só na thread do script"""
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        yield_to_streamlit()
+
+@st.cache_resource
+def get_backend():
+    """Backend das consultas de leitura, escolhido por DB_BACKEND (mysql ou duckdb), com controle de admissão"""
+    if DB_BACKEND == 'duckdb':
+        backend = DuckDBBackend(DUCKDB_PATH, esquema=DB_CONFIG['database'])
+    else:
+        backend = MySQLBackend(functools.partial(pooled_connection, leitura=True), _kill_mysql_query)
+    return AdmittedBackend(backend, get_admission(), aguardar=_yield_if_script)
+
+def kill_query(connection_id):
+    """Interrompe a consulta em execução na conexão indicada"""
+    get_backend().kill(connection_id)
+
+@st.cache_resource
+def get_shard_map():
+    """Shards das aplicações por UF (DB_SHARDS), cada um com seu pool; None sem shards"""
+    if not DB_SHARDS or DB_BACKEND != 'mysql':
         return None
+    shards = []
+    for i, (ufs, config) in enumerate(DB_SHARDS, 1):
+        host = HostPool(f'shard{i}', config, DB_POOL_SIZE)
+        backend = MySQLBackend(functools.partial(pooled_connection, host=host),
+                               lambda alvo, host=host: _kill_on_host(host, alvo[1]))
+        # Cada shard é um servidor: controle de admissão próprio, do tamanho do seu pool
+        controle = AdmissionController(DB_POOL_SIZE, ADMISSAO_FILA, ADMISSAO_POR_SESSAO, ADMISSAO_ESPERA_S)
+        backend = AdmittedBackend(backend, controle, aguardar=_yield_if_script)
+        shards.append(Shard(f'shard{i}', ufs, backend, host))
+    return ShardMap(shards)
+
+@st.cache_resource
+def get_shard_executor():
+    """Threads das consultas de cada shard, separadas das que esperam pelos resultados juntados"""
+    # Como em get_query_executor, uma thread por vaga e por lugar na fila do controle de cada shard
+    return ThreadPoolExecutor(max_workers=(DB_POOL_SIZE + ADMISSAO_FILA) * max(1, len(DB_SHARDS)),
+                              thread_name_prefix='shard')
+
+@st.cache_resource
+def get_query_executor():
+    """Threads que executam as consultas enquanto o script aguarda.
+
+    A admissão acontece dentro da thread, então há uma thread por vaga e por
+    lugar na fila do controle: um pedido que esperasse na fila do executor
+    ficaria fora do controle, sem prioridade nem rodízio entre as sessões.
+    """
+    return ThreadPoolExecutor(max_workers=ADMISSAO_LIMITE + ADMISSAO_FILA, thread_name_prefix='consulta')
+
+@st.cache_resource
+def get_query_registry():
+    """Consultas em andamento por sessão, para cancelar reruns abandonados"""
+    return QueryRegistry()
+
+# ============= EXECUÇÃO DE CONSULTAS =============
+def run_query(query, params=None, timeout_ms=QUERY_TIMEOUT_MS, handle=None):
+    """Executa a consulta no backend configurado e retorna DataFrame; propaga erros"""
+    return get_backend().run(query, params, timeout_ms, handle)
+
+def _session_key(slot):
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return (ctx.session_id if ctx else None, slot)
+
+def query_handle(prioridade=None):
+    """Handle de cancelamento de uma consulta da sessão atual, com a prioridade no controle de admissão"""
+    return QueryHandle(killer=kill_query, sessao=_session_key(None)[0], prioridade=prioridade)
+
+def _prioritize(handle, prioridade):
+    """Ajusta a prioridade do handle recebido por um loader (None mantém a atual)"""
+    if prioridade is not None:
+        handle.prioridade = prioridade
+    return handle
+
+def yield_to_streamlit():
+    """Ponto de interrupção: se um novo rerun foi pedido, a exceção de controle do Streamlit sobe aqui"""
+    '_consulta_em_andamento' in st.session_state
+
+def wait_query(future, handle, intervalo=0.1):
+    """Aguarda o resultado sem bloquear o controle de execução do Streamlit.
+
+    Se o usuário mudou um filtro e um novo rerun foi pedido, a consulta é
+    interrompida no servidor e a conexão volta ao pool.
+    """
+    try:
+        while True:
+            try:
+                return future.result(timeout=intervalo)
+            except FutureTimeout:
+                yield_to_streamlit()
+    except BaseException:
+        if not future.done():
+            handle.cancel()
+        raise
+
+def fetch_query(query, params=None, timeout_ms=QUERY_TIMEOUT_MS, slot=None, prioridade=None):
+    """Executa consulta e retorna DataFrame, propagando erros e cancelamentos.
+
+    Toda consulta tem limite de tempo no servidor. Com `slot`, uma nova
+    consulta da mesma sessão no mesmo slot cancela a anterior. `prioridade`
+    (INTERATIVA, NORMAL ou PESADA) ordena a fila do controle de admissão.
+    """
+    handle = query_handle(prioridade)
+    registry = get_query_registry()
+    chave = _session_key(slot) if slot else None
+    if chave:
+        registry.supersede(chave, handle)
 
-def execute_query(query, params=None):
-    """Executa consulta e retorna DataFrame"""
-    conn = get_db_connection()
-    if conn is None:
-        return pd.DataFrame()
-    
     try:
-        cursor = conn.cursor()
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        
-        # Obter nomes das colunas
-        columns = [desc[0] for desc in cursor.description]
-        data = cursor.fetchall()
-        
-        df = pd.DataFrame(data, columns=columns)
-        cursor.close()
-        return df
-    except Error as e:
+        future = get_query_executor().submit(run_query, query, params, timeout_ms, handle)
+        return wait_query(future, handle)
+    finally:
+        if chave:
+            registry.finish(chave, handle)
+
+def report_query_error(e, query, timeout_ms=QUERY_TIMEOUT_MS):
+    """Mostra ao usuário o erro de uma consulta"""
+    if isinstance(e, QueryCancelled):
+        return
+    if isinstance(e, QueryRejected):
+        st.warning(f"⏳ {e.msg}")
+    elif isinstance(e, pooling.PoolError):
+        st.error(f"❌ Banco de dados ocupado, tente novamente: {e}")
+    elif isinstance(e, Error) and e.errno == errorcode.ER_QUERY_TIMEOUT:
+        st.error(f"⏱️ A consulta excedeu o limite de {timeout_ms / 1000:.0f}s. Tente um período menor.")
+    else:
         st.error(f"Erro na consulta: {e}")
         st.error(f"Query: {query}")
+
+def execute_query(query, params=None, timeout_ms=QUERY_TIMEOUT_MS, slot=None, prioridade=None):
+    """Executa consulta e retorna DataFrame (vazio em caso de erro)"""
+    try:
+        return fetch_query(query, params, timeout_ms, slot, prioridade)
+    except (QueryCancelled, Error) as e:
+        report_query_error(e, query, timeout_ms)
         return pd.DataFrame()
 
-@st.cache_data(ttl=300)
-def load_dashboard_data(data_inicio, data_fim, municipios, doses, vacinas):
-    """Carrega dados principais da view com filtros aplicados"""
-    
-    query = """
+# ============= RESULTADOS COMPARTILHADOS =============
+@st.cache_resource
+def get_result_store():
+    """Store de resultados compartilhado por todas as sessões do processo"""
+    # pyarrow só é carregado pelas páginas que usam o store
+    from utils.result_store import ResultStore
+    return ResultStore(ttl=300)
+
+def _hold_lease(slot, lease):
+    """Guarda a referência da sessão ao resultado do slot, liberando a anterior"""
+    leases = st.session_state.setdefault('_result_leases', {})
+    anterior = leases.get(slot)
+    leases[slot] = lease
+    if anterior is not None:
+        anterior.release()
+
+def _fetch(query, params, handle=None, slot=None, timeout_ms=QUERY_TIMEOUT_MS, prioridade=None):
+    """Executa na thread atual (com handle, dentro de um worker) ou via fetch_query"""
+    if handle is not None:
+        return run_query(query, params, timeout_ms, _prioritize(handle, prioridade))
+    return fetch_query(query, params, timeout_ms, slot=slot, prioridade=prioridade)
+
+def fetch_sharded(consultas, ufs=(), handle=None, timeout_ms=QUERY_TIMEOUT_MS, prioridade=None):
+    """Roda `consultas` ({parte: (query, params)}) nos shards das `ufs`, em paralelo.
+
+    Retorna {parte: [DataFrame de cada shard]}, para juntar com
+    utils.shards.merge_partials. Sem `handle` (na thread do script), espera
+    cedendo ao Streamlit e cancela tudo num novo rerun.
+    """
+    mapa = get_shard_map()
+    alvos = mapa.route(ufs)
+    if handle is not None:
+        return mapa.gather(alvos, consultas, get_shard_executor(), _prioritize(handle, prioridade), timeout_ms)
+    handle = QueryHandle(sessao=_session_key(None)[0], prioridade=prioridade)
+    return mapa.gather(alvos, consultas, get_shard_executor(), handle, timeout_ms, aguardar=yield_to_streamlit)
+
+def query_request(chave, query, params, timeout_ms=QUERY_TIMEOUT_MS, prioridade=None):
+    """Pedido (chave, loader) de uma consulta simples para stream_results"""
+    return chave, lambda handle=None: _fetch(query, params, handle, timeout_ms=timeout_ms, prioridade=prioridade)
+
+def stream_results(pedidos):
+    """Carrega vários resultados em paralelo, em conexões do pool.
+
+    `pedidos` mapeia nome -> (chave, loader(handle)). Gera (nome, df, erro) na
+    thread do script, na ordem em que os resultados ficam prontos; cada
+    resultado passa pelo store compartilhado. Use com contextlib.closing: ao
+    fechar (ou num novo rerun) as consultas pendentes são canceladas.
+    """
+    store = get_result_store()
+    executor = get_query_executor()
+    handles = {nome: query_handle() for nome in pedidos}
+    futures = {
+        executor.submit(store.acquire, chave, functools.partial(loader, handles[nome])): nome
+        for nome, (chave, loader) in pedidos.items()
+    }
+    pendentes = set(futures)
+    try:
+        while pendentes:
+            prontos, pendentes = wait(pendentes, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in prontos:
+                nome = futures[future]
+                try:
+                    df, lease = future.result()
+                except (QueryCancelled, Error) as e:
+                    yield nome, None, e
+                    continue
+                _hold_lease(nome, lease)
+                yield nome, df, None
+            if not prontos:
+                yield_to_streamlit()
+    finally:
+        for future in pendentes:
+            handles[futures[future]].cancel()
+
+# Filtros do painel, na ordem em que entram nas chaves dos resultados
+FILTROS = ('municipios', 'doses', 'vacinas', 'estabelecimentos', 'ufs')
+
+def dashboard_key(data_inicio, data_fim, **filtros):
+    """Chave canônica do resultado: a ordem de seleção dos filtros não importa"""
+    return ('dashboard', data_inicio, data_fim) + tuple(
+        tuple(sorted(filtros.get(nome) or [])) for nome in FILTROS
+    )
+
+DASHBOARD_QUERY = """
     SELECT 
         ad.id_aplicacao,
         ad.data_vacina,
-        ad.dose_vacina,
-        ad.local_aplicacao,
-        ad.via_administracao,
-        ad.lote_vacina,
+        d.descricao AS dose_vacina,
+        la.descricao AS local_aplicacao,
+        va.descricao AS via_administracao,
+        lt.codigo AS lote_vacina,
         ad.cnes,
         ad.id_vacina,
-        ad.id_paciente,
+        p.id_paciente,
         ad.id_estrategia_vacinacao,
-        p.sexo,
-        p.municipio AS paciente_municipio,
-        p.uf,
+        sx.descricao AS sexo,
+        m.nome AS paciente_municipio,
+        m.uf,
         p.idade,
-        p.raca_cor,
+        rc.descricao AS raca_cor,
         v.nome AS vacina_nome,
         e.nome_fantasia AS estabelecimento_nome,
         e.municipio AS estabelecimento_municipio,
@@ -73,39 +351,182 @@ def load_dashboard_data(data_inicio, data_fim, municipios, doses, vacinas):
         e.latitude,
         e.longitude,
         ev.descricao AS estrategia_descricao
-    FROM AplicacaoDose ad
-    LEFT JOIN Paciente p ON ad.id_paciente = p.id_paciente
+    FROM AplicacaoDoseCompacta ad
+    LEFT JOIN DoseVacina d ON ad.id_dose = d.id
+    LEFT JOIN LocalAplicacao la ON ad.id_local = la.id
+    LEFT JOIN ViaAdministracao va ON ad.id_via = va.id
+    LEFT JOIN LoteVacina lt ON ad.id_lote = lt.id
+    LEFT JOIN PacienteCompacto p ON ad.sk_paciente = p.sk_paciente
+    LEFT JOIN Sexo sx ON p.id_sexo = sx.id
+    LEFT JOIN RacaCor rc ON p.id_raca_cor = rc.id
+    LEFT JOIN Municipio m ON p.id_municipio = m.id
     LEFT JOIN Vacina v ON ad.id_vacina = v.id
     LEFT JOIN Estabelecimento e ON ad.cnes = e.id_cnes
     LEFT JOIN EstrategiaVacinacao ev ON ad.id_estrategia_vacinacao = ev.id
-    WHERE data_vacina BETWEEN %s AND %s
+    WHERE ad.data_vacina BETWEEN %s AND %s
+    """
+
+# ============= DICIONÁRIOS =============
+@st.cache_data(ttl=300)
+def load_dictionary(tabela, coluna='descricao'):
+    """Mapeia cada valor textual de uma tabela-dicionário para seus ids.
+
+    Erros sobem para quem chamou (e não ficam no cache): um dicionário vazio
+    transformaria todo filtro em `AND FALSE` até o fim do TTL.
+    """
+    df = fetch_query(f"SELECT id, {coluna} AS valor FROM {tabela}", prioridade=INTERATIVA)
+    ids = {}
+    for id_, valor in zip(df.get('id', []), df.get('valor', [])):
+        ids.setdefault(valor, []).append(int(id_))
+    return ids
+
+def _in_ids(coluna, tabela, valores, campo='descricao'):
+    """Traduz um filtro textual em `coluna IN (ids)` usando o dicionário"""
+    dicionario = load_dictionary(tabela, campo)
+    ids = sorted({i for valor in valores for i in dicionario.get(valor, [])})
+    if not ids:
+        return " AND FALSE", []
+    placeholders = ','.join(['%s'] * len(ids))
+    return f" AND {coluna} IN ({placeholders})", ids
+
+def build_filters(municipios, doses, vacinas, estabelecimentos=(), ufs=()):
+    """Monta o trecho WHERE (após o intervalo de datas) e seus parâmetros.
+
+    `estabelecimentos` são códigos CNES, filtrados direto na tabela de
+    aplicações (índice idx_aplicacao_cnes), sem junção. `ufs` (residência do
+    paciente) vira uma subconsulta, para não depender das junções da consulta.
     """
-    
-    params = [data_inicio, data_fim]
-    
+    query, params = "", []
+
     if municipios:
         placeholders = ','.join(['%s'] * len(municipios))
         query += f" AND e.municipio IN ({placeholders})"
         params.extend(municipios)
-    
+
     if doses:
-        placeholders = ','.join(['%s'] * len(doses))
-        query += f" AND dose_vacina IN ({placeholders})"
-        params.extend(doses)
-    
+        trecho, ids = _in_ids('ad.id_dose', 'DoseVacina', doses)
+        query += trecho
+        params.extend(ids)
+
     if vacinas:
-        placeholders = ','.join(['%s'] * len(vacinas))
-        query += f" AND v.nome IN ({placeholders})"
-        params.extend(vacinas)
-    
-    return execute_query(query, params)
+        trecho, ids = _in_ids('ad.id_vacina', 'Vacina', vacinas, campo='nome')
+        query += trecho
+        params.extend(ids)
+
+    if estabelecimentos:
+        placeholders = ','.join(['%s'] * len(estabelecimentos))
+        query += f" AND ad.cnes IN ({placeholders})"
+        params.extend(int(c) for c in estabelecimentos)
+
+    if ufs:
+        placeholders = ','.join(['%s'] * len(ufs))
+        query += f""" AND ad.sk_paciente IN (SELECT pu.sk_paciente FROM PacienteCompacto pu
+                      JOIN Municipio mu ON pu.id_municipio = mu.id WHERE mu.uf IN ({placeholders}))"""
+        params.extend(ufs)
+
+    return query, params
+
+# ============= SÉRIE TEMPORAL =============
+# (nome, dias aproximados por bucket, expressão SQL do início do bucket)
+GRANULARIDADES = [
+    ('dia', 1, "ad.data_vacina"),
+    ('semana', 7, "DATE_SUB(ad.data_vacina, INTERVAL WEEKDAY(ad.data_vacina) DAY)"),
+    ('mês', 30.4, "DATE_SUB(ad.data_vacina, INTERVAL (DAYOFMONTH(ad.data_vacina) - 1) DAY)"),
+    ('trimestre', 91.3, "MAKEDATE(YEAR(ad.data_vacina), 1) + INTERVAL (QUARTER(ad.data_vacina) - 1) QUARTER"),
+    ('ano', 365.25, "MAKEDATE(YEAR(ad.data_vacina), 1)"),
+]
+
+def choose_granularity(data_inicio, data_fim, n_series, max_pontos):
+    """Menor granularidade cujo total de pontos (buckets x séries) cabe no orçamento"""
+    dias = (data_fim - data_inicio).days + 1
+    for nome, tamanho, _ in GRANULARIDADES:
+        if math.ceil(dias / tamanho) * n_series <= max_pontos:
+            return nome
+    return GRANULARIDADES[-1][0]
+
+def top_series(serie, max_series):
+    """Soma em "Outras" os tipos de dose além dos `max_series` mais frequentes da série"""
+    if serie.empty:
+        return serie
+    principais = serie.groupby('dose_vacina')['count'].sum().nlargest(max_series).index
+    serie = serie.assign(dose_vacina=serie['dose_vacina'].where(serie['dose_vacina'].isin(principais), 'Outras'))
+    return (serie.groupby(['data_vacina', 'dose_vacina'], as_index=False)['count'].sum()
+            .sort_values('data_vacina'))
+
+def time_series_request(data_inicio, data_fim, municipios, doses, vacinas, estabelecimentos=(), ufs=(),
+                        max_pontos=400, max_series=8):
+    """Pedido (chave, loader, granularidade) da série temporal de doses por tipo.
+
+    O período (dia, semana ISO, mês...) é escolhido pelo intervalo e pelo
+    orçamento de pontos; tipos de dose além dos `max_series` mais frequentes
+    são somados em "Outras". Com shards, as contagens de cada um são somadas.
+    """
+    n_doses = len(doses) if doses else len(load_dictionary('DoseVacina'))
+    n_series = max(1, min(n_doses, max_series + 1))
+    granularidade = choose_granularity(data_inicio, data_fim, n_series, max_pontos)
+    expressao = next(expr for nome, _, expr in GRANULARIDADES if nome == granularidade)
+
+    # Filtros resolvidos aqui, na thread do script: o loader pode rodar num worker
+    filtros, params = build_filters(municipios, doses, vacinas, estabelecimentos, ufs)
+
+    def loader(handle=None):
+        juncao = "LEFT JOIN Estabelecimento e ON ad.cnes = e.id_cnes" if municipios else ""
+        query = f"""
+        SELECT {expressao} AS data_vacina, d.descricao AS dose_vacina, COUNT(*) AS count
+        FROM AplicacaoDoseCompacta ad
+        LEFT JOIN DoseVacina d ON ad.id_dose = d.id
+        {juncao}
+        WHERE ad.data_vacina BETWEEN %s AND %s {filtros}
+        GROUP BY 1, 2
+        """
+        params_serie = [data_inicio, data_fim] + params
+        if get_shard_map() is None:
+            return top_series(_fetch(query, params_serie, handle, slot='serie'), max_series)
+        partes = fetch_sharded({'serie': (query, params_serie)}, ufs, handle)['serie']
+        return top_series(merge_partials(partes, grupo=['data_vacina', 'dose_vacina']), max_series)
+
+    chave = ('serie', granularidade, max_series) + dashboard_key(
+        data_inicio, data_fim, municipios=municipios, doses=doses, vacinas=vacinas,
+        estabelecimentos=estabelecimentos, ufs=ufs)[1:]
+    return chave, loader, granularidade
 
 # Filtro de Geografia
 @st.cache_data(ttl=300)
 def load_municipalities():
     """Carrega todos os municípios da view"""
     query = "SELECT DISTINCT municipio FROM Estabelecimento WHERE municipio IS NOT NULL ORDER BY municipio"
-    df = execute_query(query)
+    df = execute_query(query, prioridade=INTERATIVA)
     return df['municipio'].tolist() if not df.empty else []
 
+@st.cache_data(ttl=300)
+def load_ufs():
+    """UFs de residência dos pacientes (tabela Municipio do primário)"""
+    df = execute_query("SELECT DISTINCT uf FROM Municipio WHERE uf IS NOT NULL ORDER BY uf", prioridade=INTERATIVA)
+    return df['uf'].tolist() if not df.empty else []
+
+# Linha única incrementada por toda carga (utils.versao, migração 008)
+VERSAO_QUERY = "SELECT versao, atualizada_em FROM VersaoDados WHERE id = 1"
+
+@st.cache_data(ttl=60)
+def load_data_version():
+    """Versão dos dados de aplicações e pacientes, para invalidar caches derivados.
 
+    Lê a linha de VersaoDados, que cada carga incrementa ao terminar, em vez
+    de contagens, que varrem as tabelas, ou de estatísticas do
+    information_schema, que o MySQL 8 guarda em cache por até um dia. Com
+    shards, junta a versão do primário à copiada para cada shard. Erro na
+    consulta levanta LookupError, que não fica no cache: a próxima execução
+    tenta de novo.
+    """
+    try:
+        # Toda página depende da versão: passa à frente das consultas pesadas
+        partes = [fetch_query(VERSAO_QUERY, prioridade=INTERATIVA)]
+        if get_shard_map() is not None:
+            partes += fetch_sharded({'versao': (VERSAO_QUERY, None)}, prioridade=INTERATIVA)['versao']
+    except QueryRejected as e:
+        raise LookupError(f"Versão dos dados indisponível: {e.msg}") from e
+    except (QueryCancelled, Error) as e:
+        raise LookupError(f"Versão dos dados indisponível: {e}") from e
+    if any(parte.empty for parte in partes):
+        raise LookupError("Versão dos dados não registrada (aplique a migração 008_versao_dados)")
+    return tuple(str(v) for parte in partes for v in parte.iloc[0])
@@ -0,0 +1,186 @@
+"""Índice espacial em memória dos estabelecimentos, para a busca dos postos mais próximos.
+
+Os estabelecimentos com coordenadas são distribuídos numa grade regular de
+latitude/longitude. A busca dos k mais próximos examina as células em anéis
+crescentes em volta do ponto e para quando nenhuma célula fora dos anéis já
+vistos pode ter um estabelecimento mais perto que o k-ésimo encontrado: o
+custo depende da densidade local, não do total de estabelecimentos.
+
+O índice é montado uma vez por versão dos dados (load_data_version) e
+compartilhado entre as sessões.
+"""
+import math
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.db_functions import execute_query
+
+RAIO_TERRA_KM = 6371.0
+KM_POR_GRAU = math.pi * RAIO_TERRA_KM / 180
+
+# Janela (antes da última aplicação) usada para volume de doses e vacinas oferecidas
+JANELA_DIAS = 90
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Distância em km do ponto (lat, lon) a cada par de `lats`/`lons`"""
+    lat, lon, lats, lons = map(np.radians, (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    """Grade de células de `celula` graus com os índices dos pontos de cada uma"""
+
+    def __init__(self, lats, lons, celula=0.1):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.celula = celula
+        cx = np.floor(self.lons / celula).astype(np.int64)
+        cy = np.floor(self.lats / celula).astype(np.int64)
+
+        # Pontos ordenados por célula; cada célula guarda a fatia correspondente
+        ordem = np.lexsort((cy, cx))
+        self._ordem = ordem
+        self._celulas = {}
+        if len(ordem):
+            chaves = np.stack([cx[ordem], cy[ordem]], axis=1)
+            inicio = np.flatnonzero(np.any(np.diff(chaves, axis=0) != 0, axis=1)) + 1
+            limites = np.concatenate([[0], inicio, [len(ordem)]])
+            for a, b in zip(limites[:-1], limites[1:]):
+                self._celulas[(int(chaves[a, 0]), int(chaves[a, 1]))] = (a, b)
+            xs, ys = zip(*self._celulas)
+            self._extensao = (min(xs), max(xs), min(ys), max(ys))
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _ring(self, cx, cy, r):
+        """Índices dos pontos nas células a distância de Chebyshev exatamente `r`"""
+        if r == 0:
+            vizinhas = [(cx, cy)]
+        else:
+            vizinhas = [(cx + dx, cy + dy) for dx in (-r, r) for dy in range(-r, r + 1)]
+            vizinhas += [(cx + dx, cy + dy) for dy in (-r, r) for dx in range(-r + 1, r)]
+        fatias = [self._celulas[c] for c in vizinhas if c in self._celulas]
+        if not fatias:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self._ordem[a:b] for a, b in fatias])
+
+    def _unseen_bound_km(self, lat, lon, cx, cy, r):
+        """Limite inferior da distância do ponto a qualquer ponto fora dos anéis 0..r"""
+        c = self.celula
+        folga_lat = min(lat - (cy - r) * c, (cy + r + 1) * c - lat)
+        folga_lon = min(lon - (cx - r) * c, (cx + r + 1) * c - lon)
+        # Um grau de longitude encolhe com a latitude: usa a mais distante do equador na faixa
+        lat_extrema = min(90.0, abs(lat) + (r + 1) * c)
+        return min(folga_lat, folga_lon * math.cos(math.radians(lat_extrema))) * KM_POR_GRAU
+
+    def nearest(self, lat, lon, k, mascara=None):
+        """(índices, distâncias em km) dos `k` pontos mais próximos, do mais perto ao mais longe.
+
+        `mascara` (bool por ponto) restringe a busca aos pontos marcados.
+        """
+        if not self._celulas:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        cx, cy = math.floor(lon / self.celula), math.floor(lat / self.celula)
+        x0, x1, y0, y1 = self._extensao
+        r_max = max(abs(cx - x0), abs(cx - x1), abs(cy - y0), abs(cy - y1))
+
+        indices, distancias = [], []
+        encontrados = 0
+        for r in range(r_max + 1):
+            novos = self._ring(cx, cy, r)
+            if mascara is not None and len(novos):
+                novos = novos[mascara[novos]]
+            if len(novos):
+                indices.append(novos)
+                distancias.append(haversine_km(lat, lon, self.lats[novos], self.lons[novos]))
+                encontrados += len(novos)
+            if encontrados >= k:
+                kesima = np.partition(np.concatenate(distancias), k - 1)[k - 1]
+                if kesima <= self._unseen_bound_km(lat, lon, cx, cy, r):
+                    break
+
+        if not indices:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        indices, distancias = np.concatenate(indices), np.concatenate(distancias)
+        melhores = np.argsort(distancias, kind='stable')[:k]
+        return indices[melhores], distancias[melhores]
+
+
+class SiteIndex:
+    """Estabelecimentos com coordenadas, volume recente de doses e vacinas aplicadas, indexados pela grade"""
+
+    def __init__(self, sites, celula=0.1):
+        self.sites = sites.reset_index(drop=True)
+        self.grade = GridIndex(self.sites['latitude'], self.sites['longitude'], celula)
+
+    def centroid(self, municipio):
+        """Centro dos estabelecimentos do município (não há coordenadas de municípios no banco)"""
+        do_municipio = self.sites[self.sites['municipio'] == municipio]
+        if do_municipio.empty:
+            return None
+        return float(do_municipio['latitude'].mean()), float(do_municipio['longitude'].mean())
+
+    def nearest(self, lat, lon, k=10, vacina=None):
+        """DataFrame dos `k` estabelecimentos mais próximos (com distancia_km); com `vacina`, só os que a aplicam"""
+        mascara = None
+        if vacina:
+            mascara = self.sites['vacinas'].map(lambda vacinas: vacina in vacinas).to_numpy()
+        indices, distancias = self.grade.nearest(lat, lon, k, mascara)
+        resultado = self.sites.iloc[indices].copy()
+        resultado.insert(0, 'distancia_km', distancias.round(2))
+        return resultado
+
+
+def load_sites(janela_dias=JANELA_DIAS):
+    """Estabelecimentos com coordenadas, com doses e vacinas aplicadas nos últimos `janela_dias` dias dos dados"""
+    ultima = execute_query("SELECT MAX(data_vacina) AS ultima FROM AplicacaoDoseCompacta")
+    if ultima.empty or pd.isna(ultima['ultima'].iloc[0]):
+        return pd.DataFrame()
+    desde = pd.Timestamp(ultima['ultima'].iloc[0]).date() - timedelta(days=janela_dias)
+
+    sites = execute_query("""
+        SELECT id_cnes, nome_fantasia, municipio, tipo, latitude, longitude
+        FROM Estabelecimento
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """)
+    if sites.empty:
+        return sites
+    volume = execute_query("""
+        SELECT ad.cnes AS id_cnes, v.nome AS vacina, COUNT(*) AS doses
+        FROM AplicacaoDoseCompacta ad
+        JOIN Vacina v ON v.id = ad.id_vacina
+        WHERE ad.data_vacina > %s
+        GROUP BY ad.cnes, v.nome
+    """, [desde])
+
+    sites['latitude'] = sites['latitude'].astype(float)
+    sites['longitude'] = sites['longitude'].astype(float)
+    if volume.empty:
+        sites['doses'] = 0
+        sites['vacinas'] = [() for _ in range(len(sites))]
+        return sites
+    por_site = volume.sort_values('doses', ascending=False).groupby('id_cnes').agg(
+        doses=('doses', 'sum'), vacinas=('vacina', tuple))
+    sites = sites.join(por_site, on='id_cnes')
+    sites['doses'] = sites['doses'].fillna(0).astype(int)
+    sites['vacinas'] = sites['vacinas'].map(lambda v: v if isinstance(v, tuple) else ())
+    return sites
+
+
+@st.cache_resource(max_entries=2)
+def get_site_index(versao):
+    """Índice dos estabelecimentos para a versão dos dados, compartilhado entre as sessões.
+
+    Sem estabelecimentos (ou com erro na consulta) levanta LookupError, que
+    não fica no cache: a próxima execução tenta de novo.
+    """
+    sites = load_sites()
+    if sites.empty:
+        raise LookupError("Nenhum estabelecimento com coordenadas")
+    return SiteIndex(sites)
@@ -0,0 +1,216 @@
+"""Consultas nomeadas da página de estatísticas de 2024.
+
+Ficam aqui, e não na página, para que a API (utils.api) sirva exatamente os
+mesmos resultados que a página mostra. Com shards (utils.shards), cada
+consulta tem em PARCIAIS a versão que roda em cada shard e como juntar os
+resultados.
+"""
+import re
+
+import pandas as pd
+from mysql.connector import Error
+
+from utils.db_functions import execute_query, fetch_sharded, get_shard_map, query_request, report_query_error
+from utils.query_control import QueryCancelled
+from utils.shards import hll_estimate, hll_query, merge_partials, sort_like_sql
+
+CONSULTAS = {
+    'total_doses': 'SELECT COUNT(*) as total_doses FROM AplicacaoDoseCompacta',
+    'pacientes_vacinados': 'SELECT COUNT(DISTINCT sk_paciente) as unique_patients FROM AplicacaoDoseCompacta',
+    'idade_media': 'SELECT AVG(idade) as average_age FROM PacienteCompacto',
+    'doses_unicas': "SELECT COUNT(ad.id_aplicacao) as unique_doses FROM AplicacaoDoseCompacta ad JOIN DoseVacina d ON ad.id_dose = d.id WHERE d.descricao LIKE '%Única%'",
+    'top_vacinas': """
+        SELECT
+            V.nome AS Nome_Vacina,
+            COUNT(A.id_aplicacao) AS Vezes_Utilizada
+        FROM
+            vacinacao.Vacina V
+        LEFT JOIN
+            vacinacao.AplicacaoDose A ON V.id = A.id_vacina
+        GROUP BY
+            V.nome
+        ORDER BY
+            Vezes_Utilizada DESC
+        LIMIT 10;
+    """,
+    'estabelecimentos_acima_media': """
+        SELECT
+            E.nome_fantasia,
+            COUNT(A.id_aplicacao) AS Total_Aplicacoes
+        FROM
+            vacinacao.Estabelecimento E
+        JOIN
+            vacinacao.AplicacaoDose A ON E.id_cnes = A.cnes
+        GROUP BY
+            E.nome_fantasia
+        HAVING
+            COUNT(A.id_aplicacao) > (
+                SELECT COUNT(*) / COUNT(DISTINCT cnes)
+                FROM vacinacao.AplicacaoDose ad
+            )
+        ORDER BY
+            Total_Aplicacoes DESC
+        LIMIT 10;
+    """,
+    'aplicacoes_por_estabelecimento': """
+        SELECT
+            e.id_cnes,
+            e.latitude,
+            e.longitude,
+            COUNT(A.id_aplicacao) AS total
+        FROM vacinacao.AplicacaoDose A
+        INNER JOIN vacinacao.Estabelecimento e ON A.cnes = e.id_cnes
+        GROUP BY e.id_cnes, e.latitude, e.longitude
+    """,
+    'idosos_municipio': """
+        SELECT
+            E.municipio AS Municipio,
+            COUNT(A.id_aplicacao) AS Total_Idosos_Vacinados
+        FROM vacinacao.AplicacaoDose A
+        INNER JOIN
+            vacinacao.Estabelecimento E ON A.cnes = E.id_cnes
+        WHERE
+            A.id_paciente IN (
+                SELECT id_paciente
+                FROM vacinacao.Paciente
+                WHERE idade > 60
+            )
+        GROUP BY
+            E.municipio
+        ORDER BY
+            Total_Idosos_Vacinados DESC
+        LIMIT 10;
+    """,
+    'vacinas_idosos': """
+        SELECT
+            V.nome AS Nome_Vacina,
+            COUNT(A.id_aplicacao) AS Total_Doses
+        FROM
+            vacinacao.AplicacaoDose A
+        INNER JOIN
+            vacinacao.Vacina V ON A.id_vacina = V.id
+        WHERE
+            A.id_paciente IN (
+                SELECT id_paciente
+                FROM vacinacao.Paciente
+                WHERE idade > 60
+            )
+            AND V.nome <> 'SEM INFORMAÇÃO'
+        GROUP BY
+            V.nome
+        ORDER BY
+            Total_Doses DESC
+        LIMIT 5;
+    """,
+    'paciente_mais_velho': """
+        SELECT
+            P.id_paciente,
+            P.idade,
+            P.municipio AS Municipio_Residencia,
+            A.data_vacina,
+            A.dose_vacina,
+            V.nome AS Vacina_Aplicada,
+            E.nome_fantasia AS Local_Aplicacao
+        FROM
+            vacinacao.AplicacaoDose  A
+        INNER JOIN
+            vacinacao.Paciente P ON A.id_paciente = P.id_paciente
+        INNER JOIN
+            vacinacao.Vacina V ON A.id_vacina = V.id
+        INNER JOIN
+            vacinacao.Estabelecimento E ON A.cnes = E.id_cnes
+        WHERE
+            P.idade = (SELECT MAX(idade) FROM vacinacao.Paciente);
+    """,
+    'vacinas_nacionais': """
+        SELECT
+            V.nome AS Nome_Vacina,
+            F.nome AS Nome_Fabricante
+        FROM
+            vacinacao.Vacina V
+        INNER JOIN
+            vacinacao.fabrica FAB ON V.id = FAB.id_vacina
+        INNER JOIN
+            vacinacao.Fabricante F ON FAB.id_fabricante = F.id
+        WHERE
+            (F.nome LIKE '%OSWALDO CRUZ%' OR F.nome LIKE '%BUTANTAN%')
+            AND V.nome NOT LIKE '%SEM INFORMAÇÃO%'
+        ORDER BY F.nome, V.nome;
+    """,
+}
+
+
+def _sem_limite(consulta):
+    return re.sub(r'\s*LIMIT\s+\d+\s*;?\s*$', '', consulta)
+
+
+def _juntar(**regras):
+    """Junta a parte 'consulta' de cada shard com merge_partials"""
+    return lambda partes: merge_partials(partes['consulta'], **regras)
+
+
+def _acima_da_media(partes):
+    """Estabelecimentos acima da média de aplicações por CNES; os CNES aparecem em vários shards (HLL)"""
+    por_nome = merge_partials(partes['consulta'], grupo=['nome_fantasia'])
+    total = merge_partials(partes['total'])['aplicacoes'].iloc[0]
+    cnes = hll_estimate(pd.concat(partes['cnes'], ignore_index=True))['estimativa'].iloc[0]
+    acima = por_nome[por_nome['Total_Aplicacoes'] > (total / cnes if cnes else 0)]
+    return sort_like_sql(acima, 'Total_Aplicacoes DESC').head(10).reset_index(drop=True)
+
+
+def _mais_velho(partes):
+    """Aplicações do paciente mais velho entre os mais velhos de cada shard"""
+    dados = pd.concat(partes['consulta'], ignore_index=True)
+    return dados[dados['idade'] == dados['idade'].max()].reset_index(drop=True)
+
+
+# Consultas de cada shard ({parte: SQL}) e junção dos resultados. Fora daqui
+# (vacinas_nacionais), a consulta só usa tabelas de referência e roda no primário
+PARCIAIS = {
+    'total_doses': ({'consulta': CONSULTAS['total_doses']}, _juntar()),
+    # Cada paciente está num único shard: os distintos de cada um somam
+    'pacientes_vacinados': ({'consulta': CONSULTAS['pacientes_vacinados']}, _juntar()),
+    'idade_media': ({'consulta': "SELECT SUM(idade) AS _soma, COUNT(idade) AS _n FROM PacienteCompacto"},
+                    _juntar(medias={'average_age': ('_soma', '_n')})),
+    'doses_unicas': ({'consulta': CONSULTAS['doses_unicas']}, _juntar()),
+    'top_vacinas': ({'consulta': _sem_limite(CONSULTAS['top_vacinas'])},
+                    _juntar(grupo=['Nome_Vacina'], ordem='Vezes_Utilizada DESC', limite=10)),
+    'estabelecimentos_acima_media': ({
+        'consulta': """
+            SELECT E.nome_fantasia, COUNT(A.id_aplicacao) AS Total_Aplicacoes
+            FROM vacinacao.Estabelecimento E
+            JOIN vacinacao.AplicacaoDose A ON E.id_cnes = A.cnes
+            GROUP BY E.nome_fantasia
+        """,
+        'total': "SELECT COUNT(*) AS aplicacoes FROM vacinacao.AplicacaoDose",
+        'cnes': hll_query("SELECT cnes AS _valor FROM vacinacao.AplicacaoDose"),
+    }, _acima_da_media),
+    'aplicacoes_por_estabelecimento': ({'consulta': CONSULTAS['aplicacoes_por_estabelecimento']},
+                                       _juntar(grupo=['id_cnes', 'latitude', 'longitude'])),
+    'idosos_municipio': ({'consulta': _sem_limite(CONSULTAS['idosos_municipio'])},
+                         _juntar(grupo=['Municipio'], ordem='Total_Idosos_Vacinados DESC', limite=10)),
+    'vacinas_idosos': ({'consulta': _sem_limite(CONSULTAS['vacinas_idosos'])},
+                       _juntar(grupo=['Nome_Vacina'], ordem='Total_Doses DESC', limite=5)),
+    'paciente_mais_velho': ({'consulta': CONSULTAS['paciente_mais_velho']}, _mais_velho),
+}
+
+
+def statistic_request(nome):
+    """Pedido (chave, loader) da consulta nomeada; com shards, roda em todos e junta as partes"""
+    if get_shard_map() is None or nome not in PARCIAIS:
+        return query_request(('estatisticas', nome), CONSULTAS[nome], None)
+    consultas, juntar = PARCIAIS[nome]
+    return ('estatisticas', nome), lambda handle=None: juntar(
+        fetch_sharded({parte: (sql, None) for parte, sql in consultas.items()}, handle=handle))
+
+
+def load_statistic(nome):
+    """Resultado da consulta nomeada para a página (vazio em caso de erro, como execute_query)"""
+    if get_shard_map() is None or nome not in PARCIAIS:
+        return execute_query(CONSULTAS[nome])
+    _, loader = statistic_request(nome)
+    try:
+        return loader()
+    except (QueryCancelled, Error) as e:
+        report_query_error(e, CONSULTAS[nome])
+        return pd.DataFrame()
@@ -0,0 +1,140 @@
+"""Exportação das linhas por trás dos filtros do painel, em CSV compactado ou Parquet.
+
+A junção completa do painel (DASHBOARD_QUERY) é lida do cursor em lotes e
+cada lote vai direto para o arquivo como RecordBatch do Arrow, sem montar um
+DataFrame: a memória usada é a de um lote, qualquer que seja o período.
+
+Uso: cd app && uv run python -m utils.exportacao --inicio 2024-01-01 --fim 2024-12-31 --destino doses_2024.parquet
+"""
+import argparse
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from utils.db_functions import DASHBOARD_QUERY, build_filters, get_backend
+
+LOTE = 50_000
+
+# Arquivos gerados pelo painel; os mais antigos que VALIDADE_S são apagados a cada nova exportação
+DIRETORIO = Path(tempfile.gettempdir()) / 'vacinacao_exportacoes'
+VALIDADE_S = 3600
+
+# formato -> (extensão do arquivo, tipo MIME do download)
+FORMATOS = {
+    'csv': ('.csv.gz', 'application/gzip'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+
+def export_query(data_inicio, data_fim, municipios, doses, vacinas, estabelecimentos=(), ufs=()):
+    """Consulta linha a linha com os mesmos filtros do painel (sempre no primário, mesmo com shards)"""
+    filtros, params = build_filters(municipios, doses, vacinas, estabelecimentos, ufs)
+    return DASHBOARD_QUERY + filtros, [data_inicio, data_fim] + params
+
+
+def count_query(data_inicio, data_fim, municipios, doses, vacinas, estabelecimentos=(), ufs=()):
+    """Total de linhas da exportação, para o progresso"""
+    filtros, params = build_filters(municipios, doses, vacinas, estabelecimentos, ufs)
+    juncao = "LEFT JOIN Estabelecimento e ON ad.cnes = e.id_cnes" if municipios else ""
+    query = f"""
+    SELECT COUNT(*) AS linhas
+    FROM AplicacaoDoseCompacta ad
+    {juncao}
+    WHERE ad.data_vacina BETWEEN %s AND %s {filtros}
+    """
+    return query, [data_inicio, data_fim] + params
+
+
+def new_export_file(formato, validade_s=VALIDADE_S):
+    """Caminho de um arquivo novo em DIRETORIO, apagando antes os mais antigos que `validade_s`.
+
+    As sessões encerradas ou abandonadas não apagam o próprio arquivo; a
+    limpeza por idade garante que ele não fique para sempre no disco.
+    """
+    DIRETORIO.mkdir(exist_ok=True)
+    limite = time.time() - validade_s
+    for arquivo in DIRETORIO.iterdir():
+        try:
+            if arquivo.stat().st_mtime < limite:
+                arquivo.unlink()
+        except FileNotFoundError:
+            # Outra sessão apagou primeiro
+            pass
+    descritor, caminho = tempfile.mkstemp(prefix='exportacao_', suffix=FORMATOS[formato][0], dir=DIRETORIO)
+    os.close(descritor)
+    return caminho
+
+
+@contextmanager
+def open_writer(caminho, formato, schema):
+    """Escritor de RecordBatches no formato pedido (write_batch)"""
+    if formato == 'parquet':
+        escritor = pq.ParquetWriter(caminho, schema, compression='zstd')
+        try:
+            yield escritor
+        finally:
+            escritor.close()
+        return
+
+    saida = pa.CompressedOutputStream(caminho, 'gzip')
+    try:
+        escritor = pa_csv.CSVWriter(saida, schema)
+        try:
+            yield escritor
+        finally:
+            escritor.close()
+    finally:
+        saida.close()
+
+
+def export_rows(query, params, caminho, formato, handle=None, lote=LOTE, backend=None):
+    """Grava o resultado da consulta em `caminho`, gerando o total de linhas após cada lote.
+
+    Feche o gerador (ou cancele o `handle`) para interromper a exportação;
+    o arquivo parcial fica para quem chamou remover.
+    """
+    backend = backend or get_backend()
+    lotes = backend.stream(query, params, lote, handle)
+    try:
+        primeiro = next(lotes)
+        total = 0
+        with open_writer(caminho, formato, primeiro.schema) as escritor:
+            for batch in _chain(primeiro, lotes):
+                escritor.write_batch(batch)
+                total += batch.num_rows
+                yield total
+    finally:
+        lotes.close()
+
+
+def _chain(primeiro, resto):
+    yield primeiro
+    yield from resto
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--inicio', type=date.fromisoformat, required=True)
+    parser.add_argument('--fim', type=date.fromisoformat, required=True)
+    parser.add_argument('--municipio', action='append', default=[], help='município do estabelecimento (repetível)')
+    parser.add_argument('--dose', action='append', default=[], help='tipo de dose (repetível)')
+    parser.add_argument('--vacina', action='append', default=[], help='nome da vacina (repetível)')
+    parser.add_argument('--cnes', type=int, action='append', default=[], help='CNES do estabelecimento (repetível)')
+    parser.add_argument('--uf', action='append', default=[], help='UF de residência do paciente (repetível)')
+    parser.add_argument('--destino', required=True, help='arquivo .parquet ou .csv.gz')
+    parser.add_argument('--lote', type=int, default=LOTE)
+    args = parser.parse_args()
+
+    formato = 'parquet' if args.destino.endswith('.parquet') else 'csv'
+    query, params = export_query(args.inicio, args.fim, args.municipio, args.dose, args.vacina, args.cnes, args.uf)
+    total = 0
+    for total in export_rows(query, params, args.destino, formato, lote=args.lote):
+        print(f"\r  {total:,} linhas", end='', flush=True)
+    print(f"\nExportadas {total:,} linhas para {args.destino} ({os.path.getsize(args.destino) / 2**20:.1f} MB)")
@@ -0,0 +1,87 @@
+"""Cache de figuras matplotlib já renderizadas.
+
+As figuras da página de estatísticas só mudam quando os dados mudam: o PNG
+é guardado por (id do gráfico, versão dos dados, tamanho) e servido direto
+nas execuções seguintes, sem consultar o banco nem renderizar de novo.
+"""
+import io
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+
+class FigureCache:
+    """LRU de imagens renderizadas, limitada em bytes"""
+
+    def __init__(self, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        self._imagens = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            imagem = self._imagens.get(chave)
+            if imagem is not None:
+                self._imagens.move_to_end(chave)
+            return imagem
+
+    def put(self, chave, imagem):
+        with self._lock:
+            anterior = self._imagens.pop(chave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+            self._imagens[chave] = imagem
+            self._bytes += len(imagem)
+            while self._bytes > self.max_bytes and len(self._imagens) > 1:
+                _, descartada = self._imagens.popitem(last=False)
+                self._bytes -= len(descartada)
+
+    def stats(self):
+        with self._lock:
+            return {'imagens': len(self._imagens), 'bytes': self._bytes}
+
+
+@st.cache_resource
+def get_figure_cache():
+    """Cache de figuras compartilhado por todas as sessões do processo"""
+    return FigureCache()
+
+
+def render_png(desenhar, dados, tamanho, dpi=100):
+    """Desenha `desenhar(fig, dados)` numa Figure avulsa e retorna os bytes PNG.
+
+    A Figure não é registrada no pyplot, então não fica presa ao gerenciador
+    de figuras; é limpa ao final em vez de depender de plt.close(). O
+    matplotlib só é importado quando alguma figura precisa ser renderizada.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=tamanho, dpi=dpi)
+    try:
+        desenhar(fig, dados)
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png')
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+def cached_figure(grafico, versao, tamanho, carregar, desenhar):
+    """PNG do gráfico para a versão dos dados; consulta e renderiza só na falta.
+
+    `carregar()` retorna o DataFrame do gráfico. Resultados vazios (erro na
+    consulta) não são guardados e retornam None.
+    """
+    cache = get_figure_cache()
+    chave = (grafico, versao, tamanho)
+    imagem = cache.get(chave)
+    if imagem is None:
+        dados = carregar()
+        if dados.empty:
+            return None
+        imagem = render_png(desenhar, dados, tamanho)
+        cache.put(chave, imagem)
+    return imagem
@@ -0,0 +1,236 @@
+"""Mapa coroplético de doses por município, com geometrias simplificadas em cache.
+
+As geometrias vêm de um GeoJSON local (GEOJSON_MUNICIPIOS, um polígono por
+município com o nome numa das propriedades de CAMPOS_NOME). Ao carregar, cada
+geometria é simplificada por Douglas-Peucker em alguns níveis de tolerância
+(TOLERANCIAS), com as coordenadas arredondadas à precisão do nível; isso é
+feito uma vez por processo e compartilhado entre as sessões.
+
+O mapa junta as geometrias às linhas já agregadas da seção de municípios do
+painel (dezenas de linhas, uma por município, pelo nome normalizado) e usa o
+nível mais grosseiro cujo erro ainda fica abaixo de um pixel na extensão
+exibida: o estado inteiro sai com poucos vértices, um município isolado com
+o contorno detalhado.
+
+Uso: cd app && uv run python -m utils.mapa
+"""
+import argparse
+import json
+import math
+import os
+import time
+
+import folium
+import numpy as np
+import streamlit as st
+from branca.colormap import linear
+
+from utils.busca import normalize
+from utils.constants import GEOJSON_MUNICIPIOS
+from utils.db_functions import formatar_numero
+
+# Propriedades do GeoJSON em que o nome do município é procurado, nessa ordem
+CAMPOS_NOME = ('nome', 'name', 'NM_MUN', 'NM_MUNICIP', 'NOME_MUNIC')
+
+# Tolerâncias de simplificação (graus): ~50 m, ~200 m e ~1 km
+TOLERANCIAS = (0.0005, 0.002, 0.01)
+
+# Largura aproximada do mapa no painel (px), para escolher o nível de detalhe
+LARGURA_PX = 800
+
+
+def douglas_peucker(pontos, tolerancia):
+    """Pontos da linha que ficam após a simplificação de Douglas-Peucker (pilha, sem recursão)"""
+    pontos = np.asarray(pontos, dtype=np.float64)
+    n = len(pontos)
+    if n < 3:
+        return pontos
+    manter = np.zeros(n, dtype=bool)
+    manter[[0, -1]] = True
+    pilha = [(0, n - 1)]
+    while pilha:
+        a, b = pilha.pop()
+        if b - a < 2:
+            continue
+        segmento = pontos[b] - pontos[a]
+        trecho = pontos[a + 1:b] - pontos[a]
+        comprimento = math.hypot(*segmento)
+        if comprimento == 0:
+            # Anel fechado: o primeiro e o último ponto coincidem
+            distancias = np.hypot(trecho[:, 0], trecho[:, 1])
+        else:
+            distancias = np.abs(segmento[0] * trecho[:, 1] - segmento[1] * trecho[:, 0]) / comprimento
+        i = int(np.argmax(distancias))
+        if distancias[i] > tolerancia:
+            meio = a + 1 + i
+            manter[meio] = True
+            pilha += [(a, meio), (meio, b)]
+    return pontos[manter]
+
+
+def _decimals(tolerancia):
+    """Casas decimais que bastam para representar a tolerância"""
+    return min(6, max(3, math.ceil(-math.log10(tolerancia)) + 1))
+
+
+def _simplify_polygon(aneis, tolerancia, casas):
+    """Polígono simplificado; None se o anel externo colapsar (buracos que colapsam saem)"""
+    simplificados = []
+    for i, anel in enumerate(aneis):
+        pontos = np.round(douglas_peucker(anel, tolerancia), casas)
+        if len(pontos) < 4:
+            if i == 0:
+                return None
+            continue
+        simplificados.append(pontos.tolist())
+    return simplificados
+
+
+def simplify_geometry(geometria, tolerancia):
+    """Polygon ou MultiPolygon simplificado; partes que colapsam são descartadas.
+
+    Se todas as partes colapsarem (município menor que a tolerância), mantém
+    a geometria original para que ele continue aparecendo no mapa.
+    """
+    casas = _decimals(tolerancia)
+    poligonos = [geometria['coordinates']] if geometria['type'] == 'Polygon' else geometria['coordinates']
+    partes = [p for p in (_simplify_polygon(aneis, tolerancia, casas) for aneis in poligonos) if p]
+    if not partes:
+        return geometria
+    if len(partes) == 1:
+        return {'type': 'Polygon', 'coordinates': partes[0]}
+    return {'type': 'MultiPolygon', 'coordinates': partes}
+
+
+def count_vertices(geometria):
+    poligonos = [geometria['coordinates']] if geometria['type'] == 'Polygon' else geometria['coordinates']
+    return sum(len(anel) for aneis in poligonos for anel in aneis)
+
+
+def _bounds(geometria):
+    poligonos = [geometria['coordinates']] if geometria['type'] == 'Polygon' else geometria['coordinates']
+    pontos = np.concatenate([np.asarray(aneis[0], dtype=np.float64) for aneis in poligonos])
+    (lon_min, lat_min), (lon_max, lat_max) = pontos.min(axis=0), pontos.max(axis=0)
+    return lat_min, lon_min, lat_max, lon_max
+
+
+def load_geometries(caminho=GEOJSON_MUNICIPIOS):
+    """{nome normalizado: (nome, geometria)} dos polígonos do GeoJSON"""
+    with open(caminho, encoding='utf-8') as arquivo:
+        colecao = json.load(arquivo)
+    geometrias = {}
+    for feicao in colecao.get('features', []):
+        geometria, propriedades = feicao.get('geometry'), feicao.get('properties') or {}
+        if not geometria or geometria['type'] not in ('Polygon', 'MultiPolygon'):
+            continue
+        nome = next((propriedades[c] for c in CAMPOS_NOME if propriedades.get(c)), None)
+        if nome:
+            geometrias[normalize(nome)] = (str(nome), geometria)
+    return geometrias
+
+
+class MunicipalityGeometries:
+    """Geometrias dos municípios em cada nível de TOLERANCIAS, com a extensão de cada um"""
+
+    def __init__(self, geometrias, tolerancias=TOLERANCIAS):
+        self.nomes = {chave: nome for chave, (nome, _) in geometrias.items()}
+        self.extensoes = {chave: _bounds(geometria) for chave, (_, geometria) in geometrias.items()}
+        self.niveis = {
+            tolerancia: {chave: simplify_geometry(geometria, tolerancia)
+                         for chave, (_, geometria) in geometrias.items()}
+            for tolerancia in sorted(tolerancias)
+        }
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def __contains__(self, chave):
+        return chave in self.nomes
+
+    def vertices(self, tolerancia):
+        return sum(count_vertices(g) for g in self.niveis[tolerancia].values())
+
+    def extent(self, chaves):
+        """(lat_min, lon_min, lat_max, lon_max) dos municípios"""
+        caixas = np.array([self.extensoes[c] for c in chaves])
+        return (*caixas[:, :2].min(axis=0), *caixas[:, 2:].max(axis=0))
+
+    def level_for(self, chaves, largura_px=LARGURA_PX):
+        """Maior tolerância abaixo do tamanho de um pixel na extensão dos municípios"""
+        lat_min, lon_min, lat_max, lon_max = self.extent(chaves)
+        pixel = max(lat_max - lat_min, lon_max - lon_min) / largura_px
+        adequadas = [t for t in self.niveis if t <= pixel]
+        return adequadas[-1] if adequadas else min(self.niveis)
+
+
+@st.cache_resource
+def get_geometries(caminho=GEOJSON_MUNICIPIOS):
+    """Geometrias simplificadas do arquivo, carregadas uma vez por processo.
+
+    Sem o arquivo levanta LookupError, que não fica no cache.
+    """
+    if not os.path.exists(caminho):
+        raise LookupError(f"Arquivo de geometrias não encontrado: {caminho} (GEOJSON_MUNICIPIOS)")
+    geometrias = load_geometries(caminho)
+    if not geometrias:
+        raise LookupError(f"Nenhum polígono com nome de município em {caminho}")
+    return MunicipalityGeometries(geometrias)
+
+
+def choropleth(dados, geometrias, coluna='Total de Doses', tolerancia=None):
+    """Mapa folium das linhas agregadas por `Município`, coloridas por `coluna`.
+
+    Retorna (mapa, tolerância usada, municípios sem geometria). Só os
+    municípios presentes em `dados` entram no GeoJSON do mapa.
+    """
+    valores = {}
+    sem_geometria = []
+    for nome, valor in zip(dados['Município'], dados[coluna]):
+        chave = normalize(nome)
+        if chave in geometrias:
+            valores[chave] = valores.get(chave, 0) + float(valor)
+        else:
+            sem_geometria.append(nome)
+    if not valores:
+        return None, None, sem_geometria
+
+    tolerancia = tolerancia or geometrias.level_for(valores)
+    nivel = geometrias.niveis[tolerancia]
+    escala = linear.YlOrRd_09.scale(min(valores.values()), max(max(valores.values()), min(valores.values()) + 1))
+    escala.caption = coluna
+    colecao = {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'geometry': nivel[chave], 'properties': {
+            'municipio': geometrias.nomes[chave], 'valor': formatar_numero(valor), 'cor': escala(valor),
+        }}
+        for chave, valor in valores.items()
+    ]}
+
+    lat_min, lon_min, lat_max, lon_max = geometrias.extent(valores)
+    mapa = folium.Map(control_scale=True)
+    mapa.fit_bounds([[lat_min, lon_min], [lat_max, lon_max]])
+    folium.GeoJson(
+        colecao,
+        style_function=lambda f: {'fillColor': f['properties']['cor'], 'color': '#555', 'weight': 0.5,
+                                  'fillOpacity': 0.75},
+        highlight_function=lambda f: {'weight': 2, 'color': '#222'},
+        tooltip=folium.GeoJsonTooltip(fields=['municipio', 'valor'], aliases=['Município', coluna]),
+    ).add_to(mapa)
+    escala.add_to(mapa)
+    return mapa, tolerancia, sem_geometria
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--arquivo', default=GEOJSON_MUNICIPIOS)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    originais = load_geometries(args.arquivo)
+    carga = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    geometrias = MunicipalityGeometries(originais)
+    simplificacao = time.perf_counter() - inicio
+    print(f"{len(geometrias)} municípios carregados em {carga:.2f} s, simplificados em {simplificacao:.2f} s")
+    print(f"  original: {sum(count_vertices(g) for _, g in originais.values()):,} vértices")
+    for tolerancia in geometrias.niveis:
+        print(f"  tolerância {tolerancia}: {geometrias.vertices(tolerancia):,} vértices")
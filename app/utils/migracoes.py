@@ -0,0 +1,71 @@
+"""Aplica em ordem os scripts de db/migrations que ainda não rodaram.
+
+Uso: cd app && uv run python -m utils.migracoes
+"""
+import argparse
+from pathlib import Path
+
+from utils.db_functions import open_connection
+from utils.versao import bump_data_version
+
+MIGRACOES_DIR = Path(__file__).resolve().parents[2] / 'db' / 'migrations'
+
+
+def split_statements(sql):
+    """Separa um script em comandos, ignorando linhas de comentário"""
+    linhas = [l for l in sql.splitlines() if not l.lstrip().startswith('--')]
+    return [c.strip() for c in '\n'.join(linhas).split(';') if c.strip()]
+
+
+def pending_migrations(cursor):
+    """Lista os arquivos .sql ainda não registrados em SchemaMigracao"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS SchemaMigracao (
+            versao VARCHAR(100) PRIMARY KEY,
+            aplicada_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT versao FROM SchemaMigracao")
+    aplicadas = {versao for (versao,) in cursor.fetchall()}
+    return [p for p in sorted(MIGRACOES_DIR.glob('*.sql')) if p.stem not in aplicadas]
+
+
+def apply_migrations(conn, ate=None):
+    """Aplica as migrações pendentes (até a versão `ate`, inclusive)"""
+    cursor = conn.cursor()
+    aplicadas = []
+    for arquivo in pending_migrations(cursor):
+        if ate is not None and arquivo.stem > ate:
+            break
+        print(f"Aplicando {arquivo.name}...")
+        for comando in split_statements(arquivo.read_text(encoding='utf-8')):
+            cursor.execute(comando)
+            if cursor.with_rows:
+                cursor.fetchall()
+        cursor.execute("INSERT INTO SchemaMigracao (versao) VALUES (%s)", (arquivo.stem,))
+        conn.commit()
+        aplicadas.append(arquivo.stem)
+    # As migrações mudam os dados: invalida os caches do app (a partir da 008, que cria VersaoDados)
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'VersaoDados'
+    """)
+    (tem_versao,) = cursor.fetchone()
+    if aplicadas and tem_versao:
+        bump_data_version(cursor, f"migração {aplicadas[-1]}")
+        conn.commit()
+    cursor.close()
+    return aplicadas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ate', help='última versão a aplicar (ex.: 001_particiona_aplicacao_dose)')
+    args = parser.parse_args()
+
+    conn = open_connection()
+    try:
+        aplicadas = apply_migrations(conn, args.ate)
+        print(f"{len(aplicadas)} migração(ões) aplicada(s)")
+    finally:
+        conn.close()
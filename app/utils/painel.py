@@ -0,0 +1,407 @@
+"""Seções do painel: consulta agregada de cada uma e a figura correspondente.
+
+Cada seção é carregada por uma consulta própria, agregada no banco, para que
+as seções possam ser buscadas em paralelo e exibidas à medida que ficam
+prontas.
+"""
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from utils.amostragem import estimate_totals
+from utils.constants import APPROX_BUDGET_MS
+from utils.db_functions import (FILTROS, INTERATIVA, build_filters, fetch_sharded, get_result_store, get_shard_map,
+                                query_request)
+from utils.shards import merge_partials
+
+# Junções disponíveis, na ordem em que podem ser encadeadas
+JUNCOES = [
+    ('d', "LEFT JOIN DoseVacina d ON ad.id_dose = d.id"),
+    ('p', "LEFT JOIN PacienteCompacto p ON ad.sk_paciente = p.sk_paciente"),
+    ('sx', "LEFT JOIN Sexo sx ON p.id_sexo = sx.id"),
+    ('rc', "LEFT JOIN RacaCor rc ON p.id_raca_cor = rc.id"),
+    ('m', "LEFT JOIN Municipio m ON p.id_municipio = m.id"),
+    ('v', "LEFT JOIN Vacina v ON ad.id_vacina = v.id"),
+    ('e', "LEFT JOIN Estabelecimento e ON ad.cnes = e.id_cnes"),
+    ('ev', "LEFT JOIN EstrategiaVacinacao ev ON ad.id_estrategia_vacinacao = ev.id"),
+]
+
+FAIXAS_ETARIAS = ['0-10', '10-20', '20-30', '30-40', '40-50', '50-60', '60-70', '70-80', '80+']
+
+# select: colunas; juncoes: apelidos usados; grupo/ordem/limite/condicao: opcionais;
+# select_parcial/medias: colunas nos shards quando há médias, que vêm de soma e contagem;
+# prioridade: no controle de admissão (padrão NORMAL);
+# recorte: (filtro, coluna) quando o GROUP BY tem a dimensão do filtro, para responder
+# a partir de um resultado já carregado com esse filtro mais amplo
+SECOES = {
+    'kpis': {
+        'select': """COUNT(*) AS total_doses,
+                     COUNT(DISTINCT ad.sk_paciente) AS pacientes,
+                     AVG(p.idade) AS idade_media,
+                     SUM(d.descricao LIKE '%%Única%%') AS doses_unicas""",
+        'juncoes': {'d', 'p'},
+        'select_parcial': """COUNT(*) AS total_doses,
+                             COUNT(DISTINCT ad.sk_paciente) AS pacientes,
+                             SUM(p.idade) AS _soma_idade,
+                             COUNT(p.idade) AS _n_idade,
+                             SUM(d.descricao LIKE '%%Única%%') AS doses_unicas""",
+        'medias': {'idade_media': ('_soma_idade', '_n_idade')},
+        'prioridade': INTERATIVA,
+    },
+    'piramide': {
+        'select': f"""ELT(LEAST(CEIL(p.idade / 10), 9), {', '.join(repr(f) for f in FAIXAS_ETARIAS)}) AS grupo_idade,
+                      sx.descricao AS sexo,
+                      COUNT(*) AS count""",
+        'juncoes': {'p', 'sx'},
+        'condicao': "p.idade > 0 AND p.idade <= 100",
+        'grupo': "grupo_idade, sexo",
+    },
+    'vacinas': {
+        'select': "v.nome AS vacina_nome, COUNT(*) AS count",
+        'juncoes': {'v'},
+        'condicao': "v.nome IS NOT NULL",
+        'grupo': "vacina_nome",
+        'ordem': "count DESC",
+        'limite': 10,
+        'recorte': ('vacinas', 'vacina_nome'),
+    },
+    'estrategias': {
+        'select': "ev.descricao AS estrategia, COUNT(*) AS count",
+        'juncoes': {'ev'},
+        'condicao': "ev.descricao IS NOT NULL",
+        'grupo': "estrategia",
+        'ordem': "count DESC",
+    },
+    'racas': {
+        'select': "rc.descricao AS raca_cor, COUNT(*) AS count",
+        'juncoes': {'p', 'rc'},
+        'condicao': "rc.descricao IS NOT NULL",
+        'grupo': "raca_cor",
+        'ordem': "count DESC",
+    },
+    'estabelecimentos': {
+        'select': "e.nome_fantasia AS estabelecimento, COUNT(*) AS count",
+        'juncoes': {'e'},
+        'condicao': "e.nome_fantasia IS NOT NULL",
+        'grupo': "estabelecimento",
+        'ordem': "count DESC",
+        'limite': 10,
+    },
+    'doses': {
+        'select': """d.descricao AS `Tipo de Dose`,
+                     COUNT(DISTINCT ad.sk_paciente) AS Pacientes,
+                     COUNT(*) AS `Total de Doses`""",
+        'juncoes': {'d'},
+        'condicao': "d.descricao IS NOT NULL",
+        'grupo': "`Tipo de Dose`",
+        'ordem': "`Total de Doses` DESC",
+        'recorte': ('doses', 'Tipo de Dose'),
+    },
+    'ultimas': {
+        'select': """ad.data_vacina, v.nome AS vacina_nome, d.descricao AS dose_vacina, p.idade,
+                     sx.descricao AS sexo, m.nome AS paciente_municipio,
+                     e.nome_fantasia AS estabelecimento_nome""",
+        'juncoes': {'v', 'd', 'p', 'sx', 'm', 'e'},
+        'ordem': "ad.data_vacina DESC",
+        'limite': 50,
+    },
+    'municipios': {
+        'select': """m.nome AS `Município`,
+                     COUNT(DISTINCT ad.sk_paciente) AS `Pacientes Únicos`,
+                     COUNT(*) AS `Total de Doses`""",
+        'juncoes': {'p', 'm'},
+        'condicao': "m.nome IS NOT NULL",
+        'grupo': "`Município`",
+        'ordem': "`Total de Doses` DESC",
+    },
+}
+
+
+# Seções de contagem que o modo aproximado estima a partir da amostra
+ESTIMAVEIS = ['piramide', 'vacinas', 'estrategias', 'racas', 'estabelecimentos']
+
+
+def _compose(secao, tabela, data_inicio, data_fim, municipios, doses, vacinas, estabelecimentos=(), ufs=(),
+             extra_select='', extra_juncao='', extra_grupo=''):
+    filtros, params = build_filters(municipios, doses, vacinas, estabelecimentos, ufs)
+
+    usadas = set(secao['juncoes'])
+    if municipios:
+        usadas.add('e')
+    juncoes = '\n'.join(sql for apelido, sql in JUNCOES if apelido in usadas)
+
+    query = f"""
+    SELECT {secao['select']}{extra_select}
+    FROM {tabela} ad
+    {juncoes}
+    {extra_juncao}
+    WHERE ad.data_vacina BETWEEN %s AND %s {filtros}
+    """
+    if 'condicao' in secao:
+        query += f" AND {secao['condicao']}"
+    if 'grupo' in secao:
+        query += f" GROUP BY {secao['grupo']}{extra_grupo}"
+    return query, [data_inicio, data_fim] + params
+
+
+def _section_sql(secao, *filtros):
+    query, params = _compose(secao, 'AplicacaoDoseCompacta', *filtros)
+    if 'ordem' in secao:
+        query += f" ORDER BY {secao['ordem']}"
+    if 'limite' in secao:
+        query += f" LIMIT {secao['limite']}"
+    return query, params
+
+
+def section_query(nome, data_inicio, data_fim, municipios, doses, vacinas, estabelecimentos=(), ufs=()):
+    """Monta a consulta agregada da seção com os filtros do painel"""
+    return _section_sql(SECOES[nome], data_inicio, data_fim, municipios, doses, vacinas, estabelecimentos, ufs)
+
+
+def shard_plan(nome):
+    """(seção como roda em cada shard, regras de merge_partials) para juntar os resultados dos shards.
+
+    Agregações voltam de cada shard com todos os grupos e são somadas antes
+    da ordem e do limite; contagens distintas de pacientes também somam, pois
+    cada paciente está num único shard. Seções de linhas (últimas aplicações)
+    limitam em cada shard, o que já contém as primeiras do total.
+    """
+    secao = SECOES[nome]
+    regras = {'ordem': secao.get('ordem'), 'limite': secao.get('limite')}
+    if 'grupo' not in secao and 'limite' in secao:
+        return secao, dict(regras, somar=False)
+    parcial = {chave: valor for chave, valor in secao.items() if chave not in ('ordem', 'limite')}
+    parcial['select'] = secao.get('select_parcial', secao['select'])
+    grupo = [c.strip().strip('`') for c in secao.get('grupo', '').split(',') if c.strip()]
+    return parcial, dict(regras, grupo=grupo, medias=secao.get('medias'))
+
+
+def _covers(superior, chave, posicao):
+    """O resultado `superior` da seção difere de `chave` só por um filtro mais amplo na `posicao`?"""
+    if superior == chave or len(superior) != len(chave) or superior[0] != chave[0]:
+        return False
+    if superior[:posicao] + superior[posicao + 1:] != chave[:posicao] + chave[posicao + 1:]:
+        return False
+    amplos, pedidos = superior[posicao], chave[posicao]
+    return bool(pedidos) and (not amplos or set(pedidos) <= set(amplos))
+
+
+def _subset_request(nome, chave, loader):
+    """Pedido que filtra as linhas de um resultado mais amplo da seção já carregado, se houver.
+
+    Agrupando pela dimensão do filtro, as linhas dos valores pedidos são as
+    mesmas com ou sem ele. Com limite, só vale se o resultado amplo não foi
+    truncado ou já traz todos os valores pedidos.
+    """
+    filtro, coluna = SECOES[nome]['recorte']
+    posicao = 3 + FILTROS.index(filtro)
+    limite = SECOES[nome].get('limite')
+
+    def carregar(handle=None):
+        superior = get_result_store().find(lambda candidata: _covers(candidata, chave, posicao))
+        if superior is not None:
+            df, lease = superior
+            try:
+                pedidos = set(chave[posicao])
+                if limite is None or len(df) < limite or pedidos <= set(df[coluna]):
+                    return df[df[coluna].isin(pedidos)].reset_index(drop=True)
+            finally:
+                lease.release()
+        return loader(handle)
+
+    return chave, carregar
+
+
+def section_request(nome, chave_filtros, *filtros):
+    """Pedido para stream_results da seção; com shards, só nos shards das UFs do filtro, juntando as partes"""
+    secao = SECOES[nome]
+    prioridade = secao.get('prioridade')
+    if get_shard_map() is None:
+        query, params = section_query(nome, *filtros)
+        chave, loader = query_request((nome,) + chave_filtros, query, params, prioridade=prioridade)
+    else:
+        parcial, regras = shard_plan(nome)
+        consulta = _section_sql(parcial, *filtros)
+        ufs = filtros[6] if len(filtros) > 6 else ()
+        chave, loader = (nome,) + chave_filtros, lambda handle=None: merge_partials(
+            fetch_sharded({nome: consulta}, ufs, handle, prioridade=prioridade)[nome], **regras)
+    if 'recorte' in secao:
+        return _subset_request(nome, chave, loader)
+    return chave, loader
+
+
+def sample_query(nome, data_inicio, data_fim, municipios, doses, vacinas, estabelecimentos=(), ufs=()):
+    """Consulta da seção sobre a amostra, contando por categoria e estrato.
+
+    O resultado alimenta `estimate_sample`, que expande as contagens pelos
+    totais de cada estrato.
+    """
+    return _compose(
+        SECOES[nome], 'AmostraAplicacao', data_inicio, data_fim, municipios, doses, vacinas, estabelecimentos, ufs,
+        extra_select=", ea.total AS total_estrato, ea.amostrados AS amostrados_estrato",
+        extra_juncao="JOIN EstratoAmostra ea ON ea.mes = ad.mes AND ea.municipio = ad.estrato",
+        extra_grupo=", ad.mes, ad.estrato, ea.total, ea.amostrados",
+    )
+
+
+def municipality_section_query(nome, data_inicio, data_fim, municipios, doses, vacinas, estabelecimentos=(), ufs=()):
+    """Consulta da seção para todos os municípios de uma vez, com o município do estabelecimento em `_municipio`.
+
+    Agregações ganham o município no GROUP BY; seções de linhas com limite
+    (últimas aplicações) são limitadas por município com ROW_NUMBER. A ordem
+    e o limite das agregações ficam para `municipality_slice`.
+    """
+    secao = dict(SECOES[nome], juncoes=SECOES[nome]['juncoes'] | {'e'})
+    if 'grupo' in secao or 'limite' not in secao:
+        secao['grupo'] = f"{secao['grupo']}, _municipio" if 'grupo' in secao else "_municipio"
+        return _compose(secao, 'AplicacaoDoseCompacta', data_inicio, data_fim, municipios, doses, vacinas,
+                        estabelecimentos, ufs, extra_select=", e.municipio AS _municipio")
+
+    query, params = _compose(
+        secao, 'AplicacaoDoseCompacta', data_inicio, data_fim, municipios, doses, vacinas, estabelecimentos, ufs,
+        extra_select=f""", e.municipio AS _municipio,
+                      ROW_NUMBER() OVER (PARTITION BY e.municipio ORDER BY {secao['ordem']}) AS _posicao""",
+    )
+    return f"SELECT * FROM ({query}) t WHERE _posicao <= {secao['limite']}", params
+
+
+def municipality_slice(nome, parte):
+    """Linhas de um município (de municipality_section_query) com a ordem e o limite da seção no painel"""
+    secao = SECOES[nome]
+    parte = parte.drop(columns=[c for c in ('_municipio', '_posicao') if c in parte])
+    if 'ordem' in secao:
+        coluna, _, sentido = secao['ordem'].rpartition(' ')
+        parte = parte.sort_values(coluna.strip('`').split('.')[-1], ascending=sentido != 'DESC', kind='stable')
+    if 'limite' in secao:
+        parte = parte.head(secao['limite'])
+    return parte.reset_index(drop=True)
+
+
+def estimate_sample(nome, amostra):
+    """Contagens estimadas da seção, com a mesma ordem e limite da consulta exata"""
+    secao = SECOES[nome]
+    chaves = [c.strip() for c in secao['grupo'].split(',')]
+    estimado = estimate_totals(amostra, chaves)
+    if 'ordem' in secao:
+        estimado = estimado.sort_values('count', ascending=False)
+    if 'limite' in secao:
+        estimado = estimado.head(secao['limite'])
+    return estimado.reset_index(drop=True)
+
+
+def sample_request(nome, chave_filtros, *filtros):
+    """Pedido para stream_results da estimativa da seção, limitado ao orçamento do modo aproximado.
+
+    Com shards, cada um tem a própria amostra e estratos; as linhas por
+    (categoria, estrato) de todos entram juntas na estimativa. As consultas
+    da amostra são baratas e passam à frente na fila de admissão.
+    """
+    query, params = sample_query(nome, *filtros)
+    chave = ('amostra', nome) + chave_filtros
+    if get_shard_map() is None:
+        chave, loader = query_request(chave, query, params, timeout_ms=APPROX_BUDGET_MS, prioridade=INTERATIVA)
+        return chave, lambda handle=None: estimate_sample(nome, loader(handle))
+    ufs = filtros[6] if len(filtros) > 6 else ()
+    return chave, lambda handle=None: estimate_sample(nome, pd.concat(
+        fetch_sharded({nome: (query, params)}, ufs, handle, APPROX_BUDGET_MS, INTERATIVA)[nome], ignore_index=True))
+
+
+# ============= FIGURAS =============
+def _barras_de_erro(fig, dados, eixo):
+    """Mostra o IC 95% quando os dados são uma estimativa da amostra"""
+    if 'erro' in dados:
+        fig.update_traces(**{f'error_{eixo}': dict(type='data', array=dados['erro'])})
+    return fig
+
+
+def fig_temporal(dados_tempo):
+    fig = px.line(
+        dados_tempo,
+        x='data_vacina',
+        y='count',
+        color='dose_vacina',
+        markers=len(dados_tempo) <= 150,
+        labels={'data_vacina': 'Data', 'count': 'Doses Aplicadas', 'dose_vacina': 'Tipo de Dose'}
+    )
+    fig.update_layout(hovermode='x unified', height=300)
+    return fig
+
+
+def fig_piramide(dados):
+    piramide = (dados.pivot_table(index='grupo_idade', columns='sexo', values='count', aggfunc='sum', fill_value=0)
+                .reindex(FAIXAS_ETARIAS, fill_value=0))
+
+    if 'M' in piramide.columns:
+        piramide['M'] = -piramide['M']
+
+    fig = go.Figure()
+    for col in piramide.columns:
+        color = 'steelblue' if col == 'M' else 'lightcoral'
+        fig.add_trace(go.Bar(
+            y=piramide.index,
+            x=piramide[col],
+            name=col,
+            orientation='h',
+            marker_color=color
+        ))
+
+    fig.update_layout(barmode='relative', height=400, xaxis_title='Quantidade')
+    return fig
+
+
+def fig_vacinas(dados):
+    fig = px.bar(
+        dados,
+        x='count',
+        y='vacina_nome',
+        orientation='h',
+        labels={'count': 'Total de Doses', 'vacina_nome': 'Vacina'},
+        color='count',
+        color_continuous_scale='Blues'
+    )
+    fig.update_layout(height=400, showlegend=False)
+    return _barras_de_erro(fig, dados, 'x')
+
+
+def fig_estrategias(dados):
+    fig = px.pie(
+        dados,
+        values='count',
+        names='estrategia',
+        hole=0.3
+    )
+    fig.update_layout(height=400)
+    return fig
+
+
+def fig_racas(dados):
+    fig = px.bar(
+        dados,
+        x='raca_cor',
+        y='count',
+        labels={'count': 'Total de Doses', 'raca_cor': 'Raça/Cor'},
+        color='count',
+        color_continuous_scale='Viridis'
+    )
+    fig.update_layout(height=400, showlegend=False)
+    return _barras_de_erro(fig, dados, 'y')
+
+
+def fig_estabelecimentos(dados):
+    fig = px.bar(
+        dados,
+        x='count',
+        y='estabelecimento',
+        orientation='h',
+        labels={'count': 'Total de Doses', 'estabelecimento': 'Estabelecimento'},
+        color='count',
+        color_continuous_scale='Greens'
+    )
+    fig.update_layout(height=400, showlegend=False)
+    return _barras_de_erro(fig, dados, 'x')
+
+
+def tabela_ultimas(dados):
+    ultimas = dados.copy()
+    ultimas['data_vacina'] = pd.to_datetime(ultimas['data_vacina']).dt.strftime('%d/%m/%Y')
+    return ultimas
@@ -0,0 +1,124 @@
+"""Cria e rotaciona as partições mensais da tabela de aplicações.
+
+Uso:
+    cd app && uv run python -m utils.particoes                 # cobre até o mês seguinte ao último dado
+    cd app && uv run python -m utils.particoes --ate 2025-12   # cobre até dez/2025
+    cd app && uv run python -m utils.particoes --reter-meses 24
+"""
+import argparse
+from datetime import date
+
+from utils.db_functions import open_connection
+from utils.versao import bump_data_version
+
+TABELA = 'AplicacaoDoseCompacta'
+PARTICAO_MAX = 'pmax'
+
+
+def month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def next_month(d):
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def partition_name(mes):
+    return f"p{mes:%Y%m}"
+
+
+def list_partitions(cursor, tabela=TABELA):
+    """Retorna [(nome, limite_superior)] em ordem; limite None para MAXVALUE"""
+    cursor.execute("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (tabela,))
+    particoes = []
+    for nome, descricao in cursor.fetchall():
+        limite = None if descricao == 'MAXVALUE' else date.fromisoformat(descricao.strip("'"))
+        particoes.append((nome, limite))
+    return particoes
+
+
+def ensure_partitions(cursor, ate, tabela=TABELA):
+    """Garante partições mensais até o mês de `ate`, inclusive, dividindo a pmax"""
+    limites = [limite for _, limite in list_partitions(cursor, tabela) if limite is not None]
+    if not limites:
+        raise RuntimeError(f"{tabela} não está particionada; aplique as migrações antes")
+
+    novas = []
+    mes = limites[-1]
+    while mes <= month_start(ate):
+        novas.append(mes)
+        mes = next_month(mes)
+    if not novas:
+        return []
+
+    definicoes = ',\n'.join(
+        f"PARTITION {partition_name(m)} VALUES LESS THAN ('{next_month(m).isoformat()}')"
+        for m in novas
+    )
+    cursor.execute(f"""
+        ALTER TABLE {tabela} REORGANIZE PARTITION {PARTICAO_MAX} INTO (
+            {definicoes},
+            PARTITION {PARTICAO_MAX} VALUES LESS THAN (MAXVALUE)
+        )
+    """)
+    return [partition_name(m) for m in novas]
+
+
+def drop_partitions_before(cursor, antes_de, tabela=TABELA):
+    """Remove (com os dados) as partições mensais inteiramente anteriores a `antes_de`"""
+    limite_corte = month_start(antes_de)
+    removidas = [
+        nome for nome, limite in list_partitions(cursor, tabela)
+        if nome != PARTICAO_MAX and limite is not None and limite <= limite_corte
+    ]
+    if removidas:
+        cursor.execute(f"ALTER TABLE {tabela} DROP PARTITION {', '.join(removidas)}")
+    return removidas
+
+
+def sync_partitions(cursor, tabela=TABELA):
+    """Cria partições até o mês seguinte ao mais recente entre o dado já carregado e a data de hoje"""
+    cursor.execute(f"SELECT MAX(data_vacina) FROM {tabela}")
+    (ultima,) = cursor.fetchone()
+    hoje = date.today()
+    referencia = max(ultima or hoje, hoje)
+    return ensure_partitions(cursor, next_month(referencia), tabela)
+
+
+def _parse_mes(texto):
+    ano, mes = texto.split('-')
+    return date(int(ano), int(mes), 1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ate', type=_parse_mes, help='último mês a cobrir (AAAA-MM)')
+    parser.add_argument('--reter-meses', type=int, help='remove partições mais antigas que N meses')
+    args = parser.parse_args()
+
+    conn = open_connection()
+    cursor = conn.cursor()
+    try:
+        if args.ate:
+            criadas = ensure_partitions(cursor, args.ate)
+        else:
+            criadas = sync_partitions(cursor)
+        print(f"Partições criadas: {', '.join(criadas) or 'nenhuma'}")
+
+        if args.reter_meses:
+            corte = month_start(date.today())
+            for _ in range(args.reter_meses):
+                corte = date(corte.year - (corte.month == 1), (corte.month - 2) % 12 + 1, 1)
+            removidas = drop_partitions_before(cursor, corte)
+            print(f"Partições removidas: {', '.join(removidas) or 'nenhuma'}")
+            if removidas:
+                bump_data_version(cursor, 'partições removidas')
+                conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,328 @@
+"""Verificação da qualidade dos dados de aplicações e das tabelas de referência.
+
+Em vez de contornar dados sujos gráfico a gráfico, as verificações rodam de
+uma vez e o resumo fica em QualidadeDados (migração 007), lido pela página
+"Qualidade dos Dados":
+
+- estabelecimentos sem coordenadas ou fora dos limites do RJ;
+- pacientes com idade impossível;
+- chaves órfãs (aplicações e pacientes apontando para linhas inexistentes);
+- aplicações repetidas do mesmo paciente, vacina, dose e dia;
+- nomes vazios ou genéricos ("SEM INFORMAÇÃO") nas tabelas de referência;
+- e as aplicações afetadas pelos problemas das referências.
+
+As referências (inclusive os pacientes, em lotes) viram mapas de bits
+indexados pela chave, compactados a 1 bit por chave (np.packbits): são eles
+que vão para cada processo. As aplicações são lidas mês a mês (uma partição de
+AplicacaoDoseCompacta por janela, ou fatias de --dias dias) por um pool de
+processos, cada um com sua conexão, em lotes de --lote linhas: as
+verificações são operações vetorizadas sobre os arrays do lote. A memória de
+cada processo é a dos mapas de bits, a de um lote e a das chaves de
+repetição da janela (32 bytes por aplicação).
+
+Uso: cd app && uv run python -m utils.qualidade --processos 8
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from utils.busca import normalize
+from utils.db_functions import get_backend, open_connection
+from utils.particoes import next_month
+
+TABELA = 'AplicacaoDoseCompacta'
+LOTE = 100_000
+EXEMPLOS = 5
+
+# Limites aproximados do estado do RJ (lat_min, lon_min, lat_max, lon_max)
+LIMITES_RJ = (-23.4, -44.9, -20.7, -40.9)
+IDADE_MAXIMA = 120
+
+# Nomes genéricos, comparados depois de normalize (sem acentos, minúsculos)
+NOME_GENERICO = re.compile(r'(sem informacao|nao informado|ignorado|desconhecido|nao se aplica|null|none|n a|x+|0+)?')
+
+# Coluna de AplicacaoDoseCompacta -> (tabela, chave) referenciada
+CHAVES_APLICACAO = {
+    'id_dose': ('DoseVacina', 'id'),
+    'id_local': ('LocalAplicacao', 'id'),
+    'id_via': ('ViaAdministracao', 'id'),
+    'id_lote': ('LoteVacina', 'id'),
+    'cnes': ('Estabelecimento', 'id_cnes'),
+    'id_vacina': ('Vacina', 'id'),
+    'sk_paciente': ('PacienteCompacto', 'sk_paciente'),
+    'id_estrategia_vacinacao': ('EstrategiaVacinacao', 'id'),
+}
+CHAVES_PACIENTE = {
+    'id_sexo': ('Sexo', 'id'),
+    'id_raca_cor': ('RacaCor', 'id'),
+    'id_municipio': ('Municipio', 'id'),
+}
+
+# Tabela -> (chave, coluna do nome) verificados quanto a nomes genéricos
+NOMES = {
+    'Vacina': ('id', 'nome'),
+    'Estabelecimento': ('id_cnes', 'nome_fantasia'),
+    'Municipio': ('id', 'nome'),
+    'Fabricante': ('id', 'nome'),
+}
+
+# verificação -> (tabela, descrição), na ordem em que aparecem na página
+VERIFICACOES = {
+    'coordenadas_fora_rj': ('Estabelecimento', "Estabelecimentos sem coordenadas ou fora dos limites do RJ"),
+    'aplicacoes_coordenadas_fora_rj': (TABELA, "Aplicações em estabelecimentos sem coordenadas ou fora do RJ"),
+    'idade_impossivel': ('PacienteCompacto', f"Pacientes com idade negativa ou acima de {IDADE_MAXIMA} anos"),
+    'aplicacoes_idade_impossivel': (TABELA, "Aplicações de pacientes com idade impossível"),
+    'aplicacao_duplicada': (TABELA, "Aplicações repetidas (mesmo paciente, vacina, dose e dia) além da primeira"),
+    **{f'nome_generico_{tabela.lower()}': (tabela, f"{tabela} com {coluna} vazio ou genérico")
+       for tabela, (_, coluna) in NOMES.items()},
+    'aplicacoes_vacina_generica': (TABELA, "Aplicações de vacinas com nome vazio ou genérico"),
+    **{f'orfa_{coluna}': (TABELA, f"Aplicações com {coluna} sem linha correspondente em {tabela}")
+       for coluna, (tabela, _) in CHAVES_APLICACAO.items()},
+    **{f'orfa_paciente_{coluna}': ('PacienteCompacto', f"Pacientes com {coluna} sem linha correspondente em {tabela}")
+       for coluna, (tabela, _) in CHAVES_PACIENTE.items()},
+}
+
+
+# ============= VERIFICAÇÕES VETORIZADAS =============
+def bitmap(chaves, tamanho=None):
+    """Mapa de bits compactado (np.packbits, 1 bit por chave) com as posições de `chaves` ligadas"""
+    chaves = np.asarray(chaves, dtype=np.int64)
+    chaves = chaves[chaves >= 0]
+    mapa = np.zeros(max(tamanho or 0, int(chaves.max()) + 1 if len(chaves) else 0), dtype=bool)
+    mapa[chaves] = True
+    return np.packbits(mapa, bitorder='little')
+
+
+def lookup(mapa, valores):
+    """Bits de `valores` no mapa, com False para valores fora dele (inclusive os negativos, que marcam NULL)"""
+    dentro = (valores >= 0) & (valores < len(mapa) * 8)
+    v = valores[dentro]
+    resultado = np.zeros(len(valores), dtype=bool)
+    resultado[dentro] = (mapa[v >> 3] >> (v & 7).astype(np.uint8)) & 1
+    return resultado
+
+
+def generic_names(nomes):
+    """Máscara dos nomes vazios, nulos ou genéricos"""
+    nomes = pd.Series(nomes, dtype=object)
+    return nomes.isna().to_numpy() | nomes.fillna('').map(normalize).str.fullmatch(NOME_GENERICO).to_numpy()
+
+
+def outside_rj(latitude, longitude):
+    """Máscara das coordenadas ausentes, zeradas ou fora de LIMITES_RJ"""
+    lat_min, lon_min, lat_max, lon_max = LIMITES_RJ
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    dentro = (latitude >= lat_min) & (latitude <= lat_max) & (longitude >= lon_min) & (longitude <= lon_max)
+    return ~dentro
+
+
+def record(achados, nome, mascara, exemplos):
+    """Soma as ocorrências de `mascara` em `nome`.
+
+    `exemplos(posicoes)` descreve as linhas nessas posições; só é chamado,
+    com no máximo EXEMPLOS posições, enquanto faltarem exemplos.
+    """
+    ocorrencias, verificadas, lista = achados.get(nome, (0, 0, []))
+    n = int(mascara.sum())
+    if n and len(lista) < EXEMPLOS:
+        lista = lista + [str(x) for x in exemplos(np.flatnonzero(mascara)[:EXEMPLOS - len(lista)])]
+    achados[nome] = (ocorrencias + n, verificadas + len(mascara), lista)
+
+
+def merge_findings(achados, outros):
+    for nome, (ocorrencias, verificadas, lista) in outros.items():
+        atuais = achados.get(nome, (0, 0, []))
+        achados[nome] = (atuais[0] + ocorrencias, atuais[1] + verificadas, (atuais[2] + lista)[:EXEMPLOS])
+    return achados
+
+
+def _integers(batch, coluna):
+    """Coluna inteira do lote como int64, com -1 no lugar de NULL"""
+    return batch.column(coluna).fill_null(-1).to_numpy()
+
+
+# ============= REFERÊNCIAS =============
+def scan_references(backend, lote=LOTE):
+    """Verifica as tabelas de referência e os pacientes.
+
+    Retorna (contexto, achados): o contexto tem os mapas de bits usados na
+    verificação das aplicações (chaves existentes de cada referência e as
+    marcadas com problema).
+    """
+    achados = {}
+    existentes = {}
+    tabelas = {t: c for t, c in CHAVES_APLICACAO.values() if t != 'PacienteCompacto'}
+    tabelas.update({t: c for t, c in CHAVES_PACIENTE.values()})
+    for tabela, chave in tabelas.items():
+        existentes[tabela] = bitmap(backend.run(f"SELECT {chave} FROM {tabela}")[chave].dropna())
+
+    marcas = {}
+    for tabela, (chave, coluna) in NOMES.items():
+        dados = backend.run(f"SELECT {chave}, {coluna} FROM {tabela}")
+        genericos = generic_names(dados[coluna])
+        record(achados, f'nome_generico_{tabela.lower()}', genericos,
+               lambda p: [f"{dados[chave].iloc[i]} ({dados[coluna].iloc[i]!r})" for i in p])
+        if tabela == 'Vacina':
+            marcas['vacina_generica'] = bitmap(dados[chave][genericos])
+
+    estabelecimentos = backend.run("SELECT id_cnes, nome_fantasia, latitude, longitude FROM Estabelecimento")
+    fora = outside_rj(estabelecimentos['latitude'], estabelecimentos['longitude'])
+    record(achados, 'coordenadas_fora_rj', fora, lambda p: [
+        f"{estabelecimentos['id_cnes'].iloc[i]} ({estabelecimentos['latitude'].iloc[i]}, "
+        f"{estabelecimentos['longitude'].iloc[i]})" for i in p])
+    marcas['coordenadas_fora_rj'] = bitmap(estabelecimentos['id_cnes'][fora])
+
+    # Pacientes em lotes: as chaves viram o mapa de bits das aplicações
+    chaves, idade_impossivel = [], []
+    colunas = ', '.join(CHAVES_PACIENTE)
+    for batch in backend.stream(f"SELECT sk_paciente, idade, {colunas} FROM PacienteCompacto", lote=lote):
+        sk = _integers(batch, 'sk_paciente')
+        idade = batch.column('idade').to_numpy(zero_copy_only=False).astype(np.float64)
+        impossivel = (idade < 0) | (idade > IDADE_MAXIMA)
+        record(achados, 'idade_impossivel', impossivel, lambda p: [f"{sk[i]} ({idade[i]:.0f} anos)" for i in p])
+        for coluna, (tabela, _) in CHAVES_PACIENTE.items():
+            valores = _integers(batch, coluna)
+            record(achados, f'orfa_paciente_{coluna}', (valores >= 0) & ~lookup(existentes[tabela], valores),
+                   lambda p: [f"{sk[i]} ({coluna}={valores[i]})" for i in p])
+        chaves.append(sk)
+        idade_impossivel.append(sk[impossivel])
+    existentes['PacienteCompacto'] = bitmap(np.concatenate(chaves) if chaves else [])
+    marcas['idade_impossivel'] = bitmap(np.concatenate(idade_impossivel) if idade_impossivel else [])
+    return {'existentes': existentes, 'marcas': marcas}, achados
+
+
+# ============= APLICAÇÕES =============
+def windows(backend, tabela=TABELA, dias=None):
+    """Janelas [início, fim) de data_vacina a verificar: um mês (partição), ou fatias de `dias` dias"""
+    limites = backend.run(f"SELECT MIN(data_vacina) AS inicio, MAX(data_vacina) AS fim FROM {tabela}")
+    inicio, fim = limites['inicio'].iloc[0], limites['fim'].iloc[0]
+    if pd.isna(inicio):
+        return []
+    inicio, fim = pd.Timestamp(inicio).date().replace(day=1), pd.Timestamp(fim).date()
+    janelas = []
+    while inicio <= fim:
+        seguinte = next_month(inicio)
+        passo = timedelta(days=dias or 31)
+        corte = inicio
+        while corte < seguinte:
+            janelas.append((corte, min(corte + passo, seguinte)))
+            corte += passo
+        inicio = seguinte
+    return janelas
+
+
+_CONTEXTO = None
+
+
+def _init_worker(contexto):
+    global _CONTEXTO
+    _CONTEXTO = contexto
+
+
+def scan_window(inicio, fim, tabela=TABELA, lote=LOTE, contexto=None, backend=None):
+    """Verifica as aplicações com data_vacina em [inicio, fim); retorna (achados, linhas)"""
+    contexto = contexto or _CONTEXTO
+    backend = backend or get_backend()
+    existentes, marcas = contexto['existentes'], contexto['marcas']
+    query = f"""
+        SELECT id_aplicacao, data_vacina, {', '.join(CHAVES_APLICACAO)}
+        FROM {tabela}
+        WHERE data_vacina >= %s AND data_vacina < %s
+    """
+    achados, repeticao, linhas = {}, [], 0
+    for batch in backend.stream(query, [inicio, fim], lote=lote):
+        if not batch.num_rows:
+            continue
+        linhas += batch.num_rows
+        ids = lambda p: batch.column('id_aplicacao').take(p).to_pylist()
+        valores = {coluna: _integers(batch, coluna) for coluna in CHAVES_APLICACAO}
+        for coluna, (tabela_ref, _) in CHAVES_APLICACAO.items():
+            v = valores[coluna]
+            record(achados, f'orfa_{coluna}', (v >= 0) & ~lookup(existentes[tabela_ref], v), ids)
+        record(achados, 'aplicacoes_coordenadas_fora_rj', lookup(marcas['coordenadas_fora_rj'], valores['cnes']), ids)
+        record(achados, 'aplicacoes_idade_impossivel', lookup(marcas['idade_impossivel'], valores['sk_paciente']), ids)
+        record(achados, 'aplicacoes_vacina_generica', lookup(marcas['vacina_generica'], valores['id_vacina']), ids)
+
+        # Chave de repetição: paciente, vacina, dose e dia (dias desde 1970)
+        dia = batch.column('data_vacina').cast(pa.int32()).fill_null(-1).to_numpy()
+        repeticao.append(np.column_stack([valores['sk_paciente'], valores['id_vacina'], valores['id_dose'],
+                                          dia.astype(np.int64)]))
+
+    if repeticao:
+        chaves = np.concatenate(repeticao)
+        repetidas = pd.DataFrame(chaves).duplicated().to_numpy()
+        record(achados, 'aplicacao_duplicada', repetidas, lambda p: [
+            f"paciente {sk}, vacina {v}, dose {d}, {date(1970, 1, 1) + timedelta(days=int(dia))}"
+            for sk, v, d, dia in chaves[p]])
+    return achados, linhas
+
+
+def scan(processos=os.cpu_count(), tabela=TABELA, lote=LOTE, dias=None):
+    """Verificação completa; retorna (achados, aplicações lidas, segundos)"""
+    inicio = time.perf_counter()
+    backend = get_backend()
+    contexto, achados = scan_references(backend, lote)
+    janelas = windows(backend, tabela, dias)
+    linhas = 0
+    # spawn: cada processo abre a própria conexão, sem herdar as do pai
+    with ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(contexto,)) as executor:
+        futuros = [executor.submit(scan_window, a, b, tabela, lote) for a, b in janelas]
+        for futuro in as_completed(futuros):
+            parciais, lidas = futuro.result()
+            merge_findings(achados, parciais)
+            linhas += lidas
+    return achados, linhas, time.perf_counter() - inicio
+
+
+def write_summary(conn, achados, duracao, executada_em=None):
+    """Substitui o conteúdo de QualidadeDados pelo resultado da verificação"""
+    executada_em = executada_em or datetime.now().replace(microsecond=0)
+    linhas = [
+        (nome, tabela, descricao, int(achados.get(nome, (0,))[0]), int(achados.get(nome, (0, 0))[1]),
+         '; '.join(achados.get(nome, (0, 0, []))[2]) or None, executada_em, round(duracao, 1))
+        for nome, (tabela, descricao) in VERIFICACOES.items()
+    ]
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM QualidadeDados")
+    cursor.executemany("""
+        INSERT INTO QualidadeDados
+            (verificacao, tabela, descricao, ocorrencias, verificadas, exemplos, executada_em, duracao_s)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """, linhas)
+    conn.commit()
+    cursor.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processos', type=int, default=os.cpu_count())
+    parser.add_argument('--lote', type=int, default=LOTE, help='linhas por lote lido')
+    parser.add_argument('--dias', type=int, help='divide cada mês em janelas de N dias (menos memória por processo)')
+    parser.add_argument('--tabela', default=TABELA, help='tabela de aplicações verificada')
+    parser.add_argument('--sem-gravar', action='store_true', help='só mostra o resumo, sem gravar QualidadeDados')
+    args = parser.parse_args()
+
+    achados, linhas, duracao = scan(args.processos, args.tabela, args.lote, args.dias)
+    print(f"{linhas:,} aplicações verificadas em {duracao:.1f} s ({linhas / max(duracao, 1e-9):,.0f} linhas/s)\n")
+    for nome, (tabela, descricao) in VERIFICACOES.items():
+        ocorrencias, verificadas, exemplos = achados.get(nome, (0, 0, []))
+        print(f"  {ocorrencias:>10,} / {verificadas:<12,} {descricao}")
+        if exemplos:
+            print(f"  {'':>10}   ex.: {'; '.join(exemplos)}")
+    if not args.sem_gravar:
+        conn = open_connection()
+        try:
+            write_summary(conn, achados, duracao)
+        finally:
+            conn.close()
+        print("\nResumo gravado em QualidadeDados")
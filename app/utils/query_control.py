@@ -0,0 +1,83 @@
+import threading
+
+
+class QueryCancelled(Exception):
+    """A consulta foi cancelada antes de terminar"""
+
+
+class QueryHandle:
+    """Gancho de cancelamento de uma consulta em andamento.
+
+    O worker registra o id da conexão em uso com attach(); cancel() marca o
+    handle e chama `killer(connection_id)` para interromper o comando no
+    servidor (KILL QUERY). Pode ser chamado de qualquer thread. detach()
+    espera um KILL em andamento terminar, para a conexão não voltar ao pool
+    (e a outra consulta) antes dele.
+
+    `sessao` e `prioridade` são lidos pelo controle de admissão
+    (utils.admissao) para escolher a ordem em que as consultas executam.
+    """
+
+    def __init__(self, killer=None, sessao=None, prioridade=None):
+        self._killer = killer
+        self.sessao = sessao
+        self.prioridade = prioridade
+        self._lock = threading.Lock()
+        self._kill_lock = threading.Lock()
+        self._connection_id = None
+        self._filhos = []
+        self.cancelled = False
+
+    def attach(self, connection_id):
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelled()
+            self._connection_id = connection_id
+
+    def detach(self):
+        with self._kill_lock, self._lock:
+            self._connection_id = None
+
+    def link(self, filho):
+        """Cancela `filho` junto com este handle (consultas paralelas de um mesmo pedido, como uma por shard)"""
+        with self._lock:
+            if not self.cancelled:
+                self._filhos.append(filho)
+                return
+        filho.cancel()
+
+    def cancel(self):
+        with self._kill_lock:
+            with self._lock:
+                self.cancelled = True
+                connection_id, self._connection_id = self._connection_id, None
+                filhos, self._filhos = self._filhos, []
+            if connection_id is not None and self._killer is not None:
+                self._killer(connection_id)
+        for filho in filhos:
+            filho.cancel()
+
+
+class QueryRegistry:
+    """Consulta em andamento por (sessão, slot); a mais nova substitui a anterior"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handles = {}
+
+    def supersede(self, chave, handle):
+        """Registra o handle e cancela o que ocupava a mesma chave"""
+        with self._lock:
+            anterior = self._handles.get(chave)
+            self._handles[chave] = handle
+        if anterior is not None and anterior is not handle:
+            anterior.cancel()
+
+    def finish(self, chave, handle):
+        with self._lock:
+            if self._handles.get(chave) is handle:
+                del self._handles[chave]
+
+    def running(self):
+        with self._lock:
+            return len(self._handles)
@@ -0,0 +1,135 @@
+"""Consultas pontuais de rastreamento: aplicações de lotes (recolhimento) e histórico de um paciente.
+
+As duas leem só os índices de cobertura da migração 005 e paginam por chave
+(keyset): cada página continua a partir da última linha da anterior, sem
+OFFSET, então a página N custa o mesmo que a primeira. Vários lotes são
+buscados numa única consulta (IN), na ordem (lote, data, aplicação).
+
+Uso: cd app && uv run python -m utils.rastreamento --lote 230045 --lote 230046
+     cd app && uv run python -m utils.rastreamento --paciente <id_paciente>
+"""
+import argparse
+
+import pandas as pd
+
+from utils.db_functions import execute_query
+
+POR_PAGINA = 100
+
+_COLUNAS = """
+    ad.data_vacina, lt.codigo AS lote, v.nome AS vacina, d.descricao AS dose,
+    p.id_paciente, p.idade, sx.descricao AS sexo,
+    ad.cnes, e.nome_fantasia AS estabelecimento, e.municipio AS estabelecimento_municipio,
+    ad.id_aplicacao, ad.id_lote"""
+
+_JUNCOES = """
+    LEFT JOIN LoteVacina lt ON lt.id = ad.id_lote
+    LEFT JOIN Vacina v ON v.id = ad.id_vacina
+    LEFT JOIN DoseVacina d ON d.id = ad.id_dose
+    LEFT JOIN PacienteCompacto p ON p.sk_paciente = ad.sk_paciente
+    LEFT JOIN Sexo sx ON sx.id = p.id_sexo
+    LEFT JOIN Estabelecimento e ON e.id_cnes = ad.cnes"""
+
+# Colunas que ordenam (e continuam) cada tipo de consulta
+CHAVE_LOTE = ['id_lote', 'data_vacina', 'id_aplicacao']
+CHAVE_PACIENTE = ['data_vacina', 'id_aplicacao']
+
+
+def _after(colunas, valores):
+    """Condição "depois de `valores`" na ordem de `colunas`, expandida em OR/AND.
+
+    O MySQL não usa o índice para comparações de tuplas como (a, b) > (x, y);
+    a forma expandida vira um intervalo do índice.
+    """
+    coluna, *resto = colunas
+    if not resto:
+        return f"{coluna} > %s", [valores[0]]
+    interna, params = _after(resto, valores[1:])
+    return f"({coluna} > %s OR ({coluna} = %s AND {interna}))", [valores[0], valores[0]] + params
+
+
+def lot_ids_query(codigos):
+    """Ids dos lotes pelos códigos (LoteVacina.codigo é único)"""
+    return (f"SELECT id, codigo FROM LoteVacina WHERE codigo IN ({','.join(['%s'] * len(codigos))})",
+            list(codigos))
+
+
+def lot_page_query(ids_lote, apos=None, limite=POR_PAGINA, tabela='AplicacaoDoseCompacta'):
+    """Página de aplicações dos lotes, depois da chave `apos` (id_lote, data_vacina, id_aplicacao).
+
+    Pede `limite` + 1 linhas: a excedente só indica que há próxima página.
+    """
+    query = f"""
+    SELECT {_COLUNAS}
+    FROM {tabela} ad
+    {_JUNCOES}
+    WHERE ad.id_lote IN ({','.join(['%s'] * len(ids_lote))})
+    """
+    params = list(ids_lote)
+    if apos is not None:
+        condicao, valores = _after([f'ad.{c}' for c in CHAVE_LOTE], apos)
+        query += f" AND {condicao}"
+        params += valores
+    query += f" ORDER BY ad.id_lote, ad.data_vacina, ad.id_aplicacao LIMIT {int(limite) + 1}"
+    return query, params
+
+
+def history_page_query(id_paciente, apos=None, limite=POR_PAGINA, tabela='AplicacaoDoseCompacta'):
+    """Página do histórico de doses do paciente, depois da chave `apos` (data_vacina, id_aplicacao)"""
+    query = f"""
+    SELECT {_COLUNAS}
+    FROM {tabela} ad
+    {_JUNCOES}
+    WHERE ad.sk_paciente = (SELECT sk_paciente FROM PacienteCompacto WHERE id_paciente = %s)
+    """
+    params = [id_paciente]
+    if apos is not None:
+        condicao, valores = _after([f'ad.{c}' for c in CHAVE_PACIENTE], apos)
+        query += f" AND {condicao}"
+        params += valores
+    query += f" ORDER BY ad.data_vacina, ad.id_aplicacao LIMIT {int(limite) + 1}"
+    return query, params
+
+
+def split_page(dados, chave, limite=POR_PAGINA):
+    """(linhas da página, chave para a próxima ou None se for a última)"""
+    if len(dados) <= limite:
+        return dados, None
+    pagina = dados.iloc[:limite]
+    return pagina, tuple(_python(pagina.iloc[-1][c]) for c in chave)
+
+
+def _python(valor):
+    # O conector não converte tipos do numpy/pandas nos parâmetros
+    if isinstance(valor, pd.Timestamp):
+        return valor.date()
+    return valor.item() if hasattr(valor, 'item') else valor
+
+
+def parse_lots(texto):
+    """Códigos de lote digitados um por linha ou separados por vírgula, sem repetição"""
+    codigos = [c.strip() for linha in texto.splitlines() for c in linha.split(',')]
+    return list(dict.fromkeys(c for c in codigos if c))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    alvo = parser.add_mutually_exclusive_group(required=True)
+    alvo.add_argument('--lote', action='append', help='código do lote (repetível)')
+    alvo.add_argument('--paciente', help='id_paciente')
+    parser.add_argument('--limite', type=int, default=POR_PAGINA)
+    args = parser.parse_args()
+
+    if args.lote:
+        lotes = execute_query(*lot_ids_query(args.lote))
+        if lotes.empty:
+            parser.exit(1, "Nenhum lote encontrado\n")
+        query, params = lot_page_query(lotes['id'].tolist(), limite=args.limite)
+        chave = CHAVE_LOTE
+    else:
+        query, params = history_page_query(args.paciente, limite=args.limite)
+        chave = CHAVE_PACIENTE
+    pagina, proxima = split_page(execute_query(query, params), chave, args.limite)
+    print(pagina.drop(columns=['id_lote']).to_string(index=False))
+    if proxima is not None:
+        print(f"... há mais resultados (próxima página após {proxima})")
@@ -0,0 +1,210 @@
+"""Relatórios mensais do painel por município, gerados em lote sem a interface.
+
+Cada seção do painel é consultada uma única vez para todos os municípios
+(municipality_section_query, com o município do estabelecimento no GROUP
+BY) em vez de uma junção por município; o resultado é dividido em memória e
+cada relatório (KPIs, gráficos e tabelas do painel) é montado em HTML por um
+pool de processos, com as mesmas figuras de utils.painel.
+
+O HTML usa um único plotly.min.js gravado ao lado dos relatórios. Com
+--png, cada gráfico também é salvo como imagem (requer o pacote kaleido).
+
+Uso: cd app && uv run python -m utils.relatorios --mes 2024-01 --processos 8
+"""
+import argparse
+import html
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+from plotly.offline import get_plotlyjs
+
+from utils.busca import normalize
+from utils.constants import DB_POOL_SIZE
+from utils.db_functions import (GRANULARIDADES, build_filters, choose_granularity, formatar_numero, load_dictionary,
+                                load_municipalities, run_query, top_series)
+from utils.painel import (SECOES, fig_estabelecimentos, fig_estrategias, fig_piramide, fig_racas, fig_temporal,
+                          fig_vacinas, municipality_section_query, municipality_slice, tabela_ultimas)
+
+# Consultas de todos os municípios juntos podem passar do limite interativo
+TEMPO_LIMITE_MS = 600_000
+MAX_SERIES = 8
+
+# (seção, título, figura ou None para tabela), na ordem do painel
+CONTEUDO = [
+    ('temporal', "Acompanhamento Temporal da Vacinação", fig_temporal),
+    ('piramide', "Pirâmide Etária", fig_piramide),
+    ('vacinas', "Doses Aplicadas por Vacina", fig_vacinas),
+    ('estrategias', "Distribuição por Estratégia de Vacinação", fig_estrategias),
+    ('racas', "Distribuição por Raça/Cor", fig_racas),
+    ('estabelecimentos', "Ranking de Estabelecimentos", fig_estabelecimentos),
+    ('doses', "Distribuição de Doses por Tipo", None),
+    ('ultimas', "Últimas 50 Aplicações de Vacina", None),
+    ('municipios', "Resumo de Vacinação por Município de Residência", None),
+]
+
+ESTILO = """
+body { font-family: sans-serif; margin: 2em auto; max-width: 1100px; color: #222; }
+.kpis { display: flex; gap: 1em; }
+.kpi { flex: 1; border: 1px solid #ddd; border-radius: 6px; padding: 0.8em; }
+.kpi span { display: block; font-size: 0.85em; color: #666; }
+.kpi b { font-size: 1.6em; }
+table { border-collapse: collapse; font-size: 0.85em; width: 100%; }
+th, td { border-bottom: 1px solid #eee; padding: 0.3em 0.5em; text-align: left; }
+"""
+
+
+def month_period(mes):
+    """Primeiro e último dia do mês AAAA-MM"""
+    inicio = date.fromisoformat(f"{mes}-01")
+    return inicio, (inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def temporal_query(data_inicio, data_fim, granularidade, municipios, doses, vacinas):
+    """Série temporal de todos os municípios, na granularidade do painel"""
+    expressao = next(expr for nome, _, expr in GRANULARIDADES if nome == granularidade)
+    filtros, params = build_filters(municipios, doses, vacinas)
+    query = f"""
+    SELECT {expressao} AS data_vacina, d.descricao AS dose_vacina, e.municipio AS _municipio, COUNT(*) AS count
+    FROM AplicacaoDoseCompacta ad
+    LEFT JOIN DoseVacina d ON ad.id_dose = d.id
+    LEFT JOIN Estabelecimento e ON ad.cnes = e.id_cnes
+    WHERE ad.data_vacina BETWEEN %s AND %s {filtros}
+    GROUP BY 1, 2, 3
+    """
+    return query, [data_inicio, data_fim] + params
+
+
+def extract(data_inicio, data_fim, municipios=(), doses=(), vacinas=()):
+    """Resultado de cada seção para todos os municípios, consultas em paralelo no pool.
+
+    Retorna ({seção: DataFrame com _municipio}, granularidade da série).
+    """
+    n_series = max(1, min(len(doses) if doses else len(load_dictionary('DoseVacina')), MAX_SERIES + 1))
+    granularidade = choose_granularity(data_inicio, data_fim, n_series, 400)
+    consultas = {nome: municipality_section_query(nome, data_inicio, data_fim, municipios, doses, vacinas)
+                 for nome in SECOES}
+    consultas['temporal'] = temporal_query(data_inicio, data_fim, granularidade, municipios, doses, vacinas)
+
+    with ThreadPoolExecutor(DB_POOL_SIZE) as executor:
+        futuros = {executor.submit(run_query, query, params, TEMPO_LIMITE_MS): nome
+                   for nome, (query, params) in consultas.items()}
+        return {futuros[f]: f.result() for f in as_completed(futuros)}, granularidade
+
+
+def split_municipalities(extraido):
+    """{município: {seção: DataFrame}} com a ordem e o limite de cada seção no painel"""
+    por_municipio = {}
+    for nome, dados in extraido.items():
+        for municipio, parte in dados.groupby('_municipio', sort=False):
+            if nome == 'temporal':
+                secao = top_series(parte.drop(columns='_municipio'), MAX_SERIES)
+            else:
+                secao = municipality_slice(nome, parte)
+            por_municipio.setdefault(municipio, {})[nome] = secao
+    return por_municipio
+
+
+def slug(municipio):
+    return normalize(municipio).replace(' ', '_') or 'sem_municipio'
+
+
+def _kpis_html(kpis):
+    if kpis is None or kpis.empty:
+        return "<p>Sem aplicações no período.</p>"
+    linha = kpis.iloc[0]
+    idade = float(linha['idade_media']) if pd.notna(linha['idade_media']) else 0
+    cartoes = [
+        ("Total de Doses Aplicadas", formatar_numero(linha['total_doses'] or 0)),
+        ("Pacientes Vacinados", formatar_numero(linha['pacientes'] or 0)),
+        ("Idade Média", f"{idade:.1f} anos" if idade > 0 else "N/A"),
+        ("Doses Únicas", formatar_numero(linha['doses_unicas'] or 0)),
+    ]
+    return '<div class="kpis">' + ''.join(
+        f'<div class="kpi"><span>{titulo}</span><b>{valor}</b></div>' for titulo, valor in cartoes) + '</div>'
+
+
+def render_report(municipio, secoes, periodo, granularidade, destino, png=False):
+    """Grava o relatório do município; retorna (município, caminho, segundos de CPU)"""
+    inicio = time.process_time()
+    nome_arquivo = slug(municipio)
+    partes = [f"<h2>Indicadores Principais</h2>{_kpis_html(secoes.get('kpis'))}"]
+    for nome, titulo, figura in CONTEUDO:
+        dados = secoes.get(nome)
+        partes.append(f"<h2>{titulo}</h2>")
+        if dados is None or dados.empty:
+            partes.append("<p>Sem dados no período.</p>")
+        elif figura is None:
+            tabela = tabela_ultimas(dados) if nome == 'ultimas' else dados
+            partes.append(tabela.to_html(index=False, border=0, na_rep=''))
+        else:
+            if nome == 'temporal':
+                partes.append(f"<p>Doses agregadas por {granularidade}</p>")
+            fig = figura(dados)
+            partes.append(fig.to_html(full_html=False, include_plotlyjs=False))
+            if png:
+                fig.write_image(destino / f"{nome_arquivo}_{nome}.png", width=1000, height=fig.layout.height or 400)
+
+    titulo = f"Vacinação em {html.escape(municipio)} — {periodo[0]:%d/%m/%Y} a {periodo[1]:%d/%m/%Y}"
+    caminho = destino / f"{nome_arquivo}.html"
+    caminho.write_text(
+        f"""<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>{titulo}</title>
+<script src="plotly.min.js"></script><style>{ESTILO}</style></head>
+<body><h1>{titulo}</h1>{''.join(partes)}</body></html>
+""", encoding='utf-8')
+    return municipio, caminho, time.process_time() - inicio
+
+
+if __name__ == '__main__':
+    anterior = date.today().replace(day=1) - timedelta(days=1)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mes', default=f"{anterior:%Y-%m}", help='AAAA-MM (padrão: mês anterior)')
+    parser.add_argument('--municipio', action='append', default=[], help='só estes municípios (repetível)')
+    parser.add_argument('--destino', type=Path, help='diretório (padrão: relatorios/AAAA-MM)')
+    parser.add_argument('--processos', type=int, default=os.cpu_count())
+    parser.add_argument('--png', action='store_true', help='também grava cada gráfico em PNG (requer kaleido)')
+    args = parser.parse_args()
+
+    if args.png:
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            parser.error("--png requer o pacote kaleido")
+
+    periodo = month_period(args.mes)
+    destino = args.destino or Path('relatorios') / args.mes
+    destino.mkdir(parents=True, exist_ok=True)
+    (destino / 'plotly.min.js').write_text(get_plotlyjs(), encoding='utf-8')
+
+    inicio = time.perf_counter()
+    extraido, granularidade = extract(*periodo, municipios=args.municipio)
+    por_municipio = split_municipalities(extraido)
+    extracao = time.perf_counter() - inicio
+    linhas = sum(len(d) for d in extraido.values())
+    print(f"Extração: {len(extraido)} consultas, {linhas:,} linhas agregadas em {extracao:.1f} s")
+
+    # Municípios sem aplicações no mês também recebem o relatório (vazio)
+    municipios = args.municipio or sorted(set(load_municipalities()) | set(por_municipio))
+    inicio = time.perf_counter()
+    custos = []
+    with ProcessPoolExecutor(args.processos) as executor:
+        futuros = [executor.submit(render_report, m, por_municipio.get(m, {}), periodo, granularidade, destino, args.png)
+                   for m in municipios]
+        for futuro in as_completed(futuros):
+            municipio, caminho, segundos = futuro.result()
+            custos.append(segundos)
+            print(f"  {municipio}: {caminho} ({segundos * 1000:.0f} ms)")
+    renderizacao = time.perf_counter() - inicio
+
+    if custos:
+        p95 = statistics.quantiles(custos, n=20)[-1] if len(custos) > 1 else custos[0]
+        print(f"\n{len(custos)} relatórios em {destino}")
+        print(f"Renderização: {renderizacao:.1f} s com {args.processos} processos "
+              f"(soma dos relatórios {sum(custos):.1f} s, {sum(custos) / renderizacao:.1f}x)")
+        print(f"Por relatório: mediana {statistics.median(custos) * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms")
+        print(f"Total: {extracao + renderizacao:.1f} s")
@@ -0,0 +1,181 @@
+"""Roteamento das leituras entre o primário e as réplicas (DB_REPLICAS).
+
+As consultas de leitura do app vão para as réplicas saudáveis em rodízio;
+uma réplica sai do rodízio se não responde, se a replicação está parada ou
+se o atraso passa de REPLICA_MAX_LAG_S, e volta quando a verificação
+seguinte a encontra em dia. Sem réplica elegível, as leituras vão para o
+primário. Escritas (cargas, migrações, amostra) usam sempre o primário,
+via open_connection.
+
+Uso: cd app && uv run python -m utils.replicas --status
+     cd app && uv run python -m utils.replicas --configurar --origem-host mysql --origem-porta 3306
+"""
+import argparse
+import itertools
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import HAVE_CEXT, Error, errorcode, pooling
+
+
+class HostPool:
+    """Pool de conexões de um servidor, criado na primeira conexão pedida.
+
+    As conexões usam a extensão C do conector, quando instalada (senão, a
+    implementação em Python), e não reiniciam a sessão ao voltar para o
+    pool, para manter os prepared statements do MySQLBackend.
+    Usam autocommit: sem ele, a primeira leitura abre uma transação que
+    nunca termina e as seguintes veem sempre o mesmo snapshot.
+    """
+
+    def __init__(self, nome, config, tamanho):
+        self.nome = nome
+        self.config = config
+        self.tamanho = tamanho
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = pooling.MySQLConnectionPool(
+                    pool_name=self.nome, pool_size=self.tamanho, pool_reset_session=False,
+                    autocommit=True, use_pure=not HAVE_CEXT, **self.config)
+            return self._pool
+
+    def connect(self, **overrides):
+        """Conexão dedicada ao servidor, fora do pool"""
+        return mysql.connector.connect(**{**self.config, **overrides})
+
+
+def replica_lag(host, timeout=2):
+    """Atraso da réplica em segundos; None com o motivo se ela não está replicando"""
+    conn = host.connect(connection_timeout=timeout)
+    try:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+        except Error as e:
+            # Servidores anteriores ao 8.0.22 só têm a sintaxe antiga
+            if e.errno != errorcode.ER_PARSE_ERROR:
+                raise
+            cursor.execute("SHOW SLAVE STATUS")
+        status = cursor.fetchone()
+        cursor.close()
+    finally:
+        conn.close()
+
+    if status is None:
+        return None, "não configurada como réplica"
+    lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+    if lag is None:
+        return None, status.get('Last_Error') or "replicação parada"
+    return int(lag), None
+
+
+class ReplicaRouter:
+    """Escolhe o servidor de cada leitura e acompanha a saúde das réplicas"""
+
+    def __init__(self, primario, replicas, max_lag, intervalo):
+        self.primario = primario
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._rodizio = itertools.count()
+        self._status = {r.nome: {'saudavel': False, 'lag': None, 'motivo': 'não verificada'} for r in self.replicas}
+        self._verificado_em = 0.0
+        self._verificando = False
+        if self.replicas:
+            self.check()
+
+    def hosts(self):
+        """Todos os servidores conhecidos, pelo nome do pool"""
+        return {h.nome: h for h in [self.primario] + self.replicas}
+
+    def read_hosts(self):
+        """Ordem de tentativa para uma leitura: réplicas saudáveis em rodízio e, por último, o primário"""
+        self._maybe_check()
+        with self._lock:
+            saudaveis = [r for r in self.replicas if self._status[r.nome]['saudavel']]
+        if not saudaveis:
+            return [self.primario]
+        i = next(self._rodizio) % len(saudaveis)
+        return saudaveis[i:] + saudaveis[:i] + [self.primario]
+
+    def mark_down(self, host, motivo):
+        """Tira a réplica do rodízio até a próxima verificação"""
+        with self._lock:
+            self._status[host.nome] = {'saudavel': False, 'lag': None, 'motivo': str(motivo)}
+
+    def check(self):
+        """Verifica atraso e disponibilidade de todas as réplicas"""
+        for replica in self.replicas:
+            try:
+                lag, motivo = replica_lag(replica)
+            except Error as e:
+                lag, motivo = None, str(e)
+            if lag is not None and lag > self.max_lag:
+                motivo = f"atraso de {lag}s acima do limite de {self.max_lag}s"
+            with self._lock:
+                self._status[replica.nome] = {'saudavel': motivo is None, 'lag': lag, 'motivo': motivo}
+        with self._lock:
+            self._verificado_em = time.monotonic()
+            self._verificando = False
+
+    def _maybe_check(self):
+        # A verificação roda em segundo plano; as leituras seguem com o estado anterior
+        with self._lock:
+            if (not self.replicas or self._verificando
+                    or time.monotonic() - self._verificado_em < self.intervalo):
+                return
+            self._verificando = True
+        threading.Thread(target=self.check, name='verifica-replicas', daemon=True).start()
+
+    def status(self):
+        with self._lock:
+            return {nome: dict(s) for nome, s in self._status.items()}
+
+
+def configure_replica(host, origem_host, origem_porta, usuario, senha):
+    """Aponta a réplica para o primário (GTID, posição automática) e inicia a replicação"""
+    conn = host.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("STOP REPLICA")
+        cursor.execute("""
+            CHANGE REPLICATION SOURCE TO
+                SOURCE_HOST = %s, SOURCE_PORT = %s, SOURCE_USER = %s, SOURCE_PASSWORD = %s,
+                SOURCE_AUTO_POSITION = 1, GET_SOURCE_PUBLIC_KEY = 1
+        """, (origem_host, origem_porta, usuario, senha))
+        cursor.execute("START REPLICA")
+        cursor.close()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    from utils.constants import DB_CONFIG, DB_REPLICAS, REPLICA_MAX_LAG_S
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--status', action='store_true', help='mostra o atraso de cada réplica')
+    parser.add_argument('--configurar', action='store_true', help='inicia a replicação a partir do primário')
+    parser.add_argument('--origem-host', default=DB_CONFIG['host'], help='primário visto pelas réplicas')
+    parser.add_argument('--origem-porta', type=int, default=DB_CONFIG['port'])
+    args = parser.parse_args()
+
+    replicas = [HostPool(f"replica{i}", config, 1) for i, config in enumerate(DB_REPLICAS, 1)]
+    if not replicas:
+        parser.exit(1, "Nenhuma réplica em DB_REPLICAS\n")
+
+    if args.configurar:
+        for replica in replicas:
+            configure_replica(replica, args.origem_host, args.origem_porta, DB_CONFIG['user'], DB_CONFIG['password'])
+            print(f"{replica.nome}: replicação iniciada a partir de {args.origem_host}:{args.origem_porta}")
+
+    router = ReplicaRouter(HostPool('vacinacao', DB_CONFIG, 1), replicas, REPLICA_MAX_LAG_S, intervalo=0)
+    for replica in replicas:
+        s = router.status()[replica.nome]
+        situacao = 'ok' if s['saudavel'] else s['motivo']
+        print(f"{replica.nome} ({replica.config['host']}:{replica.config['port']}): atraso {s['lag']}s, {situacao}")
@@ -0,0 +1,167 @@
+import threading
+import time
+import weakref
+
+import pandas as pd
+import pyarrow as pa
+
+# Strings ficam como views sobre os buffers Arrow em vez de objetos Python
+_TIPOS_PANDAS = {
+    pa.string(): pd.StringDtype('pyarrow'),
+    pa.large_string(): pd.StringDtype('pyarrow'),
+}
+
+
+def _para_arrow(df):
+    """Converte o DataFrame do banco em tabela Arrow (datas viram timestamp)"""
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    for i, campo in enumerate(tabela.schema):
+        if pa.types.is_date(campo.type):
+            tabela = tabela.set_column(i, campo.name, tabela.column(i).cast(pa.timestamp('ns')))
+    return tabela
+
+
+class _Entrada:
+    __slots__ = ('tabela', 'df', 'refs', 'criado_em', 'ultimo_uso', 'nbytes')
+
+    def __init__(self, tabela, df):
+        self.tabela = tabela
+        self.df = df
+        self.refs = 0
+        self.criado_em = self.ultimo_uso = time.monotonic()
+        self.nbytes = tabela.nbytes if tabela is not None else int(df.memory_usage(deep=False).sum())
+
+
+class Lease:
+    """Referência de uma sessão a uma entrada do store; liberada no release ou no GC"""
+
+    def __init__(self, store, chave, entrada):
+        self.chave = chave
+        self._finalizer = weakref.finalize(self, store._release, chave, entrada)
+
+    def release(self):
+        self._finalizer()
+
+
+class ResultStore:
+    """Resultados somente leitura em buffers Arrow compartilhados entre sessões.
+
+    Cada entrada guarda a tabela Arrow e um DataFrame montado uma única vez
+    sobre ela; as sessões recebem cópias rasas desse DataFrame, sem
+    desserializar nem copiar as linhas. Entradas sem referências são
+    descartadas depois de expirar ou quando o limite de memória é atingido.
+    """
+
+    def __init__(self, ttl=300, max_bytes=1 << 30):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entradas = {}
+        self._carregando = {}
+        self._lock = threading.RLock()
+
+    def acquire(self, chave, loader, aguardar=None):
+        """Retorna (df, lease) para a chave, executando loader() em caso de miss.
+
+        Pedidos simultâneos da mesma chave são coalescidos: só o primeiro
+        executa o loader e os demais aguardam o resultado, chamando
+        `aguardar()` periodicamente (para poderem ser interrompidos). Se a
+        carga falhar, quem estava esperando tenta de novo.
+        """
+        while True:
+            with self._lock:
+                self._coletar()
+                entrada = self._valida(chave)
+                carga = None
+                if entrada is None:
+                    carga = self._carregando.get(chave)
+                    dono = carga is None
+                    if dono:
+                        carga = self._carregando[chave] = threading.Event()
+
+            if entrada is not None:
+                break
+            if dono:
+                try:
+                    entrada = self._montar(loader())
+                    with self._lock:
+                        self._entradas[chave] = entrada
+                finally:
+                    with self._lock:
+                        del self._carregando[chave]
+                    carga.set()
+                break
+            while not carga.wait(0.1):
+                if aguardar is not None:
+                    aguardar()
+
+        with self._lock:
+            return self._lease(chave, entrada)
+
+    def find(self, criterio):
+        """Retorna (df, lease) da primeira entrada válida cuja chave atende ao critério"""
+        with self._lock:
+            for chave, entrada in self._entradas.items():
+                if not self._expirada(entrada) and criterio(chave):
+                    return self._lease(chave, entrada)
+        return None
+
+    def arrow(self, chave):
+        """Tabela Arrow de uma entrada válida, ou None"""
+        with self._lock:
+            entrada = self._valida(chave)
+            return entrada.tabela if entrada is not None else None
+
+    def stats(self):
+        """Resumo do conteúdo para depuração"""
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'bytes': sum(e.nbytes for e in self._entradas.values()),
+                'referencias': sum(e.refs for e in self._entradas.values()),
+            }
+
+    def _valida(self, chave):
+        entrada = self._entradas.get(chave)
+        if entrada is None or self._expirada(entrada):
+            return None
+        return entrada
+
+    def _lease(self, chave, entrada):
+        entrada.refs += 1
+        entrada.ultimo_uso = time.monotonic()
+        return entrada.df.copy(deep=False), Lease(self, chave, entrada)
+
+    def _montar(self, df):
+        try:
+            tabela = _para_arrow(df)
+        except (pa.ArrowException, TypeError):
+            # Colunas com tipos mistos: mantém o DataFrame original
+            return _Entrada(None, df)
+        view = tabela.to_pandas(types_mapper=_TIPOS_PANDAS.get, split_blocks=True)
+        return _Entrada(tabela, view)
+
+    def _expirada(self, entrada):
+        return time.monotonic() - entrada.criado_em > self.ttl
+
+    def _release(self, chave, entrada):
+        with self._lock:
+            entrada.refs -= 1
+            entrada.ultimo_uso = time.monotonic()
+            if entrada.refs <= 0 and self._entradas.get(chave) is entrada and self._expirada(entrada):
+                del self._entradas[chave]
+
+    def _coletar(self):
+        """Remove entradas sem referência expiradas e respeita o limite de memória"""
+        for chave, entrada in list(self._entradas.items()):
+            if entrada.refs <= 0 and self._expirada(entrada):
+                del self._entradas[chave]
+
+        total = sum(e.nbytes for e in self._entradas.values())
+        livres = sorted(
+            (chave for chave, e in self._entradas.items() if e.refs <= 0),
+            key=lambda chave: self._entradas[chave].ultimo_uso
+        )
+        for chave in livres:
+            if total <= self.max_bytes:
+                break
+            total -= self._entradas.pop(chave).nbytes
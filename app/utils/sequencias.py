@@ -0,0 +1,223 @@
+"""Sequências de doses por paciente e vacina e as análises de completude de esquema.
+
+`SequenciaDose` guarda, para cada aplicação, a posição na sequência do
+paciente para aquela vacina (ordenada por data), a dose seguinte e o
+intervalo em dias até ela, calculados no banco com funções de janela
+(ROW_NUMBER/LEAD). Com isso, "quantos pacientes que tomaram a 1ª dose
+tomaram a 2ª dentro do intervalo recomendado" é uma agregação simples sobre
+as linhas da dose de origem, sem parear aplicações.
+
+A atualização incremental recalcula só os pares (paciente, vacina) com
+aplicações novas desde a última data processada (menos uma margem, para
+cargas atrasadas). Depois de apagar partições antigas, use --completo.
+
+Uso: cd app && uv run python -m utils.sequencias [--completo] [--margem-dias 60]
+"""
+import argparse
+import time
+
+from utils.db_functions import load_dictionary, open_connection
+
+LOTE_PACIENTES = 200_000
+
+# Uma linha por aplicação, na ordem do paciente para cada vacina
+_SEQUENCIA = """
+    INSERT INTO {tabela}
+        (sk_paciente, id_vacina, ordem, id_aplicacao, data_vacina, id_dose, id_municipio,
+         id_dose_seguinte, dias_ate_seguinte)
+    SELECT ad.sk_paciente, ad.id_vacina,
+           ROW_NUMBER() OVER w,
+           ad.id_aplicacao, ad.data_vacina, ad.id_dose, p.id_municipio,
+           LEAD(ad.id_dose) OVER w,
+           DATEDIFF(LEAD(ad.data_vacina) OVER w, ad.data_vacina)
+    FROM AplicacaoDoseCompacta ad
+    JOIN PacienteCompacto p ON p.sk_paciente = ad.sk_paciente
+    {juncao}
+    WHERE ad.id_vacina IS NOT NULL {condicao}
+    WINDOW w AS (PARTITION BY ad.sk_paciente, ad.id_vacina ORDER BY ad.data_vacina, ad.id_aplicacao)
+"""
+
+
+def _mark_refreshed(cursor):
+    cursor.execute("""
+        REPLACE INTO SequenciaDoseControle (id, ultima_data, atualizada_em)
+        SELECT 1, MAX(data_vacina), NOW() FROM AplicacaoDoseCompacta
+    """)
+
+
+def rebuild_sequences(conn, lote=LOTE_PACIENTES):
+    """Recalcula toda a tabela, em faixas de `lote` pacientes; retorna as linhas geradas.
+
+    As janelas são particionadas por paciente, então cada faixa é exata. A
+    tabela nova é montada ao lado e trocada pela atual num RENAME TABLE
+    atômico: durante a reconstrução, a página de sequências continua lendo
+    a versão anterior completa.
+    """
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS SequenciaDose_nova")
+    cursor.execute("CREATE TABLE SequenciaDose_nova LIKE SequenciaDose")
+    cursor.execute("SELECT MIN(sk_paciente), MAX(sk_paciente) FROM PacienteCompacto")
+    menor, maior = cursor.fetchone()
+    linhas = 0
+    for inicio in range(menor or 0, (maior or -1) + 1, lote):
+        cursor.execute(_SEQUENCIA.format(tabela='SequenciaDose_nova', juncao='',
+                                         condicao="AND ad.sk_paciente BETWEEN %s AND %s"),
+                       (inicio, inicio + lote - 1))
+        linhas += cursor.rowcount
+        conn.commit()
+    cursor.execute("""
+        RENAME TABLE
+            SequenciaDose TO SequenciaDose_antiga,
+            SequenciaDose_nova TO SequenciaDose
+    """)
+    cursor.execute("DROP TABLE SequenciaDose_antiga")
+    _mark_refreshed(cursor)
+    conn.commit()
+    cursor.close()
+    return linhas
+
+
+def refresh_sequences(conn, margem_dias=60):
+    """Atualiza só os pares (paciente, vacina) com aplicações ainda fora da tabela.
+
+    Procura aplicações a partir da última data processada menos `margem_dias`;
+    sem atualização anterior, recalcula tudo. Retorna (pares, linhas).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT ultima_data FROM SequenciaDoseControle WHERE id = 1")
+    controle = cursor.fetchone()
+    if controle is None or controle[0] is None:
+        cursor.close()
+        linhas = rebuild_sequences(conn)
+        return None, linhas
+
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS _pares_sequencia")
+    cursor.execute("""
+        CREATE TEMPORARY TABLE _pares_sequencia (
+            sk_paciente INT UNSIGNED NOT NULL,
+            id_vacina INT NOT NULL,
+            PRIMARY KEY (sk_paciente, id_vacina)
+        )
+    """)
+    cursor.execute("""
+        INSERT IGNORE INTO _pares_sequencia
+        SELECT ad.sk_paciente, ad.id_vacina
+        FROM AplicacaoDoseCompacta ad
+        LEFT JOIN SequenciaDose s ON s.id_aplicacao = ad.id_aplicacao AND s.data_vacina = ad.data_vacina
+        WHERE ad.data_vacina >= DATE_SUB(%s, INTERVAL %s DAY)
+          AND s.id_aplicacao IS NULL
+          AND ad.sk_paciente IS NOT NULL AND ad.id_vacina IS NOT NULL
+    """, (controle[0], margem_dias))
+    pares = cursor.rowcount
+
+    # A sequência inteira do par muda (ordem, dose seguinte da antiga última)
+    cursor.execute("""
+        DELETE s FROM SequenciaDose s
+        JOIN _pares_sequencia pr ON pr.sk_paciente = s.sk_paciente AND pr.id_vacina = s.id_vacina
+    """)
+    cursor.execute(_SEQUENCIA.format(
+        tabela='SequenciaDose',
+        juncao="JOIN _pares_sequencia pr ON pr.sk_paciente = ad.sk_paciente AND pr.id_vacina = ad.id_vacina",
+        condicao=""))
+    linhas = cursor.rowcount
+    _mark_refreshed(cursor)
+    conn.commit()
+    cursor.execute("DROP TEMPORARY TABLE _pares_sequencia")
+    cursor.close()
+    return pares, linhas
+
+
+# ============= ANÁLISES =============
+def _ids(tabela, valores, campo='descricao'):
+    dicionario = load_dictionary(tabela, campo)
+    return sorted({i for valor in valores for i in dicionario.get(valor, [])})
+
+
+def _in(coluna, ids):
+    if not ids:
+        return " AND FALSE", []
+    return f" AND {coluna} IN ({','.join(['%s'] * len(ids))})", list(ids)
+
+
+def _sequence_filters(data_inicio, data_fim, vacinas, municipios, dose_origem):
+    """WHERE comum: aplicações da dose de origem no período, com os filtros"""
+    query = " WHERE s.data_vacina BETWEEN %s AND %s"
+    params = [data_inicio, data_fim]
+    for coluna, ids in [('s.id_dose', _ids('DoseVacina', [dose_origem])),
+                        ('s.id_vacina', _ids('Vacina', vacinas, 'nome') if vacinas else None),
+                        ('s.id_municipio', _ids('Municipio', municipios, 'nome') if municipios else None)]:
+        if ids is not None:
+            trecho, valores = _in(coluna, ids)
+            query += trecho
+            params += valores
+    return query, params
+
+
+def completion_query(data_inicio, data_fim, vacinas, municipios, dose_origem, dose_destino, dias_min, dias_max):
+    """Pacientes que tomaram a dose de origem no período e quantos seguiram para a de destino.
+
+    Por vacina e município de residência: iniciaram, completaram (a aplicação
+    seguinte foi a dose de destino) e no_prazo (com intervalo entre
+    `dias_min` e `dias_max` dias).
+    """
+    destino = _ids('DoseVacina', [dose_destino]) or [None]
+    marcadores = ','.join(['%s'] * len(destino))
+    filtros, params = _sequence_filters(data_inicio, data_fim, vacinas, municipios, dose_origem)
+    query = f"""
+    SELECT v.nome AS vacina, COALESCE(m.nome, 'Não informado') AS municipio,
+           COUNT(*) AS iniciaram,
+           SUM(CASE WHEN s.id_dose_seguinte IN ({marcadores}) THEN 1 ELSE 0 END) AS completaram,
+           SUM(CASE WHEN s.id_dose_seguinte IN ({marcadores})
+                     AND s.dias_ate_seguinte BETWEEN %s AND %s THEN 1 ELSE 0 END) AS no_prazo
+    FROM SequenciaDose s
+    JOIN Vacina v ON v.id = s.id_vacina
+    LEFT JOIN Municipio m ON m.id = s.id_municipio
+    {filtros}
+    GROUP BY vacina, municipio
+    """
+    return query, destino + destino + [dias_min, dias_max] + params
+
+
+def interval_query(data_inicio, data_fim, vacinas, municipios, dose_origem, dose_destino, max_semanas=52):
+    """Distribuição do intervalo (em semanas, truncado em `max_semanas`) até a dose de destino, por vacina"""
+    destino = _ids('DoseVacina', [dose_destino])
+    filtros, params = _sequence_filters(data_inicio, data_fim, vacinas, municipios, dose_origem)
+    trecho, valores = _in('s.id_dose_seguinte', destino)
+    query = f"""
+    SELECT v.nome AS vacina, LEAST(FLOOR(s.dias_ate_seguinte / 7), %s) AS semanas, COUNT(*) AS count
+    FROM SequenciaDose s
+    JOIN Vacina v ON v.id = s.id_vacina
+    {filtros}{trecho}
+    GROUP BY vacina, semanas
+    ORDER BY semanas
+    """
+    return query, [max_semanas] + params + valores
+
+
+def completion_rates(dados, por):
+    """Soma as contagens por `por` e calcula as taxas de conclusão (0 a 1)"""
+    resumo = dados.groupby(por, as_index=False)[['iniciaram', 'completaram', 'no_prazo']].sum()
+    resumo['taxa_conclusao'] = resumo['completaram'] / resumo['iniciaram']
+    resumo['taxa_no_prazo'] = resumo['no_prazo'] / resumo['iniciaram']
+    return resumo.sort_values('iniciaram', ascending=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--completo', action='store_true', help='recalcula a tabela inteira')
+    parser.add_argument('--margem-dias', type=int, default=60, help='janela para cargas atrasadas')
+    parser.add_argument('--lote', type=int, default=LOTE_PACIENTES, help='pacientes por faixa no recálculo completo')
+    args = parser.parse_args()
+
+    conn = open_connection()
+    try:
+        inicio = time.perf_counter()
+        if args.completo:
+            linhas = rebuild_sequences(conn, args.lote)
+            print(f"Sequências recalculadas: {linhas:,} linhas em {time.perf_counter() - inicio:.1f}s")
+        else:
+            pares, linhas = refresh_sequences(conn, args.margem_dias)
+            alvo = 'tabela inteira' if pares is None else f"{pares:,} pares (paciente, vacina)"
+            print(f"Sequências atualizadas ({alvo}): {linhas:,} linhas em {time.perf_counter() - inicio:.1f}s")
+    finally:
+        conn.close()
@@ -0,0 +1,338 @@
+"""Aplicações particionadas por UF de residência do paciente em vários MySQL (DB_SHARDS).
+
+Cada shard guarda os pacientes das suas UFs, com as aplicações deles, e uma
+cópia completa das tabelas de referência (vacinas, estabelecimentos,
+dicionários); o shard '*' recebe as UFs não listadas e os pacientes sem UF.
+As consultas do painel e das estatísticas rodam em paralelo nos shards
+(scatter-gather) e os resultados parciais são juntados em memória:
+
+- contagens e somas são somadas por grupo;
+- médias vêm de soma e contagem de cada shard;
+- contagens distintas de pacientes também são somadas, pois cada paciente
+  está num único shard; as de outras chaves (estabelecimentos, por exemplo)
+  usam esboços HyperLogLog calculados no próprio banco (hll_query), que se
+  juntam pelo máximo de cada registrador (erro padrão de ~1,6%);
+- ordem e limite são aplicados depois da junção (cada shard devolve todos os
+  grupos; só seções de linhas, como as últimas aplicações, limitam no shard).
+
+Consultas filtradas por UF vão apenas aos shards dessas UFs. O primário
+continua com todas as tabelas e atende as demais páginas, a exportação e os
+relatórios; --distribuir copia dele para os shards.
+
+Uso: cd app && uv run python -m utils.shards --status
+     cd app && uv run python -m utils.shards --distribuir
+"""
+import argparse
+import re
+import time
+from concurrent.futures import FIRST_EXCEPTION, wait
+
+import numpy as np
+import pandas as pd
+from mysql.connector import Error
+
+from utils.query_control import QueryCancelled, QueryHandle
+
+# Precisão dos esboços HLL: 2^12 registradores, indexados pelos 3 primeiros dígitos hexadecimais do MD5
+PRECISAO_HLL = 12
+REGISTROS_HLL = 2 ** PRECISAO_HLL
+ALFA_HLL = 0.7213 / (1 + 1.079 / REGISTROS_HLL)
+
+
+class Shard:
+    """Um servidor com as aplicações dos pacientes de `ufs` ('*': UFs não listadas)"""
+
+    def __init__(self, nome, ufs, backend, host=None):
+        self.nome = nome
+        self.ufs = frozenset(ufs)
+        self.backend = backend
+        self.host = host
+
+    @property
+    def padrao(self):
+        return '*' in self.ufs
+
+    def __repr__(self):
+        return f"Shard({self.nome}, {','.join(sorted(self.ufs))})"
+
+
+class ShardMap:
+    """Roteamento das consultas pelos shards e execução em paralelo"""
+
+    def __init__(self, shards):
+        self.shards = list(shards)
+        vistas = set()
+        for shard in self.shards:
+            repetidas = vistas & shard.ufs
+            if repetidas:
+                raise ValueError(f"UF em mais de um shard: {', '.join(sorted(repetidas))}")
+            vistas |= shard.ufs
+        self.listadas = frozenset(vistas - {'*'})
+
+    def route(self, ufs=()):
+        """Shards que podem ter aplicações de pacientes das `ufs` (todos, sem filtro de UF)"""
+        if not ufs:
+            return list(self.shards)
+        ufs = {uf.upper() for uf in ufs}
+        alvos = [s for s in self.shards if s.ufs & ufs or (s.padrao and ufs - self.listadas)]
+        # UF sem shard nem '*': nenhum tem os dados, o primeiro responde vazio com as colunas certas
+        return alvos or self.shards[:1]
+
+    def condition(self, shard, coluna='m.uf'):
+        """Trecho WHERE (e parâmetros) que seleciona os pacientes do shard"""
+        trechos, params = [], []
+        ufs = sorted(shard.ufs - {'*'})
+        if ufs:
+            trechos.append(f"{coluna} IN ({','.join(['%s'] * len(ufs))})")
+            params += ufs
+        if shard.padrao:
+            listadas = sorted(self.listadas)
+            if listadas:
+                trechos.append(f"({coluna} IS NULL OR {coluna} NOT IN ({','.join(['%s'] * len(listadas))}))")
+                params += listadas
+            else:
+                trechos.append("TRUE")
+        return '(' + (' OR '.join(trechos) or 'FALSE') + ')', params
+
+    def gather(self, alvos, consultas, executor, handle, timeout_ms=None, aguardar=None):
+        """Roda cada consulta de `consultas` ({parte: (query, params)}) em cada shard de `alvos`.
+
+        Retorna {parte: [DataFrame de cada shard]}. Cada consulta tem um handle
+        próprio ligado a `handle`, que as cancela todas; o erro de um shard
+        cancela as demais e sobe com o nome do shard. `aguardar` é chamado
+        enquanto espera (ponto de interrupção do Streamlit).
+        """
+        tarefas = {}
+        for shard in alvos:
+            for parte, (query, params) in consultas.items():
+                filho = QueryHandle(killer=shard.backend.kill, sessao=handle.sessao, prioridade=handle.prioridade)
+                handle.link(filho)
+                tarefas[executor.submit(_run_on, shard, query, params, timeout_ms, filho)] = (parte, filho)
+
+        pendentes = set(tarefas)
+        try:
+            while pendentes:
+                prontas, pendentes = wait(pendentes, timeout=0.1, return_when=FIRST_EXCEPTION)
+                for tarefa in prontas:
+                    tarefa.result()
+                if pendentes and aguardar is not None:
+                    aguardar()
+        except BaseException:
+            for tarefa in pendentes:
+                tarefas[tarefa][1].cancel()
+            raise
+
+        partes = {parte: [] for parte in consultas}
+        for tarefa, (parte, _) in tarefas.items():
+            partes[parte].append(tarefa.result())
+        return partes
+
+
+def _run_on(shard, query, params, timeout_ms, handle):
+    if handle.cancelled:
+        # Cancelado antes de sair da fila do executor
+        raise QueryCancelled()
+    try:
+        return shard.backend.run(query, params, timeout_ms, handle)
+    except Error as e:
+        raise Error(msg=f"{shard.nome}: {e.msg}", errno=e.errno) from e
+
+
+# ============= JUNÇÃO DOS RESULTADOS PARCIAIS =============
+def sort_like_sql(dados, ordem):
+    """Ordena como `ORDER BY ordem` ("col DESC, outra", com crases ou apelido de tabela)"""
+    colunas, ascendente = [], []
+    for termo in ordem.split(','):
+        coluna, _, sentido = termo.strip().rpartition(' ')
+        if sentido.upper() not in ('ASC', 'DESC'):
+            coluna, sentido = termo.strip(), 'ASC'
+        colunas.append(coluna.strip().strip('`').split('.')[-1])
+        ascendente.append(sentido.upper() == 'ASC')
+    return dados.sort_values(colunas, ascending=ascendente, kind='stable')
+
+
+def merge_partials(partes, grupo=(), somar=True, medias=None, ordem=None, limite=None):
+    """Junta os resultados de cada shard de uma mesma consulta.
+
+    Com `somar`, as colunas fora de `grupo` são somadas por grupo (ou no
+    total, sem grupo); sem, as linhas são só concatenadas. `medias` mapeia
+    coluna -> (coluna da soma, coluna da contagem), que saem do resultado.
+    `ordem` (trecho de ORDER BY) e `limite` valem para o resultado juntado.
+    """
+    grupo = list(grupo)
+    dados = pd.concat(partes, ignore_index=True)
+    if somar:
+        valores = [c for c in dados.columns if c not in grupo]
+        if grupo:
+            dados = dados.groupby(grupo, as_index=False, dropna=False, sort=False)[valores].sum()
+        else:
+            dados = pd.DataFrame({c: [dados[c].sum()] for c in valores})
+    for coluna, (soma, contagem) in (medias or {}).items():
+        dados[coluna] = dados[soma] / dados[contagem].where(dados[contagem] > 0)
+        dados = dados.drop(columns=[soma, contagem])
+    if ordem:
+        dados = sort_like_sql(dados, ordem)
+    if limite is not None:
+        dados = dados.head(limite)
+    return dados.reset_index(drop=True)
+
+
+# ============= CONTAGEM DISTINTA (HYPERLOGLOG) =============
+def hll_query(interna, grupo=()):
+    """Esboço HLL de `_valor` por grupo: uma linha (grupo, registro, rho) por registrador ocupado.
+
+    `interna` seleciona as colunas de `grupo` e `_valor`. O hash é o MD5 do
+    valor como texto: os 12 primeiros bits escolhem o registrador e rho é a
+    posição do primeiro bit 1 nos 52 seguintes, tudo calculado no banco.
+    """
+    colunas = ''.join(f"`{c}`, " for c in grupo)
+    digitos = PRECISAO_HLL // 4
+    return f"""
+    SELECT {colunas}CONV(SUBSTRING(MD5(CAST(_valor AS CHAR)), 1, {digitos}), 16, 10) AS registro,
+           MAX(53 - LENGTH(CONV(SUBSTRING(MD5(CAST(_valor AS CHAR)), {digitos + 1}, 13), 16, 2))) AS rho
+    FROM ({interna}) t
+    WHERE _valor IS NOT NULL
+    GROUP BY {colunas}registro
+    """
+
+
+def hll_estimate(esbocos, grupo=()):
+    """Contagem distinta estimada por grupo a partir dos esboços de todos os shards.
+
+    Os esboços se juntam pelo máximo de cada registrador; com muitos
+    registradores vazios (contagens pequenas) usa a contagem linear.
+    Retorna DataFrame com as colunas de `grupo` e `estimativa`.
+    """
+    grupo = list(grupo)
+    esbocos = esbocos.astype({'registro': 'int64', 'rho': 'float64'})
+    maximos = esbocos.groupby(grupo + ['registro'], dropna=False)['rho'].max().reset_index()
+    maximos['inverso'] = np.exp2(-maximos['rho'])
+    if grupo:
+        totais = maximos.groupby(grupo, dropna=False).agg(
+            soma=('inverso', 'sum'), ocupados=('registro', 'size')).reset_index()
+    else:
+        totais = pd.DataFrame({'soma': [maximos['inverso'].sum()], 'ocupados': [len(maximos)]})
+
+    vazios = REGISTROS_HLL - totais['ocupados']
+    bruta = ALFA_HLL * REGISTROS_HLL ** 2 / (totais['soma'] + vazios)
+    linear = REGISTROS_HLL * np.log(REGISTROS_HLL / vazios.where(vazios > 0))
+    totais['estimativa'] = np.where((bruta <= 2.5 * REGISTROS_HLL) & (vazios > 0), linear, bruta).round()
+    return totais.drop(columns=['soma', 'ocupados'])
+
+
+# ============= DISTRIBUIÇÃO =============
+# Tabelas com uma linha por paciente ou aplicação, divididas entre os shards
+DIVIDIDAS = {
+    'PacienteCompacto': """SELECT p.* FROM PacienteCompacto p
+                           LEFT JOIN Municipio m ON p.id_municipio = m.id WHERE {condicao}""",
+    'AplicacaoDoseCompacta': """SELECT ad.* FROM AplicacaoDoseCompacta ad
+                                JOIN PacienteCompacto p ON ad.sk_paciente = p.sk_paciente
+                                LEFT JOIN Municipio m ON p.id_municipio = m.id WHERE {condicao}""",
+}
+
+# Derivadas das aplicações: ficam vazias no shard, e a amostra é refeita com os dados dele
+DERIVADAS = {'AmostraAplicacao', 'EstratoAmostra', 'SequenciaDose', 'SequenciaDoseControle'}
+
+LOTE = 10_000
+
+
+def _definer_free(ddl):
+    return re.sub(r"\s*DEFINER\s*=\s*`[^`]*`@`[^`]*`", '', ddl)
+
+
+def copy_schema(origem, destino):
+    """Recria no destino as tabelas e views da origem (sem dados); retorna as tabelas"""
+    leitura, escrita = origem.cursor(), destino.cursor()
+    leitura.execute("SHOW FULL TABLES")
+    objetos = leitura.fetchall()
+    escrita.execute("SET FOREIGN_KEY_CHECKS = 0")
+    tabelas = []
+    for nome, tipo in objetos:
+        if tipo == 'VIEW':
+            continue
+        leitura.execute(f"SHOW CREATE TABLE `{nome}`")
+        escrita.execute(f"DROP TABLE IF EXISTS `{nome}`")
+        escrita.execute(leitura.fetchone()[1])
+        tabelas.append(nome)
+    for nome, tipo in objetos:
+        if tipo == 'VIEW':
+            leitura.execute(f"SHOW CREATE VIEW `{nome}`")
+            escrita.execute(f"DROP VIEW IF EXISTS `{nome}`")
+            escrita.execute(_definer_free(leitura.fetchone()[1]))
+    leitura.close()
+    escrita.close()
+    return tabelas
+
+
+def copy_rows(origem, destino, tabela, consulta, params=()):
+    """Copia o resultado de `consulta` na origem para `tabela` no destino, em lotes; retorna as linhas"""
+    leitura = origem.cursor()
+    leitura.execute(consulta, params)
+    colunas = [d[0] for d in leitura.description]
+    insert = (f"INSERT INTO `{tabela}` ({', '.join(f'`{c}`' for c in colunas)}) "
+              f"VALUES ({', '.join(['%s'] * len(colunas))})")
+    escrita = destino.cursor()
+    escrita.execute("SET FOREIGN_KEY_CHECKS = 0")
+    total = 0
+    while True:
+        linhas = leitura.fetchmany(LOTE)
+        if not linhas:
+            break
+        escrita.executemany(insert, linhas)
+        total += len(linhas)
+    destino.commit()
+    leitura.close()
+    escrita.close()
+    return total
+
+
+def distribute(origem, destino, condicao, params):
+    """Copia a origem para um shard: referências inteiras, pacientes e aplicações de `condicao`"""
+    copiadas = {}
+    for tabela in copy_schema(origem, destino):
+        if tabela in DERIVADAS:
+            continue
+        consulta = DIVIDIDAS.get(tabela, f"SELECT * FROM `{tabela}`")
+        filtro = params if tabela in DIVIDIDAS else ()
+        copiadas[tabela] = copy_rows(origem, destino, tabela, consulta.format(condicao=condicao), filtro)
+    return copiadas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--status', action='store_true', help='aplicações e pacientes de cada shard')
+    parser.add_argument('--distribuir', action='store_true', help='copia o primário para os shards')
+    args = parser.parse_args()
+
+    from utils.amostragem import refresh_sample
+    from utils.db_functions import get_shard_map, open_connection
+
+    mapa = get_shard_map()
+    if mapa is None:
+        parser.error("nenhum shard configurado (DB_SHARDS)")
+
+    if args.distribuir:
+        origem = open_connection()
+        for shard in mapa.shards:
+            inicio = time.perf_counter()
+            condicao, params = mapa.condition(shard)
+            destino = shard.host.connect()
+            copiadas = distribute(origem, destino, condicao, params)
+            refresh_sample(destino)
+            destino.close()
+            print(f"{shard.nome} ({','.join(sorted(shard.ufs))}): {copiadas.get('PacienteCompacto', 0):,} pacientes, "
+                  f"{copiadas.get('AplicacaoDoseCompacta', 0):,} aplicações em {time.perf_counter() - inicio:.1f} s")
+        origem.close()
+
+    if args.status or not args.distribuir:
+        for shard in mapa.shards:
+            try:
+                contagens = shard.backend.run("""
+                    SELECT (SELECT COUNT(*) FROM AplicacaoDoseCompacta) AS aplicacoes,
+                           (SELECT COUNT(*) FROM PacienteCompacto) AS pacientes
+                """).iloc[0]
+            except Error as e:
+                print(f"{shard.nome} ({shard.host.config['host']}:{shard.host.config['port']}): indisponível ({e})")
+                continue
+            print(f"{shard.nome} ({','.join(sorted(shard.ufs))}): {int(contagens['aplicacoes']):,} aplicações, "
+                  f"{int(contagens['pacientes']):,} pacientes")
@@ -0,0 +1,132 @@
+"""Snapshot do banco MySQL num arquivo DuckDB, para o backend embarcado.
+
+Copia as tabelas do esquema (em lotes, com os tipos declarados no MySQL) e
+recria as views traduzidas para o dialeto do DuckDB. O arquivo é escrito ao
+lado do destino e só substitui o snapshot anterior quando está completo.
+
+Uso: cd app && uv run python -m utils.snapshot [--destino caminho.duckdb]
+"""
+import argparse
+import os
+
+import duckdb
+import pandas as pd
+
+from utils.backends import translate_mysql
+from utils.constants import DB_CONFIG, DUCKDB_PATH
+from utils.db_functions import open_connection
+
+LOTE = 200_000
+
+# Tabelas de trabalho que não entram no snapshot
+IGNORADAS = ('bench_', '_bench_', 'SchemaMigracao')
+
+
+def duckdb_type(tipo, precisao, escala, tamanho):
+    """Tipo DuckDB equivalente ao DATA_TYPE do information_schema do MySQL"""
+    if tipo in ('tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint', 'year'):
+        return 'BIGINT'
+    if tipo == 'decimal':
+        return f'DECIMAL({precisao}, {escala})'
+    if tipo in ('float', 'double'):
+        return 'DOUBLE'
+    if tipo == 'date':
+        return 'DATE'
+    if tipo in ('datetime', 'timestamp'):
+        return 'TIMESTAMP'
+    if tipo == 'bit':
+        return 'BOOLEAN' if tamanho == 1 else 'BIGINT'
+    return 'VARCHAR'
+
+
+def copy_table(conn, destino, tabela, nome=None, lote=LOTE):
+    """Copia uma tabela do MySQL para o DuckDB `destino`; retorna o número de linhas"""
+    nome = nome or tabela
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT COLUMN_NAME, DATA_TYPE, NUMERIC_PRECISION, NUMERIC_SCALE, CHARACTER_MAXIMUM_LENGTH
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY ORDINAL_POSITION
+    """, (tabela,))
+    colunas = cursor.fetchall()
+    definicao = ', '.join(f'"{c}" {duckdb_type(*resto)}' for c, *resto in colunas)
+    destino.execute(f'CREATE OR REPLACE TABLE "{nome}" ({definicao})')
+
+    cursor.execute(f"SELECT * FROM `{tabela}`")
+    nomes = [c[0] for c in colunas]
+    total = 0
+    while True:
+        linhas = cursor.fetchmany(lote)
+        if not linhas:
+            break
+        lote_df = pd.DataFrame(linhas, columns=nomes)
+        destino.register('lote_df', lote_df)
+        destino.execute(f'INSERT INTO "{nome}" SELECT * FROM lote_df')
+        destino.unregister('lote_df')
+        total += len(linhas)
+    cursor.close()
+    return total
+
+
+def build_snapshot(conn, caminho=DUCKDB_PATH):
+    """Gera o snapshot completo em `caminho`; retorna {tabela: linhas}"""
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    temporario = caminho + '.tmp'
+    if os.path.exists(temporario):
+        os.remove(temporario)
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT TABLE_NAME FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'
+    """)
+    tabelas = [t for (t,) in cursor.fetchall() if not t.startswith(IGNORADAS)]
+    cursor.execute("""
+        SELECT TABLE_NAME, VIEW_DEFINITION FROM information_schema.VIEWS
+        WHERE TABLE_SCHEMA = DATABASE()
+    """)
+    views = dict(cursor.fetchall())
+    cursor.close()
+
+    destino = duckdb.connect(temporario)
+    try:
+        copiadas = {}
+        for tabela in tabelas:
+            copiadas[tabela] = copy_table(conn, destino, tabela)
+            print(f"  {tabela}: {copiadas[tabela]:,} linhas")
+
+        # Views podem depender de outras views: cria até não haver progresso
+        pendentes = dict(views)
+        while pendentes:
+            criadas = []
+            for nome, definicao in pendentes.items():
+                sql, _ = translate_mysql(definicao, esquema=DB_CONFIG['database'])
+                try:
+                    destino.execute(f'CREATE VIEW "{nome}" AS {sql}')
+                    criadas.append(nome)
+                except duckdb.CatalogException:
+                    continue
+            if not criadas:
+                raise RuntimeError(f"Views não traduzidas: {', '.join(pendentes)}")
+            for nome in criadas:
+                del pendentes[nome]
+        destino.execute("CHECKPOINT")
+    finally:
+        destino.close()
+
+    os.replace(temporario, caminho)
+    return copiadas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--destino', default=DUCKDB_PATH)
+    args = parser.parse_args()
+
+    conn = open_connection()
+    try:
+        copiadas = build_snapshot(conn, args.destino)
+        print(f"Snapshot gerado em {args.destino}: {len(copiadas)} tabelas, {sum(copiadas.values()):,} linhas")
+    finally:
+        conn.close()
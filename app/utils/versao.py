@@ -0,0 +1,44 @@
+"""Versão dos dados de aplicações e pacientes (tabela VersaoDados, migração 008).
+
+O app guarda índices, figuras e ETags por versão dos dados e só os refaz
+quando ela muda. Contagens exatas varrem as tabelas, e as estatísticas do
+information_schema (linhas, UPDATE_TIME) ficam em cache no MySQL 8 por até
+um dia; por isso cada carga incrementa esta versão ao terminar.
+
+Uso: cd app && uv run python -m utils.versao [--origem "carga 2025-01"]
+     cd app && uv run python -m utils.versao --mostrar
+"""
+import argparse
+
+from utils.db_functions import open_connection
+
+
+def bump_data_version(cursor, origem=None):
+    """Incrementa a versão dos dados (quem chama faz o commit); retorna a nova versão"""
+    cursor.execute("UPDATE VersaoDados SET versao = versao + 1, origem = %s, atualizada_em = NOW() WHERE id = 1",
+                   (origem,))
+    cursor.execute("SELECT versao FROM VersaoDados WHERE id = 1")
+    (versao,) = cursor.fetchone()
+    return versao
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--origem', default='carga', help='descrição da alteração (carga, correção...)')
+    parser.add_argument('--mostrar', action='store_true', help='só mostra a versão atual')
+    args = parser.parse_args()
+
+    conn = open_connection()
+    cursor = conn.cursor()
+    try:
+        if args.mostrar:
+            cursor.execute("SELECT versao, origem, atualizada_em FROM VersaoDados WHERE id = 1")
+            versao, origem, atualizada_em = cursor.fetchone()
+            print(f"Versão {versao} ({origem}, {atualizada_em:%d/%m/%Y %H:%M})")
+        else:
+            versao = bump_data_version(cursor, args.origem)
+            conn.commit()
+            print(f"Versão dos dados: {versao}")
+    finally:
+        cursor.close()
+        conn.close()
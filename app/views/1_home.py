@@ -1,8 +1,4 @@
 import streamlit as st
-import time
-import numpy as np
-import pandas as pd
-import streamlit as st
 
 st.set_page_config(
     page_title="Dashboard de Vacinação",
@@ -1,11 +1,12 @@
+import os
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
+from contextlib import closing
+from pathlib import Path
 from datetime import datetime, timedelta
-from mysql.connector import Error
-import os
 from utils.db_functions import *
+from utils.painel import *
+from utils.busca import get_establishment_index
 
 # ============= CONFIGURAÇÃO DA PÁGINA =============
 st.set_page_config(
@@ -24,17 +25,17 @@ def load_filters():
     try:
         # Vacinas
         query_vacinas = "SELECT DISTINCT nome FROM Vacina WHERE nome IS NOT NULL ORDER BY nome"
-        df_vacinas = execute_query(query_vacinas)
+        df_vacinas = execute_query(query_vacinas, prioridade=INTERATIVA)
         vacinas = df_vacinas['nome'].tolist() if not df_vacinas.empty else []
         
         # Doses
-        query_doses = "SELECT DISTINCT dose_vacina FROM AplicacaoDose WHERE dose_vacina IS NOT NULL ORDER BY dose_vacina"
-        df_doses = execute_query(query_doses)
+        query_doses = "SELECT descricao AS dose_vacina FROM DoseVacina ORDER BY descricao"
+        df_doses = execute_query(query_doses, prioridade=INTERATIVA)
         doses = df_doses['dose_vacina'].tolist() if not df_doses.empty else []
         
         # Estratégias
         query_estrategias = "SELECT DISTINCT descricao FROM EstrategiaVacinacao WHERE descricao IS NOT NULL ORDER BY descricao"
-        df_estrategias = execute_query(query_estrategias)
+        df_estrategias = execute_query(query_estrategias, prioridade=INTERATIVA)
         estrategias = df_estrategias['descricao'].tolist() if not df_estrategias.empty else []
         
         return vacinas, doses, estrategias
@@ -50,165 +51,146 @@ st.sidebar.header("Filtros")
 with st.spinner("Carregando opções de filtros...", show_time=True):
     vacinas_lista, doses_lista, estrategias_lista = load_filters()
 
-# Filtro de Período
-col_data = st.sidebar.columns(2)
-with col_data[0]:
-    data_inicio_filtro = st.date_input(
-        "Data Início",
-        value=datetime(2024, 1, 1),
-        key="data_inicio"
-    )
-with col_data[1]:
-    data_fim_filtro = st.date_input(
-        "Data Fim",
-        value=datetime(2024, 1, 31),
-        key="data_fim"
-    )
-
 municipios_filtrados = load_municipalities()
-municipios_selecionados = st.sidebar.multiselect(
-    "Município",
-    options=municipios_filtrados,
-    default=[]
-)
+ufs_lista = load_ufs()
+
+# Busca de estabelecimentos fora do formulário: cada termo digitado atualiza as
+# opções sem aplicar os filtros. Só os resultados da busca e os já escolhidos
+# viram opções, em vez da lista inteira de estabelecimentos
+try:
+    indice_estabelecimentos = get_establishment_index(load_data_version())
+except LookupError:
+    indice_estabelecimentos = None
+
+estabelecimentos_selecionados = st.session_state.get('estabelecimentos', [])
+opcoes_estabelecimentos = list(estabelecimentos_selecionados)
+if indice_estabelecimentos is not None:
+    busca_estabelecimento = st.sidebar.text_input(
+        "Buscar estabelecimento",
+        placeholder="Nome fantasia ou CNES",
+        key="busca_estabelecimento"
+    )
+    encontrados = indice_estabelecimentos.search(busca_estabelecimento)['id_cnes'].tolist()
+    opcoes_estabelecimentos += [c for c in encontrados if c not in opcoes_estabelecimentos]
+
+# Os filtros só são aplicados no envio do formulário: ajustar vários campos
+# não dispara uma consulta a cada interação
+with st.sidebar.form("filtros"):
+    # Filtro de Período
+    col_data = st.columns(2)
+    with col_data[0]:
+        data_inicio_filtro = st.date_input(
+            "Data Início",
+            value=datetime(2024, 1, 1),
+            key="data_inicio"
+        )
+    with col_data[1]:
+        data_fim_filtro = st.date_input(
+            "Data Fim",
+            value=datetime(2024, 1, 31),
+            key="data_fim"
+        )
 
-# Filtro de Dose
-doses_selecionadas = st.sidebar.multiselect(
-    "Tipo de Dose",
-    options=doses_lista,
-    default=[]
-)
+    municipios_selecionados = st.multiselect(
+        "Município",
+        options=municipios_filtrados,
+        default=[]
+    )
 
-# Filtro de Vacina
-vacinas_selecionadas = st.sidebar.multiselect(
-    "Vacina",
-    options = vacinas_lista,
-    default=[]
-)
+    # UF de residência do paciente: com shards, só os shards dessas UFs são consultados
+    ufs_selecionadas = st.multiselect(
+        "UF de residência",
+        options=ufs_lista,
+        default=[]
+    )
 
-# ============= CARREGAMENTO DE DADOS =============
-st.title("💉 Dashboard de Vacinação")
-st.markdown("---")
+    # Filtro de Dose
+    doses_selecionadas = st.multiselect(
+        "Tipo de Dose",
+        options=doses_lista,
+        default=[]
+    )
 
-with st.spinner("Carregando dados do banco..."):
-    df = load_dashboard_data(
-        data_inicio_filtro,
-        data_fim_filtro,
-        municipios_selecionados,
-        doses_selecionadas,
-        vacinas_selecionadas
+    # Filtro de Vacina
+    vacinas_selecionadas = st.multiselect(
+        "Vacina",
+        options = vacinas_lista,
+        default=[]
     )
 
-if df.empty:
-    st.warning("❌ Nenhum dado encontrado com os filtros selecionados.")
-    st.stop()
+    # Filtro de Estabelecimento (opções vindas da busca acima)
+    estabelecimentos_selecionados = st.multiselect(
+        "Estabelecimento",
+        options=opcoes_estabelecimentos,
+        format_func=indice_estabelecimentos.label if indice_estabelecimentos is not None else str,
+        placeholder="Use a busca acima",
+        key="estabelecimentos"
+    )
 
-# ============= KPIs PRINCIPAIS =============
-st.subheader("📊 Indicadores Principais")
+    modo_aproximado = st.toggle(
+        "Modo aproximado",
+        help="Mostra antes uma estimativa calculada sobre a amostra estratificada; "
+             "o valor exato a substitui quando a consulta completa termina."
+    )
 
-kpi_cols = st.columns(4)
+    st.form_submit_button("Aplicar filtros", type="primary", width="stretch")
 
-with kpi_cols[0]:
-    total_doses = len(df)
-    st.metric(
-        "Total de Doses Aplicadas",
-        formatar_numero(total_doses)
-    )
+# ============= CARREGAMENTO DE DADOS =============
+st.title("💉 Dashboard de Vacinação")
+st.markdown("---")
 
-with kpi_cols[1]:
-    unique_patients = df['id_paciente'].nunique()
-    st.metric(
-        "Pacientes Vacinados",
-        formatar_numero(unique_patients)
-    )
+filtros = (data_inicio_filtro, data_fim_filtro, municipios_selecionados, doses_selecionadas, vacinas_selecionadas,
+           estabelecimentos_selecionados, ufs_selecionadas)
+chave_filtros = dashboard_key(
+    data_inicio_filtro, data_fim_filtro,
+    municipios=municipios_selecionados, doses=doses_selecionadas, vacinas=vacinas_selecionadas,
+    estabelecimentos=estabelecimentos_selecionados, ufs=ufs_selecionadas
+)[1:]
+
+# Cada seção tem sua própria consulta agregada; todas rodam em paralelo. Os
+# pedidos traduzem os filtros de dose e vacina em ids pelos dicionários (banco)
+pedidos = {}
+
+try:
+    # No modo aproximado as seções de contagem também pedem uma estimativa sobre a
+    # amostra, submetida antes das exatas e trocada por elas quando terminam
+    if modo_aproximado:
+        for nome in ESTIMAVEIS:
+            pedidos[f'~{nome}'] = sample_request(nome, chave_filtros, *filtros)
+
+    for nome in SECOES:
+        pedidos[nome] = section_request(nome, chave_filtros, *filtros)
+    chave_serie, loader_serie, granularidade = time_series_request(*filtros)
+except (QueryCancelled, Error) as e:
+    report_query_error(e, 'dicionários de doses e vacinas')
+    st.stop()
+pedidos['temporal'] = (chave_serie, loader_serie)
 
-with kpi_cols[2]:
-    average_age = df['idade'].mean() if df['idade'].notna().any() else 0
-    st.metric(
-        "Idade Média",
-        f"{average_age:.1f} anos" if average_age > 0 else "N/A"
-    )
+# ============= LAYOUT =============
+# Cada seção ocupa um espaço reservado que é preenchido quando seus dados chegam
+secoes = {}
 
-with kpi_cols[3]:
-    dose_reforco = len(df[df['dose_vacina'].str.contains('Única', na=False)])
-    st.metric(
-        "Doses Únicas",
-        formatar_numero(dose_reforco)
-    )
+st.subheader("📊 Indicadores Principais")
+secoes['kpis'] = st.empty()
 
 st.markdown("---")
 
 with st.container():
     st.subheader("Acompanhamento Temporal da Vacinação")
-    
-    dados_tempo = df.groupby([df['data_vacina'], 'dose_vacina']).size().reset_index(name='count')
-    dados_tempo = dados_tempo.dropna(subset=['data_vacina'])
-    
-    fig_tempo = px.line(
-        dados_tempo,
-        x='data_vacina',
-        y='count',
-        color='dose_vacina',
-        markers=True,
-        labels={'data_vacina': 'Data', 'count': 'Doses Aplicadas', 'dose_vacina': 'Tipo de Dose'}
-    )
-    fig_tempo.update_layout(hovermode='x unified', height=300)
-    st.plotly_chart(fig_tempo, width='stretch')
+    secoes['temporal'] = st.empty()
 
 # ============= GRÁFICOS PRINCIPAIS =============
 col1, col2 = st.columns(2)
 
-# Gráfico 1: Evolução Temporal
+# Gráfico 1: Pirâmide Etária
 with col1:
     st.subheader("Pirâmide Etária")
-    
-    df_idade = df[df['idade'].notna()].copy()
-    
-    if not df_idade.empty:
-        df_idade['grupo_idade'] = pd.cut(df_idade['idade'], 
-                                         bins=[0, 10, 20, 30, 40, 50, 60, 70, 80, 100],
-                                         labels=['0-10', '10-20', '20-30', '30-40', '40-50', '50-60', '60-70', '70-80', '80+'])
-        
-        piramide = df_idade.groupby(['grupo_idade', 'sexo']).size().unstack(fill_value=0)
-        
-        if 'M' in piramide.columns:
-            piramide['M'] = -piramide['M']
-        
-        fig_piramide = go.Figure()
-        
-        for col in piramide.columns:
-            color = 'steelblue' if col == 'M' else 'lightcoral'
-            fig_piramide.add_trace(go.Bar(
-                y=piramide.index,
-                x=piramide[col],
-                name=col,
-                orientation='h',
-                marker_color=color
-            ))
-        
-        fig_piramide.update_layout(barmode='relative', height=400, xaxis_title='Quantidade')
-        st.plotly_chart(fig_piramide, width='stretch')
-    else:
-        st.info("Sem dados de idade")
+    secoes['piramide'] = st.empty()
 
 # Gráfico 2: Doses por Vacina
 with col2:
     st.subheader("Doses Aplicadas por Vacina")
-    
-    dados_vacina = df['vacina_nome'].value_counts().head(10).reset_index()
-    dados_vacina.columns = ['vacina_nome', 'count']
-    
-    fig_vacina = px.bar(
-        dados_vacina,
-        x='count',
-        y='vacina_nome',
-        orientation='h',
-        labels={'count': 'Total de Doses', 'vacina_nome': 'Vacina'},
-        color='count',
-        color_continuous_scale='Blues'
-    )
-    fig_vacina.update_layout(height=400, showlegend=False)
-    st.plotly_chart(fig_vacina, width='stretch')
+    secoes['vacinas'] = st.empty()
 
 # ============= LINHA DE GRÁFICOS 2 =============
 col3, col4 = st.columns(2)
@@ -216,70 +198,19 @@ col3, col4 = st.columns(2)
 # Gráfico 3: Distribuição por Estratégia
 with col3:
     st.subheader("Distribuição por Estratégia de Vacinação")
-    
-    dados_estrategia = df['estrategia_descricao'].value_counts().reset_index()
-    dados_estrategia.columns = ['estrategia', 'count']
-    dados_estrategia = dados_estrategia[dados_estrategia['estrategia'].notna()]
-    
-    if not dados_estrategia.empty:
-        fig_estrategia = px.pie(
-            dados_estrategia,
-            values='count',
-            names='estrategia',
-            hole=0.3
-        )
-        fig_estrategia.update_layout(height=400)
-        st.plotly_chart(fig_estrategia, width='stretch')
-    else:
-        st.info("Sem dados de estratégia")
+    secoes['estrategias'] = st.empty()
 
 # Gráfico 4: Distribuição por Raça/Cor
 with col4:
     st.subheader("Distribuição por Raça/Cor")
-    
-    dados_raca = df['raca_cor'].value_counts().reset_index()
-    dados_raca.columns = ['raca_cor', 'count']
-    dados_raca = dados_raca[dados_raca['raca_cor'].notna()]
-    
-    if not dados_raca.empty:
-        fig_raca = px.bar(
-            dados_raca,
-            x='raca_cor',
-            y='count',
-            labels={'count': 'Total de Doses', 'raca_cor': 'Raça/Cor'},
-            color='count',
-            color_continuous_scale='Viridis'
-        )
-        fig_raca.update_layout(height=400, showlegend=False)
-        st.plotly_chart(fig_raca, width='stretch')
-    else:
-        st.info("Sem dados de raça/cor")
+    secoes['racas'] = st.empty()
 
 # ============= LINHA DE GRÁFICOS 3 =============
 
 # Gráfico 6: Ranking de Estabelecimentos
 with st.container():
     st.subheader("Ranking de Estabelecimentos")
-    
-    top_estab = df['estabelecimento_nome'].value_counts().head(10).reset_index()
-    top_estab.columns = ['estabelecimento', 'count']
-    top_estab = top_estab[top_estab['estabelecimento'].notna()]
-    
-    if not top_estab.empty:
-        fig_estab = px.bar(
-            top_estab,
-            x='count',
-            y='estabelecimento',
-            orientation='h',
-            labels={'count': 'Total de Doses', 'estabelecimento': 'Estabelecimento'},
-            color='count',
-            color_continuous_scale='Greens'
-        )
-        fig_estab.update_layout(height=400, showlegend=False)
-        st.plotly_chart(fig_estab, width='stretch')
-    else:
-        st.info("Sem dados de estabelecimento")
-
+    secoes['estabelecimentos'] = st.empty()
 
 # ============= TABELAS DETALHADAS =============
 st.markdown("---")
@@ -289,68 +220,200 @@ tab1, tab2, tab3= st.tabs(["Doses Por Tipo", "Últimas Aplicações", "Resumo po
 
 with tab1:
     st.write("**Distribuição de Doses por Tipo**")
-    resumo_doses = df.groupby('dose_vacina').agg({
-        'id_paciente': 'nunique',
-        'id_aplicacao': 'count'
-    }).reset_index()
-    resumo_doses.columns = ['Tipo de Dose', 'Pacientes', 'Total de Doses']
-    resumo_doses = resumo_doses[resumo_doses['Tipo de Dose'].notna()]
-    resumo_doses = resumo_doses.sort_values('Total de Doses', ascending=False)
-    st.dataframe(resumo_doses, width='stretch', hide_index=True)
+    secoes['doses'] = st.empty()
 
 with tab2:
     st.write("**Últimas 50 Aplicações de Vacina**")
-    ultimas = df.sort_values('data_vacina', ascending=False).head(50)[[
-        'data_vacina', 'vacina_nome', 'dose_vacina', 'idade', 'sexo', 'paciente_municipio', 'estabelecimento_nome'
-    ]].copy()
-    ultimas['data_vacina'] = pd.to_datetime(ultimas['data_vacina']).dt.strftime('%d/%m/%Y')
-    st.dataframe(ultimas, width='stretch', hide_index=True)
+    secoes['ultimas'] = st.empty()
 
 with tab3:
     st.write("**Resumo de Vacinação por Município**")
-    resumo_municipio = df.groupby('paciente_municipio').agg({
-        'id_paciente': 'nunique',
-        'id_aplicacao': 'count'
-    }).reset_index()
-    resumo_municipio.columns = ['Município', 'Pacientes Únicos', 'Total de Doses']
-    resumo_municipio = resumo_municipio[resumo_municipio['Município'].notna()]
-    resumo_municipio = resumo_municipio.sort_values('Total de Doses', ascending=False)
-    st.dataframe(resumo_municipio, width='stretch', hide_index=True)
+    secoes['municipios'] = st.empty()
 
+for espaco in secoes.values():
+    espaco.caption("⏳ Carregando...")
+
+# ============= RENDERIZAÇÃO =============
+def render_kpis(dados):
+    kpis = dados.iloc[0]
+    total_doses = int(kpis['total_doses'] or 0)
+    if total_doses == 0:
+        return False
+
+    kpi_cols = st.columns(4)
+
+    with kpi_cols[0]:
+        st.metric(
+            "Total de Doses Aplicadas",
+            formatar_numero(total_doses)
+        )
+
+    with kpi_cols[1]:
+        st.metric(
+            "Pacientes Vacinados",
+            formatar_numero(kpis['pacientes'])
+        )
+
+    with kpi_cols[2]:
+        average_age = float(kpis['idade_media']) if pd.notna(kpis['idade_media']) else 0
+        st.metric(
+            "Idade Média",
+            f"{average_age:.1f} anos" if average_age > 0 else "N/A"
+        )
+
+    with kpi_cols[3]:
+        st.metric(
+            "Doses Únicas",
+            formatar_numero(kpis['doses_unicas'] or 0)
+        )
+    return True
+
+def render_temporal(dados):
+    st.caption(f"Doses agregadas por {granularidade}")
+    st.plotly_chart(fig_temporal(dados), width='stretch')
+
+def render_tabela(dados):
+    st.dataframe(dados, width='stretch', hide_index=True)
+
+def render_municipios(dados):
+    # folium só é carregado quando a aba é renderizada
+    from streamlit_folium import st_folium
+    from utils.mapa import choropleth, get_geometries
+
+    try:
+        mapa, tolerancia, sem_geometria = choropleth(dados, get_geometries())
+    except LookupError as erro:
+        st.caption(f"Mapa indisponível: {erro}")
+        mapa = None
+    if mapa is not None:
+        # Sem objetos de retorno o mapa não reexecuta a página a cada movimento
+        st_folium(mapa, height=450, use_container_width=True, returned_objects=[], key="mapa_municipios")
+        aviso = f" — {len(sem_geometria)} municípios sem geometria" if sem_geometria else ""
+        st.caption(f"Contornos simplificados com tolerância de {tolerancia}°{aviso}")
+    render_tabela(dados)
+
+def grafico(fig_fn):
+    return lambda dados, key=None: st.plotly_chart(fig_fn(dados), width='stretch', key=key)
+
+# (função de renderização, mensagem quando não há dados)
+RENDERIZACAO = {
+    'temporal': (render_temporal, "Sem dados no período"),
+    'piramide': (grafico(fig_piramide), "Sem dados de idade"),
+    'vacinas': (grafico(fig_vacinas), "Sem dados de vacina"),
+    'estrategias': (grafico(fig_estrategias), "Sem dados de estratégia"),
+    'racas': (grafico(fig_racas), "Sem dados de raça/cor"),
+    'estabelecimentos': (grafico(fig_estabelecimentos), "Sem dados de estabelecimento"),
+    'doses': (render_tabela, "Sem dados de dose"),
+    'ultimas': (lambda d: render_tabela(tabela_ultimas(d)), "Sem aplicações no período"),
+    'municipios': (render_municipios, "Sem dados de município"),
+}
+
+exatas = set()
+with closing(stream_results(pedidos)) as resultados:
+    for nome, dados, erro in resultados:
+        estimativa = nome.startswith('~')
+        nome = nome.lstrip('~')
+        espaco = secoes[nome]
+        if estimativa:
+            # Estimativa atrasada (já há o exato) ou fora do orçamento: ignorada
+            if nome in exatas or erro is not None or dados.empty:
+                continue
+            render, _ = RENDERIZACAO[nome]
+            with espaco.container():
+                st.caption("≈ Estimativa por amostragem (IC 95%) — será substituída pelo valor exato")
+                render(dados, key=f'estimativa_{nome}')
+            continue
+        exatas.add(nome)
+
+        if erro is not None:
+            with espaco.container():
+                report_query_error(erro, pedidos[nome][0][0])
+            continue
+
+        if nome == 'kpis':
+            with espaco.container():
+                tem_dados = render_kpis(dados)
+            if not tem_dados:
+                for outro in secoes.values():
+                    outro.empty()
+                st.warning("❌ Nenhum dado encontrado com os filtros selecionados.")
+                st.stop()
+            continue
+
+        render, mensagem_vazia = RENDERIZACAO[nome]
+        with espaco.container():
+            if dados.empty:
+                st.info(mensagem_vazia)
+            else:
+                render(dados)
+
+
+# ============= EXPORTAÇÃO =============
+def run_export(formato):
+    """Grava as linhas filtradas num arquivo temporário, com progresso; retorna o caminho ou None.
+
+    Qualquer interação (inclusive o botão Cancelar) reexecuta a página e
+    interrompe a exportação: a consulta é cancelada e o arquivo parcial apagado.
+    """
+    # pyarrow só é carregado quando alguém exporta
+    from utils.exportacao import count_query, export_rows, export_query, new_export_file
+
+    contagem = execute_query(*count_query(*filtros), prioridade=PESADA)
+    esperado = int(contagem['linhas'].iloc[0]) if not contagem.empty else 0
+    caminho = new_export_file(formato)
+
+    progresso = st.progress(0.0, text="Exportando...")
+    st.button("Cancelar", key="cancelar_exportacao")
+    handle = query_handle(PESADA)
+    query, params = export_query(*filtros)
+    concluido = False
+    try:
+        with closing(export_rows(query, params, caminho, formato, handle)) as gravadas:
+            for linhas in gravadas:
+                progresso.progress(min(linhas / max(esperado, 1), 1.0),
+                                   text=f"{formatar_numero(linhas)} de {formatar_numero(esperado)} linhas")
+        concluido = True
+    except (QueryCancelled, Error) as e:
+        report_query_error(e, query)
+    finally:
+        if not concluido:
+            handle.cancel()
+            os.remove(caminho)
+    progresso.empty()
+    return caminho if concluido else None
+
+with st.expander("📥 Exportar linhas filtradas"):
+    st.caption("Todas as aplicações do período e dos filtros aplicados, uma por linha, com as colunas de detalhe.")
+    formato_exportacao = st.radio("Formato", ['csv', 'parquet'], horizontal=True, key="formato_exportacao",
+                                  format_func={'csv': 'CSV (gzip)', 'parquet': 'Parquet'}.get)
+    exportacao = st.session_state.get('_exportacao')
+    if st.button("Gerar arquivo", key="exportar"):
+        caminho = run_export(formato_exportacao)
+        if caminho is not None:
+            # Só o último arquivo da sessão é mantido
+            if exportacao and os.path.exists(exportacao['caminho']):
+                os.remove(exportacao['caminho'])
+            exportacao = st.session_state['_exportacao'] = {
+                'caminho': caminho, 'formato': formato_exportacao, 'filtros': chave_filtros,
+            }
+    if exportacao and exportacao['filtros'] == chave_filtros and os.path.exists(exportacao['caminho']):
+        from utils.exportacao import FORMATOS
+
+        extensao, mime = FORMATOS[exportacao['formato']]
+        st.download_button(
+            f"Baixar {os.path.getsize(exportacao['caminho']) / 2**20:,.1f} MB",
+            # Bytes, não o arquivo aberto: o Streamlit fixado (1.51) não aceita função em `data` e copia o conteúdo
+            # para o servidor de mídia a cada execução de qualquer forma
+            data=Path(exportacao['caminho']).read_bytes(),
+            file_name=f"aplicacoes_{data_inicio_filtro}_{data_fim_filtro}{extensao}",
+            mime=mime, key="baixar_exportacao",
+        )
 
 on = st.sidebar.toggle("Mostrar consulta", key="filtros_toggle")
 if on:
-    st.code("""
-    SELECT 
-        ad.id_aplicacao,
-        ad.data_vacina,
-        ad.dose_vacina,
-        ad.local_aplicacao,
-        ad.via_administracao,
-        ad.lote_vacina,
-        ad.cnes,
-        ad.id_vacina,
-        ad.id_paciente,
-        ad.id_estrategia_vacinacao,
-        p.sexo,
-        p.municipio AS paciente_municipio,
-        p.uf,
-        p.idade,
-        p.raca_cor,
-        v.nome AS vacina_nome,
-        e.nome_fantasia AS estabelecimento_nome,
-        e.municipio AS estabelecimento_municipio,
-        e.tipo AS estabelecimento_tipo,
-        e.latitude,
-        e.longitude,
-        ev.descricao AS estrategia_descricao
-    FROM AplicacaoDose ad
-    LEFT JOIN Paciente p ON ad.id_paciente = p.id_paciente
-    LEFT JOIN Vacina v ON ad.id_vacina = v.id
-    LEFT JOIN Estabelecimento e ON ad.cnes = e.id_cnes
-    LEFT JOIN EstrategiaVacinacao ev ON ad.id_estrategia_vacinacao = ev.id
-    WHERE data_vacina BETWEEN %s AND %s
-    """, language='sql')
+    for nome in SECOES:
+        with st.expander(f"Consulta: {nome}"):
+            st.code(section_query(nome, *filtros)[0], language='sql')
 
 # ============= RODAPÉ =============
 st.markdown("---")
@@ -1,10 +1,9 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import mysql.connector
-from mysql.connector import Error
 from datetime import datetime
 from utils.db_functions import *
+from utils.figuras import cached_figure
+from utils.estatisticas import CONSULTAS, load_statistic
 
 st.logo('https://ic.ufrj.br/svg/logo-ic.svg')
 
@@ -28,51 +27,65 @@ st.subheader("Indicadores Principais")
 kpi_cols = st.columns(4)
 
 with kpi_cols[0]:
-    total_doses = execute_query('SELECT COUNT(*) as total_doses FROM AplicacaoDose')['total_doses'][0]
+    total_doses = load_statistic('total_doses')['total_doses'][0]
     st.metric(
         "Total de Doses Aplicadas",
         formatar_numero(total_doses)
     )
 
 with kpi_cols[1]:
-    unique_patients = execute_query('SELECT COUNT(DISTINCT id_paciente) as unique_patients FROM AplicacaoDose')['unique_patients'][0]
+    unique_patients = load_statistic('pacientes_vacinados')['unique_patients'][0]
     st.metric(
         "Pacientes Vacinados",
         formatar_numero(unique_patients)
     )
 
 with kpi_cols[2]:
-    average_age = execute_query('SELECT AVG(idade) as average_age FROM Paciente')['average_age'][0]
+    average_age = load_statistic('idade_media')['average_age'][0]
     st.metric(
         "Idade Média",
         f"{average_age:.1f} anos" if average_age > 0 else "N/A"
     )
 
 with kpi_cols[3]:
-    unique_doses = execute_query('SELECT COUNT(id_aplicacao) as unique_doses FROM AplicacaoDose WHERE dose_vacina LIKE "%Única%"')['unique_doses'][0]
+    unique_doses = load_statistic('doses_unicas')['unique_doses'][0]
     st.metric(
         "Doses únicas",
         formatar_numero(unique_doses)
     )
+
+# Os gráficos abaixo são servidos do cache de figuras enquanto os dados não mudam
+try:
+    versao_dados = load_data_version()
+except LookupError as erro:
+    st.error(f"❌ {erro}")
+    st.stop()
+
+def desenhar_top_vacinas(fig, dados):
+    ax = fig.subplots()
+    ax.bar(range(len(dados)), dados['Vezes_Utilizada'], color='steelblue')
+    ax.set_xticks(range(len(dados)))
+    ax.set_xticklabels(dados['Nome_Vacina'], rotation=45, ha='right')
+    ax.set_ylabel('Aplicações')
+
+def desenhar_idosos_municipio(fig, dados):
+    ax = fig.subplots()
+    ax.bar(range(len(dados)), dados['Total_Idosos_Vacinados'], color='skyblue')
+    ax.set_xticks(range(len(dados)))
+    ax.set_xticklabels(dados['Municipio'], rotation=30, ha='right')
+    ax.set_ylabel('Idosos Vacinados')
+
+def desenhar_vacinas_idosos(fig, dados):
+    ax = fig.subplots()
+    ax.barh(dados['Nome_Vacina'], dados['Total_Doses'], color='lightcoral')
+    ax.set_xlabel('Doses Aplicadas')
+    ax.tick_params(axis='y', labelsize=8)
+
 st.divider()
 st.subheader("Vacinas com mais aplicações")
 
-query1 = """
-    SELECT
-        V.nome AS Nome_Vacina,
-        COUNT(A.id_aplicacao) AS Vezes_Utilizada
-    FROM
-        vacinacao.Vacina V
-    LEFT JOIN
-        vacinacao.AplicacaoDose A ON V.id = A.id_vacina
-    GROUP BY
-        V.nome
-    ORDER BY
-        Vezes_Utilizada DESC
-    LIMIT 10;
-"""
-
-df1 = execute_query(query1)
+query1 = CONSULTAS['top_vacinas']
+
 col1, col2 = st.columns([1,1])
 with col1:
     st.markdown("""
@@ -89,52 +102,20 @@ with col1:
         st.code(query1, language='sql')
 
 with col2:
-    if df1 is not None:
-        fig, ax = plt.subplots(figsize=(15, 6))
-        ax.bar(range(len(df1)), df1['Vezes_Utilizada'], color='steelblue')
-        ax.set_xticks(range(len(df1)))
-        ax.set_xticklabels(df1['Nome_Vacina'], rotation=45, ha='right')
-        ax.set_ylabel('Aplicações')
-        plt.tight_layout()
-        st.pyplot(fig, width='stretch')
+    imagem = cached_figure('top_vacinas', versao_dados, (15, 6), lambda: load_statistic('top_vacinas'), desenhar_top_vacinas)
+    if imagem is not None:
+        st.image(imagem, width='stretch')
 
 st.divider()
 st.subheader("Estabelecimentos com Aplicações Acima da Média")
 col1, col2 = st.columns(2)
 
-query3 = """
-    SELECT
-        E.nome_fantasia,
-        COUNT(A.id_aplicacao) AS Total_Aplicacoes
-    FROM
-        vacinacao.Estabelecimento E
-    JOIN
-        vacinacao.AplicacaoDose A ON E.id_cnes = A.cnes
-    GROUP BY
-        E.nome_fantasia
-    HAVING
-        COUNT(A.id_aplicacao) > (
-            SELECT COUNT(*) / COUNT(DISTINCT cnes)
-            FROM vacinacao.AplicacaoDose ad
-        )
-    ORDER BY
-        Total_Aplicacoes DESC
-    LIMIT 10;
-"""
-df_q3 = execute_query(query3)
-
-
-query7 = """
-        SELECT 
-            e.id_cnes,
-            e.latitude,
-            e.longitude,
-            COUNT(A.id_aplicacao) AS total
-        FROM vacinacao.AplicacaoDose A
-        INNER JOIN vacinacao.Estabelecimento e ON A.cnes = e.id_cnes
-        GROUP BY e.id_cnes, e.latitude, e.longitude
-        """
-df_q7 = execute_query(query7)
+query3 = CONSULTAS['estabelecimentos_acima_media']
+df_q3 = load_statistic('estabelecimentos_acima_media')
+
+
+query7 = CONSULTAS['aplicacoes_por_estabelecimento']
+df_q7 = load_statistic('aplicacoes_por_estabelecimento')
 
 with col2:
     st.map(df_q7.dropna(), zoom=7, width=1000, height=400, size='total', color="#0084ffdd")
@@ -156,35 +137,11 @@ col1, col2 = st.columns(2)
 with col1:
     st.markdown("### Municípios - Aplicações em Idosos (>60 anos)")
 
-    query4 = """
-        SELECT
-            E.municipio AS Municipio,
-            COUNT(A.id_aplicacao) AS Total_Idosos_Vacinados
-        FROM vacinacao.AplicacaoDose A
-        INNER JOIN
-            vacinacao.Estabelecimento E ON A.cnes = E.id_cnes
-        WHERE
-            A.id_paciente IN (
-                SELECT id_paciente
-                FROM vacinacao.Paciente
-                WHERE idade > 60
-            )
-        GROUP BY
-            E.municipio
-        ORDER BY
-            Total_Idosos_Vacinados DESC
-        LIMIT 10;
-    """
-
-    df_q4 = execute_query(query4)
-    if df_q4 is not None:
-        fig, ax = plt.subplots(figsize=(10, 7))
-        ax.bar(range(len(df_q4)), df_q4['Total_Idosos_Vacinados'], color='skyblue')
-        ax.set_xticks(range(len(df_q4)))
-        ax.set_xticklabels(df_q4['Municipio'], rotation=30, ha='right')
-        ax.set_ylabel('Idosos Vacinados')
-        plt.tight_layout()
-        st.pyplot(fig, width='content')
+    query4 = CONSULTAS['idosos_municipio']
+
+    imagem = cached_figure('idosos_municipio', versao_dados, (10, 7), lambda: load_statistic('idosos_municipio'), desenhar_idosos_municipio)
+    if imagem is not None:
+        st.image(imagem, width='content')
     
     if on:
         st.markdown('#### Consulta utilizada')
@@ -194,36 +151,11 @@ with col1:
 with col2:
     st.subheader("Vacinas Mais Aplicadas em Idosos (60+)")
 
-    query5 = """
-        SELECT
-            V.nome AS Nome_Vacina,
-            COUNT(A.id_aplicacao) AS Total_Doses
-        FROM
-            vacinacao.AplicacaoDose A
-        INNER JOIN
-            vacinacao.Vacina V ON A.id_vacina = V.id
-        WHERE
-            A.id_paciente IN (
-                SELECT id_paciente
-                FROM vacinacao.Paciente
-                WHERE idade > 60
-            )
-            AND V.nome <> 'SEM INFORMAÇÃO'
-        GROUP BY
-            V.nome
-        ORDER BY
-            Total_Doses DESC
-        LIMIT 5;
-    """
-
-    df_q5 = execute_query(query5)
-    if df_q5 is not None:
-        fig, ax = plt.subplots(figsize=(10, 6.5))
-        ax.barh(df_q5['Nome_Vacina'], df_q5['Total_Doses'], color='lightcoral')
-        ax.set_xlabel('Doses Aplicadas')
-        ax.tick_params(axis='y', labelsize=8)
-        plt.tight_layout()
-        st.pyplot(fig, width='content')
+    query5 = CONSULTAS['vacinas_idosos']
+
+    imagem = cached_figure('vacinas_idosos', versao_dados, (10, 6.5), lambda: load_statistic('vacinas_idosos'), desenhar_vacinas_idosos)
+    if imagem is not None:
+        st.image(imagem, width='content')
     
     if on:
         st.markdown('#### Consulta utilizada')
@@ -233,30 +165,11 @@ with col2:
 st.divider()
 st.markdown('## Aplicação do Paciente Mais Velho')
 
-query6 = """
-    SELECT 
-        P.id_paciente,
-        P.idade,
-        P.municipio AS Municipio_Residencia,
-        A.data_vacina,
-        A.dose_vacina,
-        V.nome AS Vacina_Aplicada,
-        E.nome_fantasia AS Local_Aplicacao
-    FROM 
-        vacinacao.AplicacaoDose  A
-    INNER JOIN 
-        vacinacao.Paciente P ON A.id_paciente = P.id_paciente
-    INNER JOIN 
-        vacinacao.Vacina V ON A.id_vacina = V.id
-    INNER JOIN 
-        vacinacao.Estabelecimento E ON A.cnes = E.id_cnes
-    WHERE 
-        P.idade = (SELECT MAX(idade) FROM vacinacao.Paciente);
-"""
+query6 = CONSULTAS['paciente_mais_velho']
 col1, col2 = st.columns([1,1])
 
 with col1:
-    patient_id, idade, municipio, data, dose, vacina, unidade = execute_query(query6).loc[0].to_list()
+    patient_id, idade, municipio, data, dose, vacina, unidade = load_statistic('paciente_mais_velho').loc[0].to_list()
     st.markdown(f"""
     No dia **{pd.to_datetime(data).strftime('%d/%m/%Y')}**, o paciente de ID `{patient_id}` com **{idade} anos** recebeu a **{dose}** da 
     **{vacina}** na **{unidade}** no município de **{municipio}**""")
@@ -273,22 +186,8 @@ with col2:
 st.divider()
 st.subheader("Vacinas Fabricadas no Brasil")
     
-query7 = """
-SELECT 
-    V.nome AS Nome_Vacina,
-    F.nome AS Nome_Fabricante
-FROM 
-    vacinacao.Vacina V
-INNER JOIN 
-    vacinacao.fabrica FAB ON V.id = FAB.id_vacina
-INNER JOIN 
-    vacinacao.Fabricante F ON FAB.id_fabricante = F.id
-WHERE 
-    (F.nome LIKE '%OSWALDO CRUZ%' OR F.nome LIKE '%BUTANTAN%')
-    AND V.nome NOT LIKE '%SEM INFORMAÇÃO%'
-ORDER BY F.nome, V.nome;
-"""
-df_q7 = execute_query(query7)
+query7 = CONSULTAS['vacinas_nacionais']
+df_q7 = load_statistic('vacinas_nacionais')
 
 
 col1, col2 = st.columns([1, 1])
@@ -0,0 +1,108 @@
+import streamlit as st
+import plotly.express as px
+from datetime import datetime
+from utils.db_functions import *
+from utils.sequencias import completion_query, completion_rates, interval_query
+
+# ============= CONFIGURAÇÃO DA PÁGINA =============
+st.set_page_config(
+    page_title="Completude de Esquemas",
+    page_icon="💉",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+st.logo('https://ic.ufrj.br/svg/logo-ic.svg')
+
+st.sidebar.header("Filtros")
+
+try:
+    vacinas_lista = sorted(load_dictionary('Vacina', 'nome'))
+    doses_lista = sorted(load_dictionary('DoseVacina'))
+    municipios_lista = sorted(load_dictionary('Municipio', 'nome'))
+except (QueryCancelled, Error) as e:
+    report_query_error(e, 'dicionários de vacinas, doses e municípios')
+    st.stop()
+
+def _indice(opcoes, valor, padrao=0):
+    return opcoes.index(valor) if valor in opcoes else padrao
+
+with st.sidebar.form("filtros_sequencia"):
+    col_data = st.columns(2)
+    with col_data[0]:
+        data_inicio = st.date_input("Data Início", value=datetime(2024, 1, 1), key="seq_inicio")
+    with col_data[1]:
+        data_fim = st.date_input("Data Fim", value=datetime(2024, 12, 31), key="seq_fim")
+
+    vacinas = st.multiselect("Vacina", options=vacinas_lista, default=[])
+    municipios = st.multiselect("Município de residência", options=municipios_lista, default=[])
+
+    dose_origem = st.selectbox("Dose de origem", doses_lista, index=_indice(doses_lista, '1ª Dose'))
+    dose_destino = st.selectbox("Dose seguinte", doses_lista, index=_indice(doses_lista, '2ª Dose', min(1, len(doses_lista) - 1)))
+    dias_min, dias_max = st.slider("Intervalo recomendado (dias)", 0, 365, (30, 90))
+
+    st.form_submit_button("Aplicar filtros", type="primary", width="stretch")
+
+st.title("💉 Completude de Esquemas Vacinais")
+st.caption(
+    f"Pacientes que tomaram a **{dose_origem}** entre {data_inicio:%d/%m/%Y} e {data_fim:%d/%m/%Y} e cuja aplicação "
+    f"seguinte da mesma vacina foi a **{dose_destino}**. Períodos recentes ainda não tiveram tempo de completar o esquema."
+)
+st.markdown("---")
+
+filtros = (data_inicio, data_fim, vacinas, municipios, dose_origem, dose_destino)
+dados = execute_query(*completion_query(*filtros, dias_min, dias_max))
+if dados.empty:
+    st.warning("❌ Nenhuma aplicação da dose de origem com os filtros selecionados.")
+    st.stop()
+
+# ============= INDICADORES =============
+total = completion_rates(dados.assign(todos=''), 'todos').iloc[0]
+kpi_cols = st.columns(3)
+with kpi_cols[0]:
+    st.metric(f"Pacientes com {dose_origem}", formatar_numero(total['iniciaram']))
+with kpi_cols[1]:
+    st.metric(f"Seguiram para {dose_destino}", f"{total['taxa_conclusao']:.1%}")
+with kpi_cols[2]:
+    st.metric(f"No intervalo de {dias_min} a {dias_max} dias", f"{total['taxa_no_prazo']:.1%}")
+
+st.markdown("---")
+
+col1, col2 = st.columns(2)
+
+with col1:
+    st.subheader("Conclusão por Vacina")
+    por_vacina = completion_rates(dados, 'vacina').head(15)
+    fig = px.bar(
+        por_vacina.melt(id_vars='vacina', value_vars=['taxa_conclusao', 'taxa_no_prazo'],
+                        var_name='taxa', value_name='valor'),
+        x='valor', y='vacina', color='taxa', barmode='group', orientation='h',
+        labels={'valor': 'Pacientes', 'vacina': ''},
+    )
+    fig.for_each_trace(lambda t: t.update(name={'taxa_conclusao': 'Completaram', 'taxa_no_prazo': 'No prazo'}[t.name]))
+    fig.update_layout(xaxis_tickformat='.0%', legend_title_text='', yaxis={'autorange': 'reversed'})
+    st.plotly_chart(fig, width='stretch')
+
+with col2:
+    st.subheader(f"Intervalo até a {dose_destino}")
+    intervalos = execute_query(*interval_query(*filtros))
+    if intervalos.empty:
+        st.info("Nenhum paciente seguiu para a dose de destino")
+    else:
+        fig = px.bar(intervalos, x='semanas', y='count', color='vacina',
+                     labels={'semanas': 'Semanas após a dose de origem', 'count': 'Pacientes', 'vacina': 'Vacina'})
+        fig.add_vrect(x0=dias_min / 7, x1=dias_max / 7, fillcolor='green', opacity=0.1, line_width=0)
+        st.plotly_chart(fig, width='stretch')
+
+st.subheader("Detalhamento por Município")
+tabela = completion_rates(dados, ['municipio', 'vacina'])
+st.dataframe(
+    tabela.rename(columns={'municipio': 'Município', 'vacina': 'Vacina', 'iniciaram': 'Iniciaram',
+                           'completaram': 'Completaram', 'no_prazo': 'No prazo',
+                           'taxa_conclusao': '% Completaram', 'taxa_no_prazo': '% No prazo'}),
+    width='stretch', hide_index=True,
+    column_config={
+        '% Completaram': st.column_config.ProgressColumn(format='percent', min_value=0, max_value=1),
+        '% No prazo': st.column_config.ProgressColumn(format='percent', min_value=0, max_value=1),
+    },
+)
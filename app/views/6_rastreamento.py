@@ -0,0 +1,64 @@
+import streamlit as st
+from utils.db_functions import *
+from utils.rastreamento import (CHAVE_LOTE, CHAVE_PACIENTE, POR_PAGINA, history_page_query, lot_ids_query,
+                                lot_page_query, parse_lots, split_page)
+
+# ============= CONFIGURAÇÃO DA PÁGINA =============
+st.set_page_config(
+    page_title="Rastreamento",
+    page_icon="💉",
+    layout="wide",
+)
+
+st.logo('https://ic.ufrj.br/svg/logo-ic.svg')
+
+st.title("🔎 Rastreamento de Lotes e Pacientes")
+st.markdown("---")
+
+def paginated(nome, consulta, chave, montar):
+    """Mostra uma página do resultado com os botões de navegação.
+
+    As chaves de início de cada página visitada ficam na sessão (keyset);
+    mudar a `consulta` volta para a primeira página.
+    """
+    estado = st.session_state.setdefault(f'_paginas_{nome}', {'consulta': None, 'inicios': [None]})
+    if estado['consulta'] != consulta:
+        estado.update(consulta=consulta, inicios=[None])
+
+    query, params = montar(estado['inicios'][-1])
+    pagina, proxima = split_page(execute_query(query, params, slot=nome), chave)
+    if pagina.empty:
+        st.info("Nenhuma aplicação encontrada")
+        return
+
+    numero = len(estado['inicios'])
+    st.caption(f"Página {numero} — aplicações {(numero - 1) * POR_PAGINA + 1} a {(numero - 1) * POR_PAGINA + len(pagina)}")
+    st.dataframe(pagina.drop(columns=['id_lote']), width='stretch', hide_index=True)
+
+    col_ant, col_prox, _ = st.columns([1, 1, 6])
+    if col_ant.button("◀ Anterior", key=f'anterior_{nome}', disabled=numero == 1):
+        estado['inicios'].pop()
+        st.rerun()
+    if col_prox.button("Próxima ▶", key=f'proxima_{nome}', disabled=proxima is None):
+        estado['inicios'].append(proxima)
+        st.rerun()
+
+tab_lote, tab_paciente = st.tabs(["Recolhimento de lote", "Histórico do paciente"])
+
+with tab_lote:
+    texto = st.text_area("Códigos de lote", placeholder="Um por linha ou separados por vírgula", key="lotes")
+    codigos = parse_lots(texto)
+    if codigos:
+        lotes = execute_query(*lot_ids_query(codigos))
+        encontrados = set(lotes['codigo']) if not lotes.empty else set()
+        ausentes = [c for c in codigos if c not in encontrados]
+        if ausentes:
+            st.warning(f"Lotes não cadastrados: {', '.join(ausentes)}")
+        if encontrados:
+            ids = sorted(lotes['id'].tolist())
+            paginated('lote', tuple(ids), CHAVE_LOTE, lambda apos: lot_page_query(ids, apos))
+
+with tab_paciente:
+    id_paciente = st.text_input("Identificador do paciente (id_paciente)", key="paciente").strip()
+    if id_paciente:
+        paginated('paciente', id_paciente, CHAVE_PACIENTE, lambda apos: history_page_query(id_paciente, apos))
@@ -0,0 +1,64 @@
+import pandas as pd
+import streamlit as st
+from utils.db_functions import *
+from utils.espacial import JANELA_DIAS, get_site_index
+
+# ============= CONFIGURAÇÃO DA PÁGINA =============
+st.set_page_config(
+    page_title="Postos Próximos",
+    page_icon="💉",
+    layout="wide",
+)
+
+st.logo('https://ic.ufrj.br/svg/logo-ic.svg')
+
+st.title("📍 Postos de Vacinação Próximos")
+st.markdown("---")
+
+try:
+    indice = get_site_index(load_data_version())
+except LookupError as erro:
+    st.info(str(erro))
+    st.stop()
+
+col_origem, col_k, col_vacina = st.columns([2, 1, 2])
+with col_origem:
+    origem = st.radio("Origem", ["Município", "Coordenadas"], horizontal=True, key="origem")
+    if origem == "Município":
+        municipio = st.selectbox("Município", sorted(indice.sites['municipio'].dropna().unique()), key="municipio_origem")
+        ponto = indice.centroid(municipio)
+    else:
+        col_lat, col_lon = st.columns(2)
+        lat = col_lat.number_input("Latitude", -90.0, 90.0, value=-22.8625, format="%.5f", key="lat")
+        lon = col_lon.number_input("Longitude", -180.0, 180.0, value=-43.2230, format="%.5f", key="lon")
+        ponto = (lat, lon)
+with col_k:
+    k = st.slider("Quantidade", 1, 50, 10, key="k")
+with col_vacina:
+    vacinas = sorted({v for lista in indice.sites['vacinas'] for v in lista})
+    vacina = st.selectbox("Que aplica a vacina", [None] + vacinas, format_func=lambda v: v or "Qualquer",
+                          key="vacina_proxima")
+
+if ponto is None:
+    st.info("Município sem estabelecimentos com coordenadas")
+    st.stop()
+
+proximos = indice.nearest(*ponto, k=k, vacina=vacina)
+if proximos.empty:
+    st.info("Nenhum estabelecimento encontrado")
+    st.stop()
+
+st.caption(f"{len(proximos)} estabelecimentos mais próximos de ({ponto[0]:.4f}, {ponto[1]:.4f}) — "
+           f"doses e vacinas dos últimos {JANELA_DIAS} dias de dados")
+
+col_tabela, col_mapa = st.columns([3, 2])
+with col_tabela:
+    tabela = proximos.drop(columns=['latitude', 'longitude']).assign(
+        vacinas=proximos['vacinas'].map(', '.join))
+    st.dataframe(tabela, width='stretch', hide_index=True)
+with col_mapa:
+    pontos = pd.concat([
+        pd.DataFrame({'lat': [ponto[0]], 'lon': [ponto[1]], 'cor': ['#d62728']}),
+        pd.DataFrame({'lat': proximos['latitude'], 'lon': proximos['longitude'], 'cor': '#1f77b4'}),
+    ])
+    st.map(pontos, latitude='lat', longitude='lon', color='cor')
@@ -0,0 +1,65 @@
+import streamlit as st
+from utils.db_functions import *
+from utils.qualidade import VERIFICACOES
+
+# ============= CONFIGURAÇÃO DA PÁGINA =============
+st.set_page_config(
+    page_title="Qualidade dos Dados",
+    page_icon="💉",
+    layout="wide",
+)
+
+st.logo('https://ic.ufrj.br/svg/logo-ic.svg')
+
+st.title("🧹 Qualidade dos Dados")
+st.caption("Resumo da última verificação (`python -m utils.qualidade`), gravado em QualidadeDados.")
+st.markdown("---")
+
+@st.cache_data(ttl=300)
+def load_quality_summary():
+    return execute_query("""
+        SELECT verificacao, tabela, descricao, ocorrencias, verificadas, exemplos, executada_em, duracao_s
+        FROM QualidadeDados
+    """)
+
+resumo = load_quality_summary()
+if resumo.empty:
+    st.info("Nenhuma verificação registrada. Rode `cd app && uv run python -m utils.qualidade`.")
+    st.stop()
+
+# Ordem das verificações no módulo; as desconhecidas (versões antigas) vão para o fim
+ordem = {nome: i for i, nome in enumerate(VERIFICACOES)}
+resumo = resumo.sort_values('verificacao', key=lambda s: s.map(ordem).fillna(len(ordem)))
+resumo['proporcao'] = (resumo['ocorrencias'] / resumo['verificadas'].where(resumo['verificadas'] > 0)).fillna(0)
+
+# ============= INDICADORES =============
+kpi_cols = st.columns(3)
+with kpi_cols[0]:
+    st.metric("Verificações com ocorrências", f"{int((resumo['ocorrencias'] > 0).sum())} de {len(resumo)}")
+with kpi_cols[1]:
+    st.metric("Executada em", f"{resumo['executada_em'].max():%d/%m/%Y %H:%M}")
+with kpi_cols[2]:
+    duracao = resumo['duracao_s'].max()
+    st.metric("Duração", f"{duracao:.0f} s" if duracao == duracao else "-")
+
+# ============= DETALHES =============
+so_ocorrencias = st.toggle("Só verificações com ocorrências", value=True)
+if so_ocorrencias:
+    resumo = resumo[resumo['ocorrencias'] > 0]
+if resumo.empty:
+    st.success("✅ Nenhuma ocorrência na última verificação.")
+    st.stop()
+
+st.dataframe(
+    resumo[['descricao', 'tabela', 'ocorrencias', 'verificadas', 'proporcao', 'exemplos']],
+    width='stretch',
+    hide_index=True,
+    column_config={
+        'descricao': st.column_config.TextColumn("Verificação", width='large'),
+        'tabela': "Tabela",
+        'ocorrencias': st.column_config.NumberColumn("Ocorrências", format="localized"),
+        'verificadas': st.column_config.NumberColumn("Linhas verificadas", format="localized"),
+        'proporcao': st.column_config.ProgressColumn("Proporção", format="percent", min_value=0, max_value=1),
+        'exemplos': st.column_config.TextColumn("Exemplos", width='large'),
+    },
+)
@@ -0,0 +1,51 @@
+-- Particiona AplicacaoDose por mês de data_vacina (RANGE COLUMNS).
+--
+-- O MySQL exige que a coluna de particionamento faça parte de toda chave
+-- única e não aceita chaves estrangeiras em tabelas particionadas. Por isso a
+-- tabela é recriada com CREATE TABLE ... LIKE (que não copia as FKs), com a
+-- chave primária estendida para (id_aplicacao, data_vacina). A integridade
+-- referencial passa a ser verificada pela carga. Aplicações sem
+-- data_vacina não têm partição: vão para AplicacaoDose_sem_data, para
+-- correção e recarga, em vez de se perderem com a tabela antiga.
+--
+-- As partições mensais seguintes são criadas pela ferramenta
+-- `python -m utils.particoes`, que reorganiza a partição pmax.
+
+CREATE TABLE AplicacaoDose_particionada LIKE AplicacaoDose;
+
+ALTER TABLE AplicacaoDose_particionada
+    MODIFY data_vacina DATE NOT NULL,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id_aplicacao, data_vacina);
+
+ALTER TABLE AplicacaoDose_particionada
+    PARTITION BY RANGE COLUMNS (data_vacina) (
+        PARTITION p_antigo VALUES LESS THAN ('2024-01-01'),
+        PARTITION p202401 VALUES LESS THAN ('2024-02-01'),
+        PARTITION p202402 VALUES LESS THAN ('2024-03-01'),
+        PARTITION p202403 VALUES LESS THAN ('2024-04-01'),
+        PARTITION p202404 VALUES LESS THAN ('2024-05-01'),
+        PARTITION p202405 VALUES LESS THAN ('2024-06-01'),
+        PARTITION p202406 VALUES LESS THAN ('2024-07-01'),
+        PARTITION p202407 VALUES LESS THAN ('2024-08-01'),
+        PARTITION p202408 VALUES LESS THAN ('2024-09-01'),
+        PARTITION p202409 VALUES LESS THAN ('2024-10-01'),
+        PARTITION p202410 VALUES LESS THAN ('2024-11-01'),
+        PARTITION p202411 VALUES LESS THAN ('2024-12-01'),
+        PARTITION p202412 VALUES LESS THAN ('2025-01-01'),
+        PARTITION pmax VALUES LESS THAN (MAXVALUE)
+    );
+
+INSERT INTO AplicacaoDose_particionada
+SELECT * FROM AplicacaoDose WHERE data_vacina IS NOT NULL;
+
+CREATE TABLE AplicacaoDose_sem_data LIKE AplicacaoDose;
+
+INSERT INTO AplicacaoDose_sem_data
+SELECT * FROM AplicacaoDose WHERE data_vacina IS NULL;
+
+RENAME TABLE
+    AplicacaoDose TO AplicacaoDose_nao_particionada,
+    AplicacaoDose_particionada TO AplicacaoDose;
+
+DROP TABLE AplicacaoDose_nao_particionada;
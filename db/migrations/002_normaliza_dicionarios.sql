@@ -0,0 +1,162 @@
+-- Move as colunas textuais repetidas da tabela de aplicações e de Paciente
+-- para tabelas-dicionário com chaves inteiras pequenas, e dá aos pacientes
+-- uma chave substituta inteira (sk_paciente).
+--
+-- As tabelas físicas passam a ser AplicacaoDoseCompacta e PacienteCompacto.
+-- AplicacaoDose e Paciente viram views com as mesmas colunas de antes, de
+-- modo que as consultas existentes continuam funcionando; as consultas
+-- frequentes do painel usam as tabelas compactas e filtram pelos ids.
+
+-- ============= DICIONÁRIOS =============
+CREATE TABLE DoseVacina (
+    id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    descricao VARCHAR(255) NOT NULL UNIQUE
+);
+
+CREATE TABLE LocalAplicacao (
+    id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    descricao VARCHAR(255) NOT NULL UNIQUE
+);
+
+CREATE TABLE ViaAdministracao (
+    id TINYINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    descricao VARCHAR(255) NOT NULL UNIQUE
+);
+
+CREATE TABLE LoteVacina (
+    id INT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    codigo VARCHAR(255) NOT NULL UNIQUE
+);
+
+CREATE TABLE Sexo (
+    id TINYINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    descricao VARCHAR(50) NOT NULL UNIQUE
+);
+
+CREATE TABLE RacaCor (
+    id TINYINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    descricao VARCHAR(255) NOT NULL UNIQUE
+);
+
+CREATE TABLE Municipio (
+    id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    nome VARCHAR(255) NULL,
+    uf VARCHAR(2) NULL,
+    UNIQUE KEY uk_municipio_nome_uf (nome, uf)
+);
+
+INSERT INTO DoseVacina (descricao)
+SELECT DISTINCT dose_vacina FROM AplicacaoDose WHERE dose_vacina IS NOT NULL ORDER BY dose_vacina;
+
+INSERT INTO LocalAplicacao (descricao)
+SELECT DISTINCT local_aplicacao FROM AplicacaoDose WHERE local_aplicacao IS NOT NULL ORDER BY local_aplicacao;
+
+INSERT INTO ViaAdministracao (descricao)
+SELECT DISTINCT via_administracao FROM AplicacaoDose WHERE via_administracao IS NOT NULL ORDER BY via_administracao;
+
+INSERT INTO LoteVacina (codigo)
+SELECT DISTINCT lote_vacina FROM AplicacaoDose WHERE lote_vacina IS NOT NULL ORDER BY lote_vacina;
+
+INSERT INTO Sexo (descricao)
+SELECT DISTINCT sexo FROM Paciente WHERE sexo IS NOT NULL ORDER BY sexo;
+
+INSERT INTO RacaCor (descricao)
+SELECT DISTINCT raca_cor FROM Paciente WHERE raca_cor IS NOT NULL ORDER BY raca_cor;
+
+INSERT INTO Municipio (nome, uf)
+SELECT DISTINCT municipio, uf FROM Paciente
+WHERE municipio IS NOT NULL OR uf IS NOT NULL
+ORDER BY uf, municipio;
+
+-- ============= PACIENTES =============
+CREATE TABLE PacienteCompacto (
+    sk_paciente INT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    id_paciente VARCHAR(255) NOT NULL,
+    id_sexo TINYINT UNSIGNED NULL,
+    id_raca_cor TINYINT UNSIGNED NULL,
+    id_municipio SMALLINT UNSIGNED NULL,
+    idade SMALLINT NULL,
+    UNIQUE KEY uk_paciente_id (id_paciente),
+    KEY idx_paciente_municipio (id_municipio),
+    KEY idx_paciente_idade (idade),
+    CONSTRAINT fk_paciente_sexo FOREIGN KEY (id_sexo) REFERENCES Sexo (id),
+    CONSTRAINT fk_paciente_raca_cor FOREIGN KEY (id_raca_cor) REFERENCES RacaCor (id),
+    CONSTRAINT fk_paciente_municipio FOREIGN KEY (id_municipio) REFERENCES Municipio (id)
+);
+
+INSERT INTO PacienteCompacto (id_paciente, id_sexo, id_raca_cor, id_municipio, idade)
+SELECT p.id_paciente, s.id, r.id, m.id, p.idade
+FROM Paciente p
+LEFT JOIN Sexo s ON s.descricao = p.sexo
+LEFT JOIN RacaCor r ON r.descricao = p.raca_cor
+LEFT JOIN Municipio m ON m.nome <=> p.municipio AND m.uf <=> p.uf
+ORDER BY p.id_paciente;
+
+-- ============= APLICAÇÕES =============
+-- LIKE preserva o particionamento mensal e a chave (id_aplicacao, data_vacina)
+CREATE TABLE AplicacaoDoseCompacta LIKE AplicacaoDose;
+
+ALTER TABLE AplicacaoDoseCompacta
+    DROP COLUMN dose_vacina,
+    DROP COLUMN local_aplicacao,
+    DROP COLUMN via_administracao,
+    DROP COLUMN lote_vacina,
+    DROP COLUMN id_paciente,
+    ADD COLUMN id_dose SMALLINT UNSIGNED NULL AFTER data_vacina,
+    ADD COLUMN id_local SMALLINT UNSIGNED NULL AFTER id_dose,
+    ADD COLUMN id_via TINYINT UNSIGNED NULL AFTER id_local,
+    ADD COLUMN id_lote INT UNSIGNED NULL AFTER id_via,
+    ADD COLUMN sk_paciente INT UNSIGNED NULL,
+    ADD KEY idx_aplicacao_paciente (sk_paciente),
+    ADD KEY idx_aplicacao_dose (id_dose, data_vacina);
+
+INSERT INTO AplicacaoDoseCompacta
+    (id_aplicacao, data_vacina, id_dose, id_local, id_via, id_lote,
+     cnes, id_vacina, sk_paciente, id_estrategia_vacinacao)
+SELECT ad.id_aplicacao, ad.data_vacina, d.id, l.id, v.id, lt.id,
+       ad.cnes, ad.id_vacina, p.sk_paciente, ad.id_estrategia_vacinacao
+FROM AplicacaoDose ad
+LEFT JOIN DoseVacina d ON d.descricao = ad.dose_vacina
+LEFT JOIN LocalAplicacao l ON l.descricao = ad.local_aplicacao
+LEFT JOIN ViaAdministracao v ON v.descricao = ad.via_administracao
+LEFT JOIN LoteVacina lt ON lt.codigo = ad.lote_vacina
+LEFT JOIN PacienteCompacto p ON p.id_paciente = ad.id_paciente;
+
+-- ============= VIEWS DE COMPATIBILIDADE =============
+RENAME TABLE
+    AplicacaoDose TO AplicacaoDose_texto,
+    Paciente TO Paciente_texto;
+
+CREATE VIEW AplicacaoDose AS
+SELECT
+    ad.id_aplicacao,
+    ad.data_vacina,
+    d.descricao AS dose_vacina,
+    l.descricao AS local_aplicacao,
+    v.descricao AS via_administracao,
+    lt.codigo AS lote_vacina,
+    ad.cnes,
+    ad.id_vacina,
+    p.id_paciente,
+    ad.id_estrategia_vacinacao
+FROM AplicacaoDoseCompacta ad
+LEFT JOIN DoseVacina d ON d.id = ad.id_dose
+LEFT JOIN LocalAplicacao l ON l.id = ad.id_local
+LEFT JOIN ViaAdministracao v ON v.id = ad.id_via
+LEFT JOIN LoteVacina lt ON lt.id = ad.id_lote
+LEFT JOIN PacienteCompacto p ON p.sk_paciente = ad.sk_paciente;
+
+CREATE VIEW Paciente AS
+SELECT
+    p.id_paciente,
+    s.descricao AS sexo,
+    m.nome AS municipio,
+    m.uf,
+    p.idade,
+    r.descricao AS raca_cor
+FROM PacienteCompacto p
+LEFT JOIN Sexo s ON s.id = p.id_sexo
+LEFT JOIN Municipio m ON m.id = p.id_municipio
+LEFT JOIN RacaCor r ON r.id = p.id_raca_cor;
+
+DROP TABLE AplicacaoDose_texto, Paciente_texto;
@@ -0,0 +1,28 @@
+-- Amostra estratificada (mês x município do estabelecimento) das aplicações,
+-- usada pelo modo aproximado do painel. As colunas repetem as da tabela de
+-- aplicações para que as mesmas junções e filtros funcionem sobre a amostra.
+--
+-- O conteúdo é (re)gerado por `python -m utils.amostragem`.
+
+CREATE TABLE EstratoAmostra (
+    mes DATE NOT NULL,
+    municipio VARCHAR(255) NOT NULL,
+    total INT UNSIGNED NOT NULL,
+    amostrados INT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (mes, municipio)
+);
+
+CREATE TABLE AmostraAplicacao (
+    id_aplicacao VARCHAR(255) NOT NULL,
+    data_vacina DATE NOT NULL,
+    mes DATE NOT NULL,
+    estrato VARCHAR(255) NOT NULL,
+    id_dose SMALLINT UNSIGNED NULL,
+    id_vacina INT NULL,
+    sk_paciente INT UNSIGNED NULL,
+    cnes INT NULL,
+    id_estrategia_vacinacao INT NULL,
+    PRIMARY KEY (id_aplicacao, data_vacina),
+    KEY idx_amostra_estrato (mes, estrato),
+    KEY idx_amostra_data (data_vacina)
+);
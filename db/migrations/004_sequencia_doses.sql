@@ -0,0 +1,28 @@
+-- Sequência ordenada das aplicações de cada paciente por vacina, com a dose
+-- seguinte e o intervalo até ela, para as análises de completude de esquema.
+-- Uma linha por aplicação; `ordem` é a posição na sequência (paciente, vacina).
+--
+-- O conteúdo é mantido por `python -m utils.sequencias` (incremental, ou
+-- completo com --completo).
+
+CREATE TABLE SequenciaDose (
+    sk_paciente INT UNSIGNED NOT NULL,
+    id_vacina INT NOT NULL,
+    ordem SMALLINT UNSIGNED NOT NULL,
+    id_aplicacao VARCHAR(255) NOT NULL,
+    data_vacina DATE NOT NULL,
+    id_dose SMALLINT UNSIGNED NULL,
+    id_municipio SMALLINT UNSIGNED NULL,
+    id_dose_seguinte SMALLINT UNSIGNED NULL,
+    dias_ate_seguinte SMALLINT UNSIGNED NULL,
+    PRIMARY KEY (sk_paciente, id_vacina, ordem),
+    KEY idx_sequencia_dose (id_vacina, id_dose, data_vacina),
+    KEY idx_sequencia_aplicacao (id_aplicacao)
+);
+
+-- Até que data de aplicação a sequência foi atualizada (linha única)
+CREATE TABLE SequenciaDoseControle (
+    id TINYINT UNSIGNED PRIMARY KEY,
+    ultima_data DATE NULL,
+    atualizada_em DATETIME NOT NULL
+);
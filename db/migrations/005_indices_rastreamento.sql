@@ -0,0 +1,15 @@
+-- Índices de cobertura para as consultas pontuais de rastreamento
+-- (utils.rastreamento): todas as aplicações de um lote e o histórico de um
+-- paciente. Cada índice tem as colunas da aplicação lidas pelas consultas,
+-- que então não visitam as linhas da tabela. id_aplicacao vem logo depois de
+-- data_vacina, como na ordem das páginas (lote, data, aplicação e data,
+-- aplicação): assim cada página é um intervalo do índice, lido já em ordem,
+-- sem ordenar as linhas restantes do lote ou do paciente.
+--
+-- Os índices são locais a cada partição mensal: uma busca por lote ou
+-- paciente consulta o índice de todas as partições, uma descida por partição.
+
+ALTER TABLE AplicacaoDoseCompacta
+    DROP KEY idx_aplicacao_paciente,
+    ADD KEY idx_aplicacao_paciente (sk_paciente, data_vacina, id_aplicacao, id_vacina, id_dose, id_lote, cnes),
+    ADD KEY idx_aplicacao_lote (id_lote, data_vacina, id_aplicacao, sk_paciente, id_vacina, id_dose, cnes);
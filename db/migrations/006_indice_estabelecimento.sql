@@ -0,0 +1,6 @@
+-- Índice para o filtro de estabelecimento do painel (ad.cnes IN (...)): com a
+-- data na segunda coluna, cada CNES escolhido vira um intervalo do índice
+-- restrito ao período, em vez de uma varredura das partições do período.
+
+ALTER TABLE AplicacaoDoseCompacta
+    ADD KEY idx_aplicacao_cnes (cnes, data_vacina);
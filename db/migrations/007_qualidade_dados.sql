@@ -0,0 +1,16 @@
+-- Resumo da última verificação de qualidade dos dados: uma linha por
+-- verificação, com o número de ocorrências, o de linhas verificadas e alguns
+-- exemplos (separados por ponto e vírgula).
+--
+-- O conteúdo é mantido por `python -m utils.qualidade`.
+
+CREATE TABLE QualidadeDados (
+    verificacao VARCHAR(60) PRIMARY KEY,
+    tabela VARCHAR(60) NOT NULL,
+    descricao VARCHAR(255) NOT NULL,
+    ocorrencias BIGINT UNSIGNED NOT NULL,
+    verificadas BIGINT UNSIGNED NOT NULL,
+    exemplos TEXT NULL,
+    executada_em DATETIME NOT NULL,
+    duracao_s DECIMAL(8, 1) NULL
+);
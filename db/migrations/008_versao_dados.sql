@@ -0,0 +1,16 @@
+-- Versão dos dados de aplicações e pacientes (linha única), lida pelo app
+-- para invalidar os caches derivados (índices de estabelecimentos, figuras,
+-- ETags da API).
+--
+-- Toda carga deve incrementá-la ao terminar (`python -m utils.versao`); as
+-- migrações e a remoção de partições antigas já o fazem. Os shards e o
+-- snapshot DuckDB recebem a cópia da linha junto com as demais tabelas.
+
+CREATE TABLE VersaoDados (
+    id TINYINT UNSIGNED PRIMARY KEY,
+    versao BIGINT UNSIGNED NOT NULL,
+    origem VARCHAR(100) NULL,
+    atualizada_em DATETIME NOT NULL
+);
+
+INSERT INTO VersaoDados (id, versao, origem, atualizada_em) VALUES (1, 1, '008_versao_dados', NOW());